@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""Compare the dispatch of a GameHandler, and of its compiled handler
+
+e.g. `examples/benchmark_handlers.py --games 200`
+"""
+import os, sys
+import argparse
+import enum
+import random
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from playtest.game import GameHandler, ContinueTo
+
+from pt_blackjack.constant import Param
+from pt_blackjack.state import State
+import pt_blackjack.game as gm
+
+AGENT_COUNT = 2
+
+
+class Steps:
+    """Steps left in the chain, instead of a state, to time the dispatch only"""
+
+    def __init__(self, steps: int):
+        self.left = steps
+
+
+def chain(s: Steps, action=None):
+    """Continue through the check winner state, as many times as asked"""
+    s.left -= 1
+    if s.left > 0:
+        return ContinueTo(gm.GameState.check_winner)
+    return (s, None, gm.GameState.end, None)
+
+
+class ChainHandler(GameHandler):
+    handler = {gm.GameState.start: chain, gm.GameState.check_winner: chain}
+
+
+def time_chain(handler: GameHandler, steps: int) -> float:
+    s = Steps(steps)
+    start = time.perf_counter()
+    handler.handle(s, gm.GameState.start)  # type: ignore
+    return time.perf_counter() - start
+
+
+def time_games(handler: GameHandler, games: int, seed: int) -> float:
+    """Play random games, calling the handler only"""
+    rng = random.Random(seed)
+    elapsed = 0.0
+    for _ in range(games):
+        random.seed(rng.random())
+        s = State(Param(number_of_players=AGENT_COUNT))
+        game_state: enum.Enum = gm.GameState.start
+        action = None
+        while True:
+            start = time.perf_counter()
+            _, decision, game_state, _ = handler.handle(s, game_state, action)
+            elapsed += time.perf_counter() - start
+            if decision is None:
+                break
+            action = decision.pick_random_action()
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark handler dispatch")
+    parser.add_argument("--games", type=int, default=200, help="Games to play")
+    parser.add_argument(
+        "--steps", type=int, default=100000, help="Handlers in the chain"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each")
+    args = parser.parse_args()
+
+    for name, handler, compiled in [
+        ("chain", ChainHandler(), ChainHandler().compile(gm.GameState.start)),
+        (
+            "blackjack",
+            gm.BlackjackHandler(),
+            gm.BlackjackHandler().compile(gm.GameState.start),
+        ),
+    ]:
+        # Best of a few runs, as timings are noisy
+        if name == "chain":
+            times = [
+                min(time_chain(h, args.steps) for _ in range(args.repeat))
+                for h in [handler, compiled]
+            ]
+        else:
+            times = [
+                min(time_games(h, args.games, seed=0) for _ in range(args.repeat))
+                for h in [handler, compiled]
+            ]
+        print(
+            "{:<10} dict {:.3f}s  compiled {:.3f}s  speedup {:.2f}x".format(
+                name, times[0], times[1], times[0] / times[1]
+            )
+        )
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""Export a trained agent, to play it with numpy only
+
+e.g. `example/export.py blackjack_dnq.h5f blackjack_dnq.npz --precision int8`
+"""
+import os, sys
+import argparse
+
+sys.path.insert(0, os.getcwd())
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.keras_dqn import KerasDQNAgent
+from playtest.agents.numpy_dqn import PRECISIONS, export_weights
+
+from pt_blackjack.constant import Param
+from pt_blackjack.state import State
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+AGENT_COUNT = 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export agent for numpy")
+    parser.add_argument("input", type=str, help="Trained h5f agent file")
+    parser.add_argument("output", type=str, help="Output npz agent file")
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=PRECISIONS,
+        default="float32",
+        help="precision of the weights (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--factored", action="store_true", help="The agent has a factored network"
+    )
+    args = parser.parse_args()
+
+    env: GameWrapperEnvironment = GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        verbose=False,
+    )
+    agent = KerasDQNAgent(env, weight_file=args.input, factored=args.factored)
+    export_weights(agent, args.output, precision=args.precision)
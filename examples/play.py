@@ -10,7 +10,8 @@ import gym
 sys.path.insert(0, os.getcwd())
 
 from playtest.env import GameWrapperEnvironment, EnvironmentInteration
-from playtest.agents import HumanAgent, KerasDQNAgent
+from playtest.agents import HumanAgent
+from playtest.agents.tournament import AgentSpec
 
 from .constant import Reward, Param
 from pt_blackjack.state import State
@@ -29,7 +30,7 @@ if __name__ == "__main__":
         "--bot",
         type=str,
         default="blackjack_dnq.h5f",
-        help="Input agent file (default: %(default)s)",
+        help="Input agent file, .h5f or .npz (default: %(default)s)",
     )
     parser.add_argument(
         "--ai",
@@ -47,11 +48,14 @@ if __name__ == "__main__":
         verbose=args.verbose,
     )
 
+    # A .npz agent (see examples/export.py) plays without tensorflow
     second_agent = (
-        KerasDQNAgent(env, weight_file=args.bot) if args.ai else HumanAgent(env)
+        AgentSpec("ai", weight_file=args.bot).build(env) if args.ai else HumanAgent(env)
     )
 
     agents = [HumanAgent(env), second_agent]
 
-    game = EnvironmentInteration(env, agents, episodes=args.episodes)
+    game = EnvironmentInteration(
+        env, agents, episodes=args.episodes, render=True, verbose=True
+    )
     game.play()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Host blackjack tables for human players, with bots in the empty seats
+
+Connect with any line based TCP client, e.g. `nc 127.0.0.1 8888`, and send:
+
+    {"type": "join"}
+    {"type": "action", "action": "bet(3)"}
+
+or `{"type": "spectate", "table": 0}` to watch a table.
+"""
+import os, sys
+import argparse
+import asyncio
+import logging
+
+sys.path.insert(0, os.getcwd())
+
+from playtest.env import GameWrapperEnvironment
+from playtest.server import GameServer
+
+from pt_blackjack.constant import Param
+from pt_blackjack.state import State
+from pt_blackjack.heuristic import HeuristicAgent
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+AGENT_COUNT = 2
+
+
+def make_env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        verbose=False,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game server for playtesting")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument(
+        "--humans", type=int, default=1, help="humans per table (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="seconds for a human to act (default: %(default)s)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = GameServer(
+        make_env,
+        bot_factory=HeuristicAgent,
+        humans_per_table=args.humans,
+        action_timeout=args.timeout,
+    )
+    asyncio.run(server.serve(args.host, args.port))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Rank trained agents against each other and baselines
+"""
+import os, sys
+import argparse
+
+sys.path.insert(0, os.getcwd())
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.tournament import AgentSpec, Tournament, RANDOM_AGENT
+
+from pt_blackjack.constant import Param
+from pt_blackjack.state import State
+from pt_blackjack.heuristic import HeuristicAgent, bank_scores
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+AGENT_COUNT = 2
+
+
+def make_env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        verbose=False,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tournament between agents")
+    parser.add_argument("bots", type=str, nargs="*", help="Agent h5f files")
+    parser.add_argument(
+        "--games", type=int, default=10, help="games per seating (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        default=100,
+        help="steps per game (default: %(default)s)",
+    )
+    parser.add_argument("--processes", type=int, default=None, help="worker count")
+    args = parser.parse_args()
+
+    specs = [RANDOM_AGENT, AgentSpec("heuristic", factory=HeuristicAgent)]
+    specs += [AgentSpec(os.path.basename(f), weight_file=f) for f in args.bots]
+
+    report = Tournament(
+        make_env,
+        specs,
+        games_per_seating=args.games,
+        score_fn=bank_scores,
+        max_steps=args.max_steps,
+        processes=args.processes,
+    ).run()
+    print(report)
@@ -1,4 +1,4 @@
-from .state import FullState, SubState, Visibility
+from .state import FullState, SubState, Visibility, OthersEncoding, StateTemplate
 from .constant import Param, Reward
 from .logger import Announcer
 
@@ -6,6 +6,8 @@ __all__ = [
     "FullState",
     "SubState",
     "Visibility",
+    "OthersEncoding",
+    "StateTemplate",
     "Param",
     "Reward",
     "Player",
@@ -17,6 +17,7 @@ from typing import (
     MutableMapping,
     Any,
 )
+from collections import OrderedDict
 from dataclasses import dataclass
 
 import numpy as np
@@ -31,6 +32,30 @@ from .components.core import Component
 # For mapping typings
 ActionEnum = enum.Enum
 
+# Heads of an ordinal parameter (e.g. a bet amount) in the factored encoding
+ORDINAL_PARAMETER_HEADS = 8
+
+
+def ordinal_encoding(size: int, heads: int = ORDINAL_PARAMETER_HEADS) -> np.ndarray:
+    """Interpolate the value of `size` ordered values between `heads` values
+
+    The heads are spread evenly over the values, and the value in between two
+    heads is their linear interpolation.
+
+    Return: array of shape (heads, size), or the identity if `size <= heads`
+    """
+    if size <= heads:
+        return np.eye(size)
+    # Position of each value between the heads, e.g. 2.5 is half way
+    # between the heads 2 and 3
+    position = np.arange(size) * (heads - 1) / (size - 1)
+    lower = np.minimum(position.astype(int), heads - 2)
+    upper_weight = position - lower
+    encoding = np.zeros((heads, size))
+    encoding[lower, np.arange(size)] = 1 - upper_weight
+    encoding[lower + 1, np.arange(size)] += upper_weight
+    return encoding
+
 
 class InvalidActionError(RuntimeError):
     """Represent when we cannot Marshal this into a legal action.
@@ -59,7 +84,8 @@ class ActionInstance:
 
     # Describe the name of the string
     key: ActionEnum
-    value: int
+    # An int, or the positions of a subset (see `ActionCardSubsetRange`)
+    value: Union[int, Tuple[int, ...]]
 
 
 class ActionRange(abc.ABC):
@@ -109,6 +135,19 @@ class ActionRange(abc.ABC):
     def to_int(self, value) -> int:
         raise NotImplementedError()
 
+    def get_parameter_encoding(self) -> np.ndarray:
+        """Map the heads of the parameter onto each of its int values
+
+        See `BaseDecision.factored_combination_matrix`.  By default, each
+        value has its own head, if there is more than one value.
+
+        Return: array of shape (number of heads, number of distinct value)
+        """
+        size = self.get_number_of_distinct_value()
+        if size == 1:
+            return np.zeros((0, 1))
+        return np.eye(size)
+
     # ---------
     # Str marshalling - for human interaction
     # ---------
@@ -137,6 +176,23 @@ class ActionRange(abc.ABC):
         """
         raise NotImplementedError()
 
+    def to_legal_mask(self, legal_range) -> np.ndarray:
+        """Return a boolean mask over `get_number_of_distinct_value`
+
+        Each entry indicates if the int value (as per `from_int`) is a
+        legal move given the legal_range.
+        """
+        raise NotImplementedError()
+
+
+def _hashable(value: Any) -> Any:
+    """Convert a legal range into a hashable value"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
 
 class BaseDecision:
     """This base class for inheriting actions
@@ -164,12 +220,53 @@ class BaseDecision:
     decision_ranges: MutableMapping[ActionEnum, ActionRange]
     legal_action: Dict[ActionEnum, Any]
 
+    # Maximum number of decisions kept by `intern`, per decision class
+    intern_cache_size: int = 256
+
     # Specify default action for non-active player
     # TODO: remove if we do not need this
     # default: enum.Enum = enum.Enum.WAIT
 
     def __init__(self, legal_action: Dict[ActionEnum, Any]):
         self.legal_action = legal_action
+        self._numpy_cache: Optional[Dict[str, Any]] = None
+        self._mask_cache: Optional[np.ndarray] = None
+        self._vector_cache: Optional[np.ndarray] = None
+
+    @classmethod
+    def intern(cls, legal_action: Dict[ActionEnum, Any]) -> "BaseDecision":
+        """Return a shared decision for the given legal actions
+
+        Decisions with the same legal actions are the same instance, so
+        their encoding (e.g. `legal_action_mask`) is only computed once.
+        The least recently used decisions are evicted past
+        `intern_cache_size`, e.g. for ranges depending on a bank.
+
+        Note that interned decisions must not be mutated.
+        """
+        try:
+            key = tuple(
+                (action_key, _hashable(legal_action[action_key]))
+                for action_key in cls.decision_ranges.keys()
+                if action_key in legal_action
+            )
+            hash(key)
+        except TypeError:
+            return cls(legal_action)
+
+        cache = cls.__dict__.get("_interned")
+        if cache is None:
+            cache = OrderedDict()
+            setattr(cls, "_interned", cache)
+        decision = cache.get(key)
+        if decision is not None:
+            cache.move_to_end(key)
+            return decision
+        decision = cls(legal_action)
+        cache[key] = decision
+        while len(cache) > cls.intern_cache_size:
+            cache.popitem(last=False)
+        return decision
 
     @classmethod
     def get_number_of_actions(cls) -> int:
@@ -214,6 +311,11 @@ class BaseDecision:
 
         Return: a dict of recursive array which can be used for spaces.flatten
         """
+        if self._numpy_cache is None:
+            self._numpy_cache = self._action_range_to_numpy()
+        return dict(self._numpy_cache)
+
+    def _action_range_to_numpy(self) -> Dict[str, np.ndarray]:
         action_possible_dict = {}
 
         for action_key, action_range in self.decision_ranges.items():
@@ -229,6 +331,120 @@ class BaseDecision:
 
         return action_possible_dict
 
+    def action_range_vector(self) -> np.ndarray:
+        """Return the flattened `action_range_to_numpy`, read only"""
+        if self._vector_cache is None:
+            self._vector_cache = spaces.flatten(
+                self.action_space_possible(), self.action_range_to_numpy()
+            )
+            self._vector_cache.flags.writeable = False
+        return self._vector_cache
+
+    def legal_action_mask(self) -> np.ndarray:
+        """Return a boolean mask over the int action space
+
+        The mask is aligned with `to_int` / `from_int`, so that it can be
+        applied directly against the output of a model, e.g. to pick the
+        best legal action out of a set of Q-values.  The mask is read only.
+        """
+        if self._mask_cache is None:
+            self._mask_cache = self._legal_action_mask()
+            self._mask_cache.flags.writeable = False
+        return self._mask_cache
+
+    def _legal_action_mask(self) -> np.ndarray:
+        masks = []
+        for action_key, action_range in self.decision_ranges.items():
+            if action_key in self.legal_action:
+                masks.append(action_range.to_legal_mask(self.legal_action[action_key]))
+            else:
+                masks.append(
+                    np.zeros(action_range.get_number_of_distinct_value(), dtype=bool)
+                )
+        return np.concatenate(masks)
+
+    # ---------
+    # Factored action space
+    #
+    # An action is also represented as a pair of (action type, parameter),
+    # where the action type is the index of the action range, and the
+    # parameter the int value within that range.  e.g. for
+    # [SKIP, HIT, BET(0..100)], BET(3) is (2, 3).
+    # ---------
+
+    @classmethod
+    def get_parameter_sizes(cls) -> List[int]:
+        """Number of parameters of each action type"""
+        return [a.get_number_of_distinct_value() for a in cls.decision_ranges.values()]
+
+    @classmethod
+    def factored_action_space(cls) -> spaces.Space:
+        """Space of the (action type, parameter) pair"""
+        return spaces.Tuple(
+            (
+                spaces.Discrete(len(cls.decision_ranges)),
+                spaces.Discrete(max(cls.get_parameter_sizes())),
+            )
+        )
+
+    @classmethod
+    def to_factored(cls, input_value: int) -> Tuple[int, int]:
+        """Converting an int action into (action type, parameter)"""
+        for type_index, (_, lower, upper) in enumerate(cls.get_action_map()):
+            if lower <= input_value < upper:
+                return type_index, input_value - lower
+        raise KeyError(f"Illegal action input: {input_value}.")
+
+    @classmethod
+    def from_factored(cls, type_index: int, parameter: int) -> int:
+        """Converting (action type, parameter) into an int action"""
+        _, lower, upper = cls.get_action_map()[type_index]
+        assert 0 <= parameter < upper - lower, f"Illegal parameter: {parameter}"
+        return lower + parameter
+
+    @classmethod
+    def factored_combination_matrix(cls) -> np.ndarray:
+        """Matrix mapping the action type and parameter heads to int actions
+
+        The heads are the value of each action type, followed by the heads
+        of the parameters of each type (see
+        `ActionRange.get_parameter_encoding`).  The value of an int action
+        is the value of its type, plus the value of its parameter:
+
+            q_values = np.dot(heads, decision_class.factored_combination_matrix())
+
+        Parameters are encoded compactly where they have an order, e.g. a
+        bet amount is interpolated between a few heads, and a subset of
+        cards is the sum of a head per card.  So there are fewer heads than
+        int actions.
+
+        Return: array of shape (number of heads, number of actions)
+        """
+        action_map = cls.get_action_map()
+        encodings = [r.get_parameter_encoding() for r in cls.decision_ranges.values()]
+        number_of_heads = len(action_map) + sum(len(e) for e in encodings)
+        matrix = np.zeros((number_of_heads, cls.get_number_of_actions()))
+        head = len(action_map)
+        for type_index, ((_, lower, upper), encoding) in enumerate(
+            zip(action_map, encodings)
+        ):
+            matrix[type_index, lower:upper] = 1
+            matrix[head : head + len(encoding), lower:upper] = encoding
+            head += len(encoding)
+        return matrix
+
+    def action_type_mask(self) -> np.ndarray:
+        """Return a boolean mask of the action types with a legal parameter"""
+        mask = self.legal_action_mask()
+        return np.array(
+            [mask[lower:upper].any() for _, lower, upper in self.get_action_map()]
+        )
+
+    def parameter_mask(self, type_index: int) -> np.ndarray:
+        """Return a boolean mask of the legal parameters of the action type"""
+        _, lower, upper = self.get_action_map()[type_index]
+        return self.legal_action_mask()[lower:upper]
+
     def is_legal(self, action: ActionInstance) -> bool:
         action_enum_matched = action.key
         action_range = self.decision_ranges[action_enum_matched]
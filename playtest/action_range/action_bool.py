@@ -69,3 +69,7 @@ class ActionBooleanRange(ActionRange):
         """Return null data set for ActionRange
         """
         return [0]
+
+    def to_legal_mask(self, legal_range) -> np.ndarray:
+        assert legal_range is True
+        return np.ones(1, dtype=bool)
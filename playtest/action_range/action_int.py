@@ -5,7 +5,7 @@ import re
 import numpy as np
 import gym.spaces as spaces
 
-from playtest.action import ActionRange, ActionInstance, ActionEnum
+from playtest.action import ActionRange, ActionInstance, ActionEnum, ordinal_encoding
 
 
 class ActionIntInSet(ActionRange):
@@ -76,6 +76,9 @@ class ActionIntInSet(ActionRange):
         array_value = [0] * self.get_number_of_distinct_value()
         return array_value
 
+    def to_legal_mask(self, legal_range) -> np.ndarray:
+        return np.isin(self.valid_range, list(legal_range))
+
 
 class ActionIntInRange(ActionRange):
 
@@ -108,6 +111,10 @@ class ActionIntInRange(ActionRange):
         lower_bound, upper_bound = self.valid_range
         return upper_bound - lower_bound
 
+    def get_parameter_encoding(self) -> np.ndarray:
+        """Interpolated between a few heads, as values are ordered"""
+        return ordinal_encoding(self.get_number_of_distinct_value())
+
     def to_int(self, value: int) -> int:
         assert isinstance(value, int)
         return value
@@ -146,3 +153,8 @@ class ActionIntInRange(ActionRange):
         """Return null data set for ActionRange
         """
         return [0, 0]
+
+    def to_legal_mask(self, legal_range) -> np.ndarray:
+        lower_bound, upper_bound = legal_range
+        values = np.arange(self.valid_range[0], self.valid_range[1])
+        return (lower_bound <= values) & (values < upper_bound)
@@ -0,0 +1,194 @@
+"""Action of choosing a subset of cards
+
+e.g. "discard any 2 cards of your hand", or "play a set of the same suite".
+
+A subset is chosen by the positions of the cards in a deck, and encoded as
+a bitmask, i.e. position i is chosen if bit i is set.  So a deck of up to
+n cards has `2 ** n` int values, and n should stay small (see
+`MAX_SUBSET_SIZE`).
+
+The legal range is a `CardSubsets`, i.e. the cards of the deck and the
+constraint on the subsets.  Legality of all subsets is checked at once,
+with a matrix of the bits of each subset.
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+import functools
+import random
+import re
+
+import numpy as np
+import gym.spaces as spaces
+
+from playtest.action import ActionRange, ActionInstance, ActionEnum
+from playtest.components.card import Card, CardNumber, CardSuite
+
+# Above this, the 2 ** size masks no longer fit comfortably in memory
+MAX_SUBSET_SIZE = 16
+
+
+@functools.lru_cache(maxsize=None)
+def subset_bits(size: int) -> np.ndarray:
+    """Return the bits of every subset, of shape (2 ** size, size)"""
+    masks = np.arange(1 << size)
+    bits = (masks[:, None] >> np.arange(size)) & 1
+    bits.flags.writeable = False
+    return bits
+
+
+def to_bitmask(positions: Sequence[int]) -> int:
+    mask = 0
+    for i in positions:
+        mask |= 1 << i
+    return mask
+
+
+def from_bitmask(mask: int) -> Tuple[int, ...]:
+    return tuple(i for i in range(mask.bit_length()) if mask & (1 << i))
+
+
+@dataclass(frozen=True)
+class SubsetConstraint:
+    """Constraint on the chosen subset of cards
+
+    :param min_size: minimum number of chosen cards
+    :param max_size: maximum number of chosen cards, if any
+    :param same_suite: all chosen cards must be of the same suite
+    :param same_number: all chosen cards must be of the same number
+    :param total: range [lower, upper) of the sum of the numbers, if any
+    """
+
+    min_size: int = 1
+    max_size: Optional[int] = None
+    same_suite: bool = False
+    same_number: bool = False
+    total: Optional[Tuple[int, int]] = None
+
+    def legal_mask(self, cards: Sequence[Card], size: int) -> np.ndarray:
+        """Return if each of the `2 ** size` subsets of the cards is legal"""
+        return self._check(subset_bits(size), cards, size)
+
+    def is_legal(self, cards: Sequence[Card], positions: Sequence[int]) -> bool:
+        size = len(cards)
+        bits = np.zeros((1, size), dtype=np.int64)
+        bits[0, list(positions)] = 1
+        return bool(self._check(bits, cards, size)[0])
+
+    def _check(self, bits: np.ndarray, cards: Sequence[Card], size: int) -> np.ndarray:
+        # Positions past the end of the deck can never be chosen
+        in_deck = np.zeros(size, dtype=np.int64)
+        in_deck[: len(cards)] = 1
+        chosen = bits.sum(axis=1)
+        legal = bits.dot(1 - in_deck) == 0
+        legal &= chosen >= self.min_size
+        if self.max_size is not None:
+            legal &= chosen <= self.max_size
+        if not (self.same_suite or self.same_number or self.total):
+            return legal
+
+        bits = bits[:, : len(cards)]
+        numbers = np.array([c.number for c in cards], dtype=np.int64)
+        if self.total is not None:
+            lower, upper = self.total
+            total = bits.dot(numbers)
+            legal &= (lower <= total) & (total < upper)
+        if self.same_number:
+            one_hot = np.eye(len(CardNumber) + 1, dtype=np.int64)[numbers]
+            legal &= bits.dot(one_hot).max(axis=1) == chosen
+        if self.same_suite:
+            suites = np.array([int(c.suite) for c in cards], dtype=np.int64)
+            one_hot = np.eye(len(CardSuite) + 1, dtype=np.int64)[suites]
+            legal &= bits.dot(one_hot).max(axis=1) == chosen
+        return legal
+
+
+@dataclass
+class CardSubsets:
+    """Legal range of `ActionCardSubset`: the cards, and the constraint"""
+
+    cards: List[Card]
+    constraint: SubsetConstraint = field(default_factory=SubsetConstraint)
+
+
+class ActionCardSubset(ActionRange):
+    """Choose a subset of the cards of a deck, e.g. a hand
+
+    The value of the action is the sorted positions of the chosen cards.
+    """
+
+    action_name: ActionEnum
+    # Maximum number of cards in the deck
+    valid_range: int
+
+    def __init__(self, action_name: ActionEnum, valid_range: int):
+        assert isinstance(action_name, ActionEnum)
+        assert 0 < valid_range <= MAX_SUBSET_SIZE, f"Too many cards: {valid_range}"
+        super().__init__(action_name, valid_range)
+
+    def is_legal(self, x: ActionInstance, legal_range: CardSubsets) -> bool:
+        positions = x.value
+        if x.key != self.action_name or isinstance(positions, int):
+            return False
+        if len(set(positions)) != len(positions):
+            return False
+        if not all(0 <= i < len(legal_range.cards) for i in positions):
+            return False
+        return legal_range.constraint.is_legal(legal_range.cards, positions)
+
+    def pick_random(self, legal_range: CardSubsets) -> ActionInstance:
+        """Pick uniformly out of the legal subsets"""
+        legal_masks = np.flatnonzero(self.to_legal_mask(legal_range))
+        assert len(legal_masks) > 0, "No legal subset"
+        return self.from_int(int(random.choice(legal_masks)))
+
+    # ---------
+    # Int marshalling - for openAI gym interaction
+    # ---------
+
+    def get_number_of_distinct_value(self) -> int:
+        return 1 << self.valid_range
+
+    def get_parameter_encoding(self) -> np.ndarray:
+        """A head per card, the value of a subset is the sum of its cards"""
+        return subset_bits(self.valid_range).T.astype(float)
+
+    def to_int(self, value: Sequence[int]) -> int:
+        return to_bitmask(value)
+
+    def from_int(self, np_value: int) -> ActionInstance:
+        if not 0 <= np_value < self.get_number_of_distinct_value():
+            raise KeyError(f"Unknown value {np_value} for {self}")
+        return ActionInstance(key=self.action_name, value=from_bitmask(np_value))
+
+    # ---------
+    # Str marshalling - for human interaction
+    # ---------
+
+    def from_str(self, action_str: str) -> ActionInstance:
+        """e.g. `discard(0,2)` for the first and third cards"""
+        action_key = self.action_name.value
+        matches = re.match(f"{action_key}[(]([\\d,\\s]*)[)]", action_str)
+        assert matches
+        positions = [p for p in matches.group(1).split(",") if p.strip()]
+        return ActionInstance(
+            key=self.action_name, value=tuple(sorted(int(p) for p in positions))
+        )
+
+    # ---------
+    # Gym space marshalling - for showing what action is available
+    # ---------
+
+    def get_action_space_possible(self):
+        return spaces.MultiBinary(self.valid_range)
+
+    def to_numpy_data(self, legal_range: CardSubsets) -> np.ndarray:
+        """Return which card is part of any legal subset"""
+        legal = self.to_legal_mask(legal_range)
+        return subset_bits(self.valid_range)[legal].any(axis=0).astype(np.int8)
+
+    def to_numpy_empty_action(self) -> np.ndarray:
+        return [0] * self.valid_range
+
+    def to_legal_mask(self, legal_range: CardSubsets) -> np.ndarray:
+        assert len(legal_range.cards) <= self.valid_range, "Too many cards"
+        return legal_range.constraint.legal_mask(legal_range.cards, self.valid_range)
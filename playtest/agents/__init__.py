@@ -1,5 +1,29 @@
-from .human import HumanAgent
-from .keras_dqn import KerasDQNAgent
-from .trainer import train_agents
+"""Agents, imported on first use
 
-__all__ = ["HumanAgent", "KerasDQNAgent", "train_agents"]
+Keras agents and trainers import tensorflow, which takes seconds and
+hundreds of MB, so e.g. `from playtest.agents import NumpyDQNAgent` only
+imports the modules it needs.
+"""
+import importlib
+
+_MODULES = {
+    "HumanAgent": ".human",
+    "KerasDQNAgent": ".keras_dqn",
+    "MCTSAgent": ".mcts",
+    "NumpyDQNAgent": ".numpy_dqn",
+    "train_agents": ".trainer",
+    "train_agents_async": ".trainer",
+}
+
+__all__ = list(_MODULES.keys())
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+    module = importlib.import_module(_MODULES[name], __name__)
+    return getattr(module, name)
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
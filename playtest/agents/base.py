@@ -1,16 +1,20 @@
-from rl.core import Agent
-
 from playtest.env import GameWrapperEnvironment
 
 
-# TODO: probably should not inherit directly from rl-keras
-class BaseAgent(Agent):
-    """Simple wrapper around rl.keras agent
+class BaseAgent:
+    """Agent playing a seat of the environment
 
-    That provides ability to save and load weights
+    Subclasses implement `forward(observation) -> int`.  Note that this does
+    not depend on rl-keras, so agents without a keras model (e.g. random,
+    MCTS or numpy agents) are played without loading tensorflow.  Keras
+    agents also inherit from the rl-keras agent, e.g. `KerasDQNAgent`.
     """
 
     env: GameWrapperEnvironment
 
     def __init__(self, env):
         self.env = env
+
+    def forward(self, observation) -> int:
+        """Return the action to play, as an int of the action space"""
+        raise NotImplementedError()
@@ -2,17 +2,24 @@
 
 Playing against a human agent
 """
-from pprint import pprint
 import numpy as np
 from typing import List
 
 from playtest.action import InvalidActionError
 from playtest.agents.base import BaseAgent
+from playtest.render import render_state
 
 
 class HumanAgent(BaseAgent):
     """Represent a human agent in the world."""
 
+    # Print what the player can see before asking for an action
+    show_state: bool
+
+    def __init__(self, env, show_state=True):
+        super().__init__(env)
+        self.show_state = show_state
+
     def get_input(self, prompt: str) -> str:
         """Getting input from environment.
 
@@ -27,7 +34,8 @@ class HumanAgent(BaseAgent):
         """
         env = self.env
         assert env.next_player is not None
-        pprint(env.to_player_data(env.next_player))
+        if self.show_state:
+            print(render_state(env.state, player_id=env.next_player))
         prompt = "👀 Please enter action ({}):".format(env.next_accepted_action)
         chosen_action = None
         while not chosen_action:
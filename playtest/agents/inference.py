@@ -0,0 +1,357 @@
+"""Local inference service for the bots of many tables
+
+Each process holding its own `KerasDQNAgent` loads its own copy of the
+model, and runs a forward pass per observation.  An `InferenceService`
+instead loads each model once, in its own process, and agents send it
+their observation (and legal mask) through an `InferenceClient`.  The
+service gathers requests into a batch, up to `max_batch_size` requests or
+until `max_latency` seconds passed since the first one, and runs a single
+forward pass per model.
+
+e.g. for the bots of a tournament or a game server:
+
+    service = InferenceService(make_env, [AgentSpec("dqn", "dqn.h5f")])
+    service.start()
+    agent = InferenceAgent(env, service.client(0), "dqn")
+    ...
+    print(service.stats())
+    service.stop()
+
+Clients are picklable, so they can be handed to worker processes, but each
+client must only be used by a single process at a time.
+"""
+import collections
+import logging
+import multiprocessing as mp
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Counter,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+
+import numpy as np
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.base import BaseAgent
+from playtest.agents.tournament import AgentSpec
+from playtest.agents.numpy_dqn import NumpyDQNAgent
+
+if TYPE_CHECKING:
+    from playtest.agents.keras_dqn import KerasDQNAgent
+
+# Agents with `compute_batch_q_values`
+QValueAgent = Union["KerasDQNAgent", NumpyDQNAgent]
+# (client id, request id, model name, observation, legal mask)
+Request = Tuple[int, int, str, np.ndarray, Optional[np.ndarray]]
+# (request id, action, or the error of the request)
+Response = Tuple[int, Optional[int], Optional[str]]
+
+_STATS = "stats"
+# Seconds to wait for an action, e.g. if the service process died
+RESULT_TIMEOUT = 60.0
+
+
+class InferenceError(RuntimeError):
+    """Raised when the service failed to answer a request"""
+
+    pass
+
+
+@dataclass
+class InferenceStats:
+    """Histograms of the batches run by the service"""
+
+    requests: int = 0
+    # Number of requests in a batch -> number of batches
+    batch_sizes: Counter[int] = field(default_factory=collections.Counter)
+    # Requests left in the queue once a batch is gathered -> number of batches
+    queue_depths: Counter[int] = field(default_factory=collections.Counter)
+
+    @property
+    def batches(self) -> int:
+        return sum(self.batch_sizes.values())
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def __str__(self):
+        lines = [
+            f"{self.requests} requests in {self.batches} batches "
+            f"(mean size {self.mean_batch_size:.1f})"
+        ]
+        for name, histogram in [
+            ("batch size", self.batch_sizes),
+            ("queue depth", self.queue_depths),
+        ]:
+            lines.append(f"{name}:")
+            for value in sorted(histogram.keys()):
+                lines.append("{:>8} {:>8}".format(value, histogram[value]))
+        return "\n".join(lines)
+
+
+def _serve(
+    env_fn: Callable[[], GameWrapperEnvironment],
+    specs: Sequence[AgentSpec],
+    request_queue: mp.Queue,
+    response_queues: Sequence[mp.Queue],
+    stats_queue: mp.Queue,
+    max_batch_size: int,
+    max_latency: float,
+):
+    env = env_fn()
+    agents: Dict[str, QValueAgent] = {
+        spec.name: cast(QValueAgent, spec.build(env)) for spec in specs
+    }
+    stats = InferenceStats()
+    while True:
+        first = request_queue.get()
+        if first is None:
+            return
+        if first == _STATS:
+            stats_queue.put(stats)
+            continue
+
+        batch: List[Request] = [first]
+        deadline = time.monotonic() + max_latency
+        stopping = False
+        while len(batch) < max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = (
+                    request_queue.get(timeout=timeout)
+                    if timeout > 0
+                    else request_queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            if request == _STATS:
+                stats_queue.put(stats)
+                continue
+            batch.append(request)
+
+        try:
+            depth = request_queue.qsize()
+        except NotImplementedError:
+            # e.g. on macOS
+            depth = 0
+        stats.requests += len(batch)
+        stats.batch_sizes[len(batch)] += 1
+        stats.queue_depths[depth] += 1
+
+        by_model: Dict[str, List[Request]] = collections.defaultdict(list)
+        for request in batch:
+            by_model[request[2]].append(request)
+        for model, requests in by_model.items():
+            try:
+                # window_length=1, so each state is a single observation
+                q_values = agents[model].compute_batch_q_values(
+                    [[r[3]] for r in requests]
+                )
+            except Exception as e:
+                # Fail the requests, and keep serving the other clients
+                logging.exception(f"Inference of {model} failed")
+                for client_id, request_id, _, _, _ in requests:
+                    response_queues[client_id].put((request_id, None, repr(e)))
+                continue
+            for (client_id, request_id, _, _, legal_mask), values in zip(
+                requests, q_values
+            ):
+                if legal_mask is not None:
+                    values = np.where(legal_mask, values, -np.inf)
+                response: Response = (request_id, int(np.argmax(values)), None)
+                response_queues[client_id].put(response)
+        if stopping:
+            return
+
+
+class InferenceClient:
+    """Send observations to the `InferenceService`, and wait for actions"""
+
+    client_id: int
+    # Names of the models of the service
+    models: List[str]
+
+    def __init__(
+        self,
+        client_id: int,
+        request_queue: mp.Queue,
+        response_queue: mp.Queue,
+        models: Sequence[str],
+    ):
+        self.client_id = client_id
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.models = list(models)
+        self._next_request_id = 0
+        self._results: Dict[int, Tuple[Optional[int], Optional[str]]] = {}
+
+    def submit(
+        self,
+        model: str,
+        observation: np.ndarray,
+        legal_mask: Optional[np.ndarray] = None,
+    ) -> int:
+        """Queue the observation, return the id of the request for `result`
+
+        :param legal_mask: see `BaseDecision.legal_action_mask`, illegal
+          actions are never picked
+        """
+        if model not in self.models:
+            raise ValueError(f"Unknown model {model}, expected one of {self.models}")
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        self.request_queue.put(
+            (
+                self.client_id,
+                request_id,
+                model,
+                np.asarray(observation),
+                None if legal_mask is None else np.asarray(legal_mask),
+            )
+        )
+        return request_id
+
+    def result(self, request_id: int, timeout: float = RESULT_TIMEOUT) -> int:
+        """Wait for the action of the request
+
+        Raise: InferenceError if the request failed, or got no response
+          within the timeout, e.g. as the service is not running
+        """
+        deadline = time.monotonic() + timeout
+        while request_id not in self._results:
+            try:
+                response_id, action, error = self.response_queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                raise InferenceError(
+                    f"No response to request {request_id} after {timeout}s"
+                )
+            self._results[response_id] = (action, error)
+        action, error = self._results.pop(request_id)
+        if action is None:
+            raise InferenceError(f"Request {request_id} failed: {error}")
+        return action
+
+    def act(
+        self,
+        model: str,
+        observation: np.ndarray,
+        legal_mask: Optional[np.ndarray] = None,
+    ) -> int:
+        return self.result(self.submit(model, observation, legal_mask))
+
+
+class InferenceService:
+    """Process owning one copy of each model, batching requests of clients
+
+    :param env_fn: picklable function creating an environment, to build
+      the agents of the specs
+    :param specs: agents to load, which must have `compute_batch_q_values`
+      (e.g. a `KerasDQNAgent`), by name
+    :param max_clients: number of clients, see `client`
+    :param max_batch_size: number of requests in a forward pass
+    :param max_latency: seconds a request waits for the batch to fill
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable[[], GameWrapperEnvironment],
+        specs: Sequence[AgentSpec],
+        max_clients: int = 64,
+        max_batch_size: int = 64,
+        max_latency: float = 0.002,
+    ):
+        names = [s.name for s in specs]
+        assert len(set(names)) == len(names), f"Model names must be unique: {names}"
+        assert max_batch_size > 0
+        self.env_fn = env_fn
+        self.specs = list(specs)
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        # Queues are created upfront, as they can only be shared with the
+        # service process when it starts
+        self.request_queue: mp.Queue = mp.Queue()
+        self.response_queues: List[mp.Queue] = [mp.Queue() for _ in range(max_clients)]
+        self.stats_queue: mp.Queue = mp.Queue()
+        self._process: Optional[mp.Process] = None
+
+    def client(self, client_id: int) -> InferenceClient:
+        """Return the client with the id, one per process or thread"""
+        return InferenceClient(
+            client_id,
+            self.request_queue,
+            self.response_queues[client_id],
+            [s.name for s in self.specs],
+        )
+
+    def start(self):
+        assert self._process is None, "Service already started"
+        self._process = mp.Process(
+            target=_serve,
+            args=(
+                self.env_fn,
+                self.specs,
+                self.request_queue,
+                self.response_queues,
+                self.stats_queue,
+                self.max_batch_size,
+                self.max_latency,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+
+    def stats(self, timeout: Optional[float] = None) -> InferenceStats:
+        """Return the histograms of the batches so far"""
+        assert self._process is not None, "Service not started"
+        self.request_queue.put(_STATS)
+        return self.stats_queue.get(timeout=timeout)
+
+    def stop(self):
+        """Stop once the requests already queued are answered"""
+        if self._process is None:
+            return
+        self.request_queue.put(None)
+        self._process.join()
+        self._process = None
+
+    def __enter__(self) -> "InferenceService":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class InferenceAgent(BaseAgent):
+    """Agent picking the greedy legal action of a model of the service"""
+
+    client: InferenceClient
+    model: str
+
+    def __init__(
+        self, env: GameWrapperEnvironment, client: InferenceClient, model: str
+    ):
+        super().__init__(env)
+        self.client = client
+        self.model = model
+
+    def forward(self, observation) -> int:
+        decision = self.env.next_accepted_action
+        assert decision is not None
+        return self.client.act(self.model, observation, decision.legal_action_mask())
@@ -1,8 +1,20 @@
 """A simple keras DQN agent
 
 This creates a simple Keras DQN aganet.
+
+With `factored=True`, the network outputs a value for each action type and
+a few heads for each parameter (see
+`BaseDecision.factored_combination_matrix`), which are combined into the
+value of each int action by a fixed layer.  e.g. a bet amount is
+interpolated between 8 heads, rather than having a head per amount.
+Exploration then picks a legal action type, before a legal parameter of
+that type.
 """
 
+from typing import Sequence, Optional, List
+
+import numpy as np
+
 # for training related models
 from keras.models import Sequential
 from keras.layers import Dense, Activation, Flatten
@@ -10,23 +22,58 @@ from keras.optimizers import Adam
 
 from rl.core import Agent
 from rl.agents.dqn import DQNAgent
-from rl.policy import BoltzmannQPolicy
+from rl.policy import Policy, BoltzmannQPolicy
 from rl.memory import SequentialMemory
 
 from gym import Env
 from gym.spaces import flatdim
 
 from playtest.env import GameWrapperEnvironment
+from playtest.action import BaseDecision
 from playtest.agents.base import BaseAgent
 
 
+class FactoredEpsGreedyPolicy(Policy):
+    """Epsilon greedy over the legal actions of the decision
+
+    Explores with a legal action type, then a legal parameter of that type,
+    so that a type with many parameters (e.g. a bet amount) is explored as
+    often as any other type.
+    """
+
+    def __init__(self, eps: float = 0.1):
+        super().__init__()
+        self.eps = eps
+
+    def select_action(self, q_values: np.ndarray, decision: BaseDecision) -> int:
+        if np.random.uniform() < self.eps:
+            type_index = np.random.choice(np.flatnonzero(decision.action_type_mask()))
+            parameter = np.random.choice(
+                np.flatnonzero(decision.parameter_mask(type_index))
+            )
+            return decision.from_factored(type_index, parameter)
+        legal_mask = decision.legal_action_mask()
+        return int(np.argmax(np.where(legal_mask, q_values, -np.inf)))
+
+    def get_config(self):
+        config = super().get_config()
+        config["eps"] = self.eps
+        return config
+
+
 class KerasDQNAgent(BaseAgent, DQNAgent):
 
     env: GameWrapperEnvironment
+    factored: bool
 
-    def __init__(self, env: GameWrapperEnvironment, weight_file=None):
-        """Build a simple DQN model"""
+    def __init__(self, env: GameWrapperEnvironment, weight_file=None, factored=False):
+        """Build a simple DQN model
+
+        :param factored: output the value of action types and parameters,
+          see module documentation
+        """
         BaseAgent.__init__(self, env)
+        self.factored = factored
         nb_actions: int = flatdim(env.action_space)
 
         model = Sequential()
@@ -37,14 +84,30 @@ class KerasDQNAgent(BaseAgent, DQNAgent):
         model.add(Activation("relu"))
         model.add(Dense(16))
         model.add(Activation("relu"))
-        model.add(Dense(nb_actions))
+        if factored:
+            combination = env.decision_class.factored_combination_matrix()
+            model.add(Dense(combination.shape[0]))
+            model.add(
+                Dense(
+                    nb_actions,
+                    trainable=False,
+                    weights=[combination, np.zeros(nb_actions)],
+                )
+            )
+        else:
+            model.add(Dense(nb_actions))
         model.add(Activation("linear"))
         print(model.summary())
 
         # Finally, we configure and compile our agent. You can use every built-in Keras optimizer and
         # even the metrics!
         memory = SequentialMemory(limit=50000, window_length=1)
-        policy = BoltzmannQPolicy()
+        if factored:
+            policy = FactoredEpsGreedyPolicy()
+            test_policy = FactoredEpsGreedyPolicy(eps=0)
+        else:
+            policy = BoltzmannQPolicy()
+            test_policy = None
         DQNAgent.__init__(
             self,
             model=model,
@@ -53,6 +116,7 @@ class KerasDQNAgent(BaseAgent, DQNAgent):
             nb_steps_warmup=10,
             target_model_update=1e-2,
             policy=policy,
+            test_policy=test_policy,
         )
 
         # Ensure we compile an optimizer for target model
@@ -60,3 +124,55 @@ class KerasDQNAgent(BaseAgent, DQNAgent):
 
         if weight_file is not None:
             self.load_weights(weight_file)
+
+    def forward(self, observation) -> int:
+        if not self.factored:
+            return DQNAgent.forward(self, observation)
+        decision = self.env.next_accepted_action
+        assert decision is not None
+        state = self.memory.get_recent_state(observation)
+        q_values = self.compute_q_values(state)
+        policy = self.policy if self.training else self.test_policy
+        action = policy.select_action(q_values=q_values, decision=decision)
+
+        self.recent_observation = observation
+        self.recent_action = action
+        return action
+
+    def get_dense_weights(self) -> List[np.ndarray]:
+        """Weights of the equivalent network of Dense / ReLU layers
+
+        i.e. alternating kernel and bias, with a linear last layer.  For a
+        factored model, the heads and the fixed combination are folded into
+        a single layer.
+        """
+        weights = self.model.get_weights()
+        if self.factored:
+            heads_kernel, heads_bias, combination, combination_bias = weights[-4:]
+            weights = weights[:-4] + [
+                heads_kernel.dot(combination),
+                heads_bias.dot(combination) + combination_bias,
+            ]
+        return weights
+
+    def forward_batch(
+        self,
+        observations: Sequence[np.ndarray],
+        legal_masks: Optional[Sequence[np.ndarray]] = None,
+    ) -> np.ndarray:
+        """Pick greedy actions for a batch of observations
+
+        This runs a single `predict_on_batch` for all observations, which is
+        much cheaper than calling `forward` once per observation.  Note that
+        this does not record `recent_observation`, so it is only meant for
+        evaluation and not for training.
+
+        :param legal_masks: optional boolean masks (see
+          `BaseDecision.legal_action_mask`), illegal actions are never picked.
+        :return: array of int actions, one per observation
+        """
+        # window_length=1, so each state is a single observation
+        q_values = self.compute_batch_q_values([[obs] for obs in observations])
+        if legal_masks is not None:
+            q_values = np.where(np.asarray(legal_masks), q_values, -np.inf)
+        return np.argmax(q_values, axis=1)
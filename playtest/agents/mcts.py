@@ -0,0 +1,247 @@
+"""Information-Set Monte Carlo Tree Search agent
+
+A training-free agent, which searches the game tree with single-observer
+ISMCTS: each iteration samples a determinization of the information set of
+the agent (see `playtest.determinize`), descends the tree over the actions
+legal in that determinization, and runs a random rollout to the end of the
+game.
+
+The agent only sees the state through `InformationSet.from_state`, so it
+never reads hidden information.  Rollouts call the game handlers directly,
+skipping the observation encoding of the environment.
+"""
+import math
+import time
+import random
+import functools
+import multiprocessing as mp
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import enum
+
+import numpy as np
+
+from playtest.state import FullState
+from playtest.action import BaseDecision
+from playtest.game import GameHandler, CompiledGameHandler
+from playtest.determinize import InformationSet
+from playtest.agents.base import BaseAgent
+
+# Value of the state for each player, ideally within [0, 1]
+EvaluateFunction = Callable[[FullState], Sequence[float]]
+# Visits and total value of each action at the root
+RootStats = Dict[int, Tuple[int, float]]
+
+
+class _TreeNode:
+    """Node reached by an action of `player`"""
+
+    __slots__ = ["player", "children", "visits", "total", "availability"]
+
+    def __init__(self, player: Optional[int]):
+        self.player = player
+        self.children: Dict[int, "_TreeNode"] = {}
+        self.visits = 0
+        self.total = 0.0
+        self.availability = 1
+
+    def ucb(self, exploration: float) -> float:
+        return self.total / self.visits + exploration * math.sqrt(
+            math.log(self.availability) / self.visits
+        )
+
+
+def _legal_actions(decision: BaseDecision) -> List[int]:
+    return [int(a) for a in np.flatnonzero(decision.legal_action_mask())]
+
+
+@dataclass
+class ISMCTSearch:
+    """Search configuration, which is sent to the worker processes"""
+
+    game_handler: GameHandler
+    evaluate_fn: EvaluateFunction
+    exploration: float = 0.7
+    max_rollout_steps: int = 200
+
+    def run(
+        self,
+        info_set: InformationSet,
+        game_state: enum.Enum,
+        decision: BaseDecision,
+        iterations: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        seed: Optional[int] = None,
+    ) -> RootStats:
+        """Search from the decision of the player of the information set"""
+        assert iterations or time_budget, "Must provide a budget"
+        rng = random.Random(seed)
+        determinizations = info_set.iter_determinize(
+            np.random.RandomState(seed), batch_size=min(iterations or 256, 256)
+        )
+        root = _TreeNode(None)
+        deadline = time.perf_counter() + time_budget if time_budget else None
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            s = next(determinizations)
+            self._iterate(root, s, info_set.player_id, game_state, decision, rng)
+            iteration += 1
+        return {a: (c.visits, c.total) for a, c in root.children.items()}
+
+    def _apply(self, s: FullState, game_state: enum.Enum, decision, action: int):
+        return self.game_handler.handle(s, game_state, decision.from_int(action))
+
+    def _iterate(
+        self,
+        root: _TreeNode,
+        s: FullState,
+        player: Optional[int],
+        game_state: enum.Enum,
+        decision: Optional[BaseDecision],
+        rng: random.Random,
+    ):
+        node = root
+        path = [root]
+
+        # Selection and expansion, over the actions legal in this determinization
+        while decision is not None:
+            legal = _legal_actions(decision)
+            untried = [a for a in legal if a not in node.children]
+            for a in legal:
+                if a in node.children:
+                    node.children[a].availability += 1
+            if untried:
+                action = rng.choice(untried)
+                node.children[action] = _TreeNode(player)
+            else:
+                action = max(
+                    legal, key=lambda a: node.children[a].ucb(self.exploration)
+                )
+            s, decision, game_state, player = self._apply(
+                s, game_state, decision, action
+            )
+            node = node.children[action]
+            path.append(node)
+            if untried:
+                break
+
+        # Rollout
+        steps = 0
+        while decision is not None and steps < self.max_rollout_steps:
+            action = rng.choice(_legal_actions(decision))
+            s, decision, game_state, player = self._apply(
+                s, game_state, decision, action
+            )
+            steps += 1
+
+        values = self.evaluate_fn(s)
+        for n in path:
+            n.visits += 1
+            if n.player is not None:
+                n.total += values[n.player]
+
+
+class MCTSAgent(BaseAgent):
+    """Pick the most visited action of an ISMCTS search
+
+    :param evaluate_fn: value of a final state for each player, e.g. 1 for
+      the winner and 0 otherwise
+    :param iterations: number of iterations of the search, per decision
+    :param time_budget: seconds of search, per decision
+    :param processes: number of processes searching independent trees
+      (root parallelism), which are merged by summing the visits
+    """
+
+    search: ISMCTSearch
+    iterations: Optional[int]
+    time_budget: Optional[float]
+    processes: int
+
+    # Statistics of the last search, for inspection
+    last_stats: RootStats
+
+    def __init__(
+        self,
+        env,
+        evaluate_fn: EvaluateFunction,
+        iterations: Optional[int] = 1000,
+        time_budget: Optional[float] = None,
+        processes: int = 1,
+        exploration: float = 0.7,
+        max_rollout_steps: int = 200,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(env)
+        assert iterations or time_budget, "Must provide a budget"
+        game_handler = env.game_handler
+        if isinstance(game_handler, CompiledGameHandler):
+            # Do not count the transitions of the search with the game ones
+            game_handler = game_handler.game_handler
+        self.search = ISMCTSearch(
+            game_handler,
+            evaluate_fn,
+            exploration=exploration,
+            max_rollout_steps=max_rollout_steps,
+        )
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.processes = processes
+        self.rng = random.Random(seed)
+        self.last_stats = {}
+        self._pool: Optional[mp.pool.Pool] = None
+
+    def forward(self, observation) -> int:
+        env = self.env
+        decision = env.next_accepted_action
+        assert decision is not None
+        legal = _legal_actions(decision)
+        if len(legal) == 1:
+            self.last_stats = {}
+            return legal[0]
+
+        info_set = InformationSet.from_state(env.state, env.next_player)
+        if self.processes > 1:
+            stats = self._search_parallel(info_set, env.current_state, decision)
+        else:
+            stats = self.search.run(
+                info_set,
+                env.current_state,
+                decision,
+                iterations=self.iterations,
+                time_budget=self.time_budget,
+                seed=self.rng.randrange(1 << 31),
+            )
+        self.last_stats = stats
+        return max(stats.keys(), key=lambda a: stats[a][0])
+
+    def _search_parallel(
+        self, info_set: InformationSet, game_state: enum.Enum, decision: BaseDecision
+    ) -> RootStats:
+        if self._pool is None:
+            self._pool = mp.Pool(self.processes)
+        iterations = None
+        if self.iterations:
+            iterations = -(-self.iterations // self.processes)
+        run = functools.partial(
+            self.search.run,
+            info_set,
+            game_state,
+            decision,
+            iterations,
+            self.time_budget,
+        )
+        seeds = [self.rng.randrange(1 << 31) for _ in range(self.processes)]
+        merged: RootStats = {}
+        for stats in self._pool.map(run, seeds):
+            for action, (visits, total) in stats.items():
+                old_visits, old_total = merged.get(action, (0, 0.0))
+                merged[action] = (old_visits + visits, old_total + total)
+        return merged
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
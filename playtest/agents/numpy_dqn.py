@@ -0,0 +1,195 @@
+"""Play a trained DQN agent with numpy only
+
+Loading a `KerasDQNAgent` imports keras, keras-rl and tensorflow, which
+takes seconds and hundreds of MB per process, just to run a few small
+Dense layers.  Instead, export the trained network once:
+
+    export_weights(keras_agent, "blackjack_dnq.npz")
+
+and play it with a `NumpyDQNAgent`, which never imports tensorflow:
+
+    agent = NumpyDQNAgent(env, "blackjack_dnq.npz")
+
+Weights can be stored as float16, or as int8 with a scale per output
+unit, for a smaller file and memory footprint.  The forward pass itself
+always runs in float32.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+from gym.spaces import flatdim
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.base import BaseAgent
+
+NUMPY_EXTENSION = ".npz"
+PRECISIONS = ("float32", "float16", "int8")
+
+
+class DenseNetwork:
+    """Forward pass of the Dense / ReLU network built by KerasDQNAgent
+
+    i.e. each layer is `relu(x.dot(kernel) + bias)`, and the last layer is
+    linear.  An int8 kernel is multiplied by its scale, of each output.
+    """
+
+    precision: str
+    kernels: List[np.ndarray]
+    biases: List[np.ndarray]
+    scales: List[Optional[np.ndarray]]
+
+    def __init__(
+        self,
+        kernels: Sequence[np.ndarray],
+        biases: Sequence[np.ndarray],
+        scales: Optional[Sequence[Optional[np.ndarray]]] = None,
+    ):
+        assert kernels and len(kernels) == len(biases)
+        self.kernels = list(kernels)
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.scales = list(scales) if scales is not None else [None] * len(kernels)
+        self.precision = str(self.kernels[0].dtype)
+        assert self.precision in PRECISIONS, f"Unknown precision {self.precision}"
+
+    @classmethod
+    def from_weights(cls, weights: Sequence[np.ndarray]) -> "DenseNetwork":
+        """From alternating kernel and bias, e.g. `get_dense_weights()`"""
+        assert len(weights) % 2 == 0, "Expect a kernel and a bias per layer"
+        return cls(
+            [np.asarray(k, dtype=np.float32) for k in weights[::2]], weights[1::2]
+        )
+
+    @property
+    def input_size(self) -> int:
+        return self.kernels[0].shape[0]
+
+    @property
+    def output_size(self) -> int:
+        return self.kernels[-1].shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = self.kernels + self.biases + [s for s in self.scales if s is not None]
+        return sum(a.nbytes for a in arrays)
+
+    def quantize(self, precision: str) -> "DenseNetwork":
+        """Return the network with kernels stored at the precision"""
+        assert precision in PRECISIONS, f"Unknown precision {precision}"
+        kernels = [self._kernel(i) for i in range(len(self.kernels))]
+        if precision != "int8":
+            return DenseNetwork([k.astype(precision) for k in kernels], self.biases)
+        scales = []
+        quantized = []
+        for kernel in kernels:
+            scale = np.abs(kernel).max(axis=0) / 127
+            scale[scale == 0] = 1
+            quantized.append(np.round(kernel / scale).astype(np.int8))
+            scales.append(scale.astype(np.float32))
+        return DenseNetwork(quantized, self.biases, scales)
+
+    def _kernel(self, i: int) -> np.ndarray:
+        kernel = self.kernels[i].astype(np.float32, copy=False)
+        if self.scales[i] is not None:
+            kernel = kernel * self.scales[i]
+        return kernel
+
+    def __call__(self, observations) -> np.ndarray:
+        """Return the q values, of shape (number of observations, outputs)"""
+        x = np.asarray(observations, dtype=np.float32)
+        x = x.reshape(len(x), -1)
+        last = len(self.kernels) - 1
+        for i, (kernel, bias, scale) in enumerate(
+            zip(self.kernels, self.biases, self.scales)
+        ):
+            x = x.dot(kernel.astype(np.float32, copy=False))
+            if scale is not None:
+                x *= scale
+            x += bias
+            if i < last:
+                x = np.maximum(x, 0)
+        return x
+
+    def save(self, filename: str):
+        arrays = {}
+        for i, (kernel, bias, scale) in enumerate(
+            zip(self.kernels, self.biases, self.scales)
+        ):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+            if scale is not None:
+                arrays[f"scale_{i}"] = scale
+        np.savez(filename, **arrays)
+
+    @classmethod
+    def load(cls, filename: str) -> "DenseNetwork":
+        with np.load(filename) as data:
+            layers = len([f for f in data.files if f.startswith("kernel_")])
+            return cls(
+                [data[f"kernel_{i}"] for i in range(layers)],
+                [data[f"bias_{i}"] for i in range(layers)],
+                [
+                    data[f"scale_{i}"] if f"scale_{i}" in data.files else None
+                    for i in range(layers)
+                ],
+            )
+
+
+def export_weights(agent, filename: str, precision: str = "float32"):
+    """Save the network of a trained `KerasDQNAgent` for `NumpyDQNAgent`"""
+    assert filename.endswith(
+        NUMPY_EXTENSION
+    ), f"{filename} should end with {NUMPY_EXTENSION} extension"
+    network = DenseNetwork.from_weights(agent.get_dense_weights())
+    network.quantize(precision).save(filename)
+
+
+class NumpyDQNAgent(BaseAgent):
+    """Greedy legal action of a network exported with `export_weights`
+
+    :param precision: quantize the weights when loading, e.g. "int8"
+    """
+
+    network: DenseNetwork
+
+    def __init__(
+        self,
+        env: GameWrapperEnvironment,
+        weight_file: str,
+        precision: Optional[str] = None,
+    ):
+        super().__init__(env)
+        network = DenseNetwork.load(weight_file)
+        if precision is not None and precision != network.precision:
+            network = network.quantize(precision)
+        assert network.input_size == flatdim(
+            env.observation_space
+        ), f"{weight_file} does not match the observation space"
+        assert network.output_size == flatdim(
+            env.action_space
+        ), f"{weight_file} does not match the action space"
+        self.network = network
+
+    def forward(self, observation) -> int:
+        decision = self.env.next_accepted_action
+        assert decision is not None
+        return int(self.forward_batch([observation], [decision.legal_action_mask()])[0])
+
+    def compute_batch_q_values(self, state_batch) -> np.ndarray:
+        """Same as `KerasDQNAgent`, e.g. for the `InferenceService`"""
+        return self.network(state_batch)
+
+    def forward_batch(
+        self,
+        observations: Sequence[np.ndarray],
+        legal_masks: Optional[Sequence[np.ndarray]] = None,
+    ) -> np.ndarray:
+        """Pick greedy actions for a batch of observations
+
+        :param legal_masks: optional boolean masks (see
+          `BaseDecision.legal_action_mask`), illegal actions are never picked.
+        :return: array of int actions, one per observation
+        """
+        q_values = self.network(observations)
+        if legal_masks is not None:
+            q_values = np.where(np.asarray(legal_masks), q_values, -np.inf)
+        return np.argmax(q_values, axis=1)
@@ -0,0 +1,14 @@
+"""A random agent
+
+Picks a random legal action, useful as a baseline.
+"""
+from playtest.agents.base import BaseAgent
+
+
+class RandomAgent(BaseAgent):
+    """Pick a random legal action out of the current decision"""
+
+    def forward(self, observation) -> int:
+        decision = self.env.next_accepted_action
+        assert decision is not None
+        return decision.to_int(decision.pick_random_action())
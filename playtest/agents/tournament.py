@@ -0,0 +1,288 @@
+"""Tournament between saved agents
+
+Rank a set of agents by playing round-robin matches across a process pool.
+Each worker owns its own environment, and builds (e.g. loads the `.h5f`
+weights of) each agent at most once.
+"""
+import collections
+import itertools
+import math
+import multiprocessing as mp
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from playtest.env import GameWrapperEnvironment, EnvironmentInteration
+from playtest.agents.base import BaseAgent
+from playtest.agents.random import RandomAgent
+
+
+DEFAULT_ELO = 1500.0
+# Draws of each agent against a virtual agent of the default rating, so
+# that an agent which won (or lost) every game still gets a finite rating
+ELO_PRIOR_GAMES = 1.0
+ELO_MAX_ITERATIONS = 10000
+# Z score for the 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+# Score of each seat, from the env at the end of the game
+ScoreFunction = Callable[[GameWrapperEnvironment], List[float]]
+
+
+@dataclass
+class AgentSpec:
+    """Describe how to build an agent within a worker
+
+    Either provide a `weight_file` for a `KerasDQNAgent` (or a `.npz` file
+    exported for a `NumpyDQNAgent`), or a `factory` taking the environment.
+    Note the factory must be picklable, e.g. a module level function or
+    class.
+    """
+
+    name: str
+    weight_file: Optional[str] = None
+    factory: Optional[Callable[[GameWrapperEnvironment], BaseAgent]] = None
+
+    def build(self, env: GameWrapperEnvironment) -> BaseAgent:
+        if self.factory is not None:
+            return self.factory(env)
+        assert self.weight_file is not None, f"{self.name} needs factory or weight"
+        from playtest.agents.numpy_dqn import NUMPY_EXTENSION, NumpyDQNAgent
+
+        if self.weight_file.endswith(NUMPY_EXTENSION):
+            return NumpyDQNAgent(env, self.weight_file)
+        # Only import tensorflow related models when required
+        from playtest.agents.keras_dqn import KerasDQNAgent
+
+        return KerasDQNAgent(env, weight_file=self.weight_file)
+
+
+RANDOM_AGENT = AgentSpec("random", factory=RandomAgent)
+
+
+@dataclass
+class MatchResult:
+    """Result of one game, with agent names in seat order"""
+
+    seats: Tuple[str, ...]
+    scores: List[float]
+
+    @property
+    def winner(self) -> Optional[str]:
+        """The seat with the unique highest score, None on a draw"""
+        best = max(self.scores)
+        if self.scores.count(best) > 1:
+            return None
+        return self.seats[self.scores.index(best)]
+
+
+@dataclass
+class TournamentReport:
+    ratings: Dict[str, float]
+    # name -> (win rate, lower bound, upper bound)
+    win_rates: Dict[str, Tuple[float, float, float]]
+    games: Dict[str, int]
+    results: List[MatchResult] = field(default_factory=list)
+
+    def ranking(self) -> List[str]:
+        return sorted(self.ratings.keys(), key=lambda n: self.ratings[n], reverse=True)
+
+    def __str__(self):
+        lines = [
+            "{:<24} {:>7} {:>6} {:>17}".format("agent", "elo", "games", "win rate")
+        ]
+        for name in self.ranking():
+            rate, low, high = self.win_rates[name]
+            lines.append(
+                "{:<24} {:>7.1f} {:>6} {:>5.2f} [{:.2f}-{:.2f}]".format(
+                    name, self.ratings[name], self.games[name], rate, low, high
+                )
+            )
+        return "\n".join(lines)
+
+
+def wilson_interval(wins: float, games: int, z=CONFIDENCE_Z) -> Tuple[float, float]:
+    """Confidence interval of a win rate, see Wilson score interval"""
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denominator = 1 + z ** 2 / games
+    centre = (p + z ** 2 / (2 * games)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / games + z ** 2 / (4 * games ** 2))
+    return (
+        max(0.0, centre - margin / denominator),
+        min(1.0, centre + margin / denominator),
+    )
+
+
+def fit_ratings(
+    names: Sequence[str],
+    pair_wins: Dict[Tuple[str, str], float],
+    prior_games=ELO_PRIOR_GAMES,
+    tolerance=1e-10,
+) -> Dict[str, float]:
+    """Elo ratings of the maximum likelihood fit of the Bradley-Terry model
+
+    i.e. `a` beats `b` with a probability of
+    `1 / (1 + 10 ** ((b - a) / 400))`.  The ratings are fitted over all the
+    games at once, so they do not depend on the order of the games, unlike
+    updating Elo ratings after each game.
+
+    :param pair_wins: wins of `a` against `b` by `(a, b)`, a draw being half
+      a win for each
+    """
+    index = {n: i for i, n in enumerate(names)}
+    wins = np.full(len(names), prior_games / 2)
+    games = np.zeros((len(names), len(names)))
+    for (a, b), won in pair_wins.items():
+        wins[index[a]] += won
+        games[index[a], index[b]] += won
+        games[index[b], index[a]] += won
+
+    # Minorization-maximization updates of the strengths, see Hunter (2004),
+    # the virtual agent of the prior having a strength of 1
+    strengths = np.ones(len(names))
+    for _ in range(ELO_MAX_ITERATIONS):
+        pair_sums = strengths[:, None] + strengths[None, :]
+        denominator = (games / pair_sums).sum(axis=1) + prior_games / (strengths + 1)
+        updated = wins / denominator
+        converged = np.abs(updated - strengths).max() < tolerance
+        strengths = updated
+        if converged:
+            break
+    return {n: DEFAULT_ELO + 400 * math.log10(strengths[index[n]]) for n in names}
+
+
+def rate_results(
+    names: Sequence[str], results: Sequence[MatchResult], prior_games=ELO_PRIOR_GAMES
+) -> TournamentReport:
+    """Compute Elo ratings and win rates out of a sequence of results
+
+    Games with more than two players are counted as a pairwise result
+    between every two seats.  A draw counts as half a win.  Ratings are
+    fitted over all the results, see `fit_ratings`.
+    """
+    pair_wins: Dict[Tuple[str, str], float] = collections.defaultdict(float)
+    wins = {n: 0.0 for n in names}
+    games = {n: 0 for n in names}
+
+    for result in results:
+        for a, b in itertools.combinations(range(len(result.seats)), 2):
+            name_a, name_b = result.seats[a], result.seats[b]
+            score_a, score_b = result.scores[a], result.scores[b]
+            actual_a = 1.0 if score_a > score_b else 0.5 if score_a == score_b else 0.0
+            pair_wins[name_a, name_b] += actual_a
+            pair_wins[name_b, name_a] += 1 - actual_a
+
+        winner = result.winner
+        best = max(result.scores)
+        for name, score in zip(result.seats, result.scores):
+            games[name] += 1
+            if winner == name:
+                wins[name] += 1
+            elif winner is None and score == best:
+                # Tied for the first place
+                wins[name] += 0.5
+
+    ratings = fit_ratings(names, pair_wins, prior_games)
+    win_rates = {}
+    for name in names:
+        rate = wins[name] / games[name] if games[name] else 0.0
+        win_rates[name] = (rate, *wilson_interval(wins[name], games[name]))
+    return TournamentReport(
+        ratings=ratings, win_rates=win_rates, games=games, results=list(results)
+    )
+
+
+# ---------
+# Process pool workers
+# ---------
+
+_worker_env_fn: Optional[Callable[[], GameWrapperEnvironment]] = None
+_worker_agents: Dict[str, BaseAgent] = {}
+
+
+def _init_worker(env_fn: Callable[[], GameWrapperEnvironment]):
+    global _worker_env_fn, _worker_agents
+    _worker_env_fn = env_fn
+    _worker_agents = {}
+
+
+def _play_match(
+    specs: Sequence[AgentSpec],
+    max_steps: Optional[int],
+    score_fn: Optional[ScoreFunction],
+) -> MatchResult:
+    assert _worker_env_fn is not None, "Worker not initialized"
+    env = _worker_env_fn()
+
+    agents = []
+    for spec in specs:
+        if spec.name not in _worker_agents:
+            _worker_agents[spec.name] = spec.build(env)
+        agent = _worker_agents[spec.name]
+        # Agents are built once, but play on a fresh environment each game
+        agent.env = env
+        agents.append(agent)
+
+    game = EnvironmentInteration(env, agents, episodes=1, rounds=max_steps)
+    rewards = list(game.iter_episodes())[0].rewards
+    scores: List[float] = (
+        score_fn(env) if score_fn is not None else [float(r) for r in rewards]
+    )
+    return MatchResult(seats=tuple(s.name for s in specs), scores=scores)
+
+
+class Tournament:
+    """Round-robin tournament between agents
+
+    Every group of `n_agents` agents plays `games_per_seating` games in
+    each rotation of their seats.
+
+    :param env_fn: picklable function creating a new environment
+    :param score_fn: optional function of the env at the end of the game,
+      returning the score of each seat.  Defaults to the episode rewards.
+    :param max_steps: cut a game after the number of steps
+    """
+
+    def __init__(
+        self,
+        env_fn: Callable[[], GameWrapperEnvironment],
+        specs: Sequence[AgentSpec],
+        games_per_seating=10,
+        score_fn: Optional[ScoreFunction] = None,
+        max_steps: Optional[int] = None,
+        processes: Optional[int] = None,
+    ):
+        names = [s.name for s in specs]
+        assert len(set(names)) == len(names), f"Agent names must be unique: {names}"
+        self.env_fn = env_fn
+        self.specs = list(specs)
+        self.games_per_seating = games_per_seating
+        self.score_fn = score_fn
+        self.max_steps = max_steps
+        self.processes = processes
+
+    def schedule(self, n_agents: int) -> List[Tuple[AgentSpec, ...]]:
+        matches = []
+        for group in itertools.combinations(self.specs, n_agents):
+            for shift in range(n_agents):
+                seating = group[shift:] + group[:shift]
+                matches.extend([seating] * self.games_per_seating)
+        return matches
+
+    def run(self) -> TournamentReport:
+        n_agents = self.env_fn().n_agents
+        assert len(self.specs) >= n_agents, f"Requires at least {n_agents} agents"
+        matches = self.schedule(n_agents)
+
+        with mp.Pool(
+            self.processes, initializer=_init_worker, initargs=(self.env_fn,)
+        ) as pool:
+            results = pool.starmap(
+                _play_match,
+                [(specs, self.max_steps, self.score_fn) for specs in matches],
+            )
+
+        return rate_results([s.name for s in self.specs], results)
@@ -1,16 +1,19 @@
-from typing import Sequence, List
+from typing import TYPE_CHECKING, Sequence, List, Optional, Tuple
+import logging
+import multiprocessing as mp
+import queue
 import numpy as np
 import pdb, traceback, sys
 
-# This is dependent on work from
-# https://github.com/keras-rl/keras-rl/compare/master...dat-boris:add-multi-agent
-# TODO: port this to rllib, which seems to already have good multi-agent support
-from rl.agents.multi import MultiAgent
-from keras.optimizers import Adam
+from playtest.env import GameWrapperEnvironment
+from playtest.components.card import OutOfCardsError
+from playtest.agents.numpy_dqn import DenseNetwork
 
+if TYPE_CHECKING:
+    from playtest.agents.keras_dqn import KerasDQNAgent
 
-from playtest.env import GameWrapperEnvironment
-from playtest.agents.base import BaseAgent
+# (player id, observation, action, reward, terminal)
+Transition = Tuple[int, np.ndarray, int, float, bool]
 
 
 DEFAULT_NB_STEPS = 500000
@@ -18,11 +21,19 @@ DEFAULT_NB_STEPS = 500000
 
 def train_agents(
     env: GameWrapperEnvironment,
-    agents: Sequence[BaseAgent],
+    agents: Sequence["KerasDQNAgent"],
     save_filenames: List[str],
     nb_steps=DEFAULT_NB_STEPS,
     is_pdb=False,
 ):
+    # Only import tensorflow when training, so that actor processes of
+    # `train_agents_async` never do.
+    # This is dependent on work from
+    # https://github.com/keras-rl/keras-rl/compare/master...dat-boris:add-multi-agent
+    # TODO: port this to rllib, which seems to already have good multi-agent support
+    from rl.agents.multi import MultiAgent
+    from keras.optimizers import Adam
+
     assert save_filenames, "Must save at last one agent"
     assert all(
         [s.endswith(".h5f") for s in save_filenames]
@@ -49,7 +60,207 @@ def train_agents(
             pdb.post_mortem(tb)
         raise ex
 
+    save_agents(agents, save_filenames)
+
+
+def save_agents(agents: Sequence["KerasDQNAgent"], save_filenames: List[str]):
     for i, file_name in enumerate(save_filenames):
         model = agents[i]
         print(f"Saving model {model} filename: {file_name}")
         model.save_weights(file_name, overwrite=True)
+
+
+# ---------
+# Asynchronous actor / learner training
+# ---------
+
+
+def _actor_loop(
+    actor_id: int,
+    env: GameWrapperEnvironment,
+    weight_queue: mp.Queue,
+    experience_queue: mp.Queue,
+    stop_event,
+    epsilon: float,
+    seed: int,
+):
+    """Generate episodes with the latest weights broadcasted by the learner
+
+    A transition of a player is completed on their next turn, with the
+    rewards they got in between, or at the end of the game for every player,
+    with their final reward.  The transitions of each game are sent once
+    the game ends:
+        (actor id, [(player_id, observation, action, reward, terminal)])
+    """
+    np.random.seed(seed + actor_id)
+    env.seed(seed + actor_id)
+    networks = [DenseNetwork.from_weights(w) for w in weight_queue.get()]
+
+    obs_n = env.reset()
+    # Last observation, action and reward so far of each player
+    pending: List[Optional[list]] = [None] * env.n_agents
+    transitions: List[Transition] = []
+
+    def end_game():
+        nonlocal transitions
+        for player_id, last in enumerate(pending):
+            if last is not None:
+                transitions.append((player_id, last[0], last[1], last[2], True))
+        pending[:] = [None] * env.n_agents
+        experience_queue.put((actor_id, transitions))
+        transitions = []
+
+    while not stop_event.is_set():
+        try:
+            networks = [DenseNetwork.from_weights(w) for w in weight_queue.get_nowait()]
+        except queue.Empty:
+            pass
+
+        player_id = env.next_player
+        decision = env.next_accepted_action
+        assert decision is not None
+        legal_mask = decision.legal_action_mask()
+        if np.random.uniform() < epsilon:
+            action = int(np.random.choice(np.flatnonzero(legal_mask)))
+        else:
+            q_values = networks[player_id]([obs_n[player_id]])[0]
+            action = int(np.argmax(np.where(legal_mask, q_values, -np.inf)))
+
+        last = pending[player_id]
+        if last is not None:
+            transitions.append((player_id, last[0], last[1], last[2], False))
+        pending[player_id] = [obs_n[player_id], action, 0]
+
+        action_n: List[Optional[int]] = [None] * env.n_agents
+        action_n[player_id] = action
+        try:
+            obs_n, reward_n, done_n, _ = env.step(action_n)
+        except OutOfCardsError as ex:
+            # The game cannot progress further, so it ends without rewards
+            logging.warning(f"Actor {actor_id} restarting episode: {ex}")
+            end_game()
+            obs_n = env.reset()
+
+        for p, last in enumerate(pending):
+            if last is not None:
+                last[2] += reward_n[p]
+        if all(done_n):
+            end_game()
+            obs_n = env.reset()
+
+
+def train_agents_async(
+    env: GameWrapperEnvironment,
+    agents: Sequence["KerasDQNAgent"],
+    save_filenames: List[str],
+    nb_steps=DEFAULT_NB_STEPS,
+    nb_actors=4,
+    broadcast_interval=1000,
+    epsilon=0.1,
+    seed=123,
+):
+    """Train agents with actor processes feeding a single learner
+
+    Each actor plays its own copy of `env` with the latest broadcasted
+    weights (a numpy forward pass, so actors never touch TensorFlow),
+    and sends the transitions of each game through a queue.  The learner,
+    in this process, trains the agents on the transitions.  Weights are
+    broadcasted to actors every `broadcast_interval` learner steps.
+
+    The memory of an agent pairs each observation with the next one
+    appended, so the transitions of a player in a game are appended in a
+    row, up to the terminal one.
+
+    :param agents: one compiled agent per player, as in `train_agents`
+    """
+    assert save_filenames, "Must save at last one agent"
+    assert all(
+        [s.endswith(".h5f") for s in save_filenames]
+    ), f"{save_filenames} should all end with h5f extension"
+    assert len(agents) == env.n_agents, "Must provide one agent per player"
+    assert all(
+        [getattr(a, "target_model", None) for a in agents]
+    ), "Must have compiled the model"
+    np.random.seed(seed)
+
+    def get_weights():
+        return [a.get_dense_weights() for a in agents]
+
+    # Tensorflow is already loaded, which is not safe to fork
+    context = mp.get_context("spawn")
+    experience_queue: mp.Queue = context.Queue(maxsize=nb_actors * 4)
+    weight_queues: List[mp.Queue] = [context.Queue(maxsize=1) for _ in range(nb_actors)]
+    stop_event = context.Event()
+
+    initial_weights = get_weights()
+    actors = []
+    for actor_id in range(nb_actors):
+        weight_queues[actor_id].put(initial_weights)
+        actor = context.Process(  # type: ignore
+            target=_actor_loop,
+            args=(
+                actor_id,
+                env,
+                weight_queues[actor_id],
+                experience_queue,
+                stop_event,
+                epsilon,
+                seed,
+            ),
+            daemon=True,
+        )
+        actor.start()
+        actors.append(actor)
+
+    for agent in agents:
+        agent.training = True
+
+    try:
+        step = 0
+        while step < nb_steps:
+            try:
+                _, transitions = experience_queue.get(timeout=1)
+            except queue.Empty:
+                if not any([a.is_alive() for a in actors]):
+                    raise RuntimeError("All actors exited before training finished")
+                continue
+            # By player, keeping the order of the game
+            transitions = sorted(transitions, key=lambda t: t[0])
+            for player_id, obs, action, reward, terminal in transitions:
+                agent = agents[player_id]
+                memory = agent.memory
+                if memory.nb_entries < memory.window_length + 1:
+                    # Not enough entries to sample a batch yet
+                    memory.append(obs, action, reward, terminal)
+                else:
+                    agent.recent_observation = obs
+                    agent.recent_action = action
+                    agent.backward(reward, terminal)
+                if terminal:
+                    # As keras-rl on the end of an episode: the observation
+                    # after a terminal one is never the start of a sample
+                    memory.append(obs, action, 0.0, False)
+                agent.step += 1
+                step += 1
+
+                if step % broadcast_interval == 0:
+                    weights = get_weights()
+                    for weight_queue in weight_queues:
+                        # Replace any stale weights not yet picked up
+                        try:
+                            weight_queue.get_nowait()
+                        except queue.Empty:
+                            pass
+                        weight_queue.put(weights)
+    finally:
+        stop_event.set()
+        # Unblock actors waiting to put experience
+        while any([a.is_alive() for a in actors]):
+            try:
+                experience_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for actor in actors:
+            actor.join()
+
+    save_agents(agents, save_filenames)
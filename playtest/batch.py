@@ -0,0 +1,230 @@
+"""Store a batch of states column-wise
+
+`BatchedState` keeps the numeric content of many `FullState` of the same
+class, with one numpy array per field and a leading game axis:
+
+* int fields: (games,)
+* components (e.g. Token, Counter): (games, len(value))
+* decks: (games, max_size, card data), padded with the card null data,
+  along with the number of cards in `deck_sizes`
+
+Player fields have an extra player axis after the game axis, and are
+named with a `players.` prefix.
+
+Vectorized game logic can update all games at once through `columns`,
+while existing handlers can still work on a single game through `edit`.
+"""
+import contextlib
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from .components.core import Component
+from .components.card import Deck
+from .state import FullState, SubState, Visibility
+
+PLAYER_PREFIX = "players."
+
+
+def _field_shape(value) -> Tuple[int, ...]:
+    if isinstance(value, Deck):
+        card_width = len(value.generic_card.get_null_data())
+        return (value.get_max_size(), card_width)
+    if isinstance(value, Component):
+        return (len(value.to_data()),)
+    assert isinstance(value, int), f"Unsupported field value: {value}"
+    return ()
+
+
+class BatchedState:
+    """Column-wise store of the numeric content of many games
+
+    :param template: state used to define the fields, and the initial
+      value of every game
+    """
+
+    state_class: Type[FullState]
+    number_of_games: int
+    number_of_players: int
+    columns: Dict[str, np.ndarray]
+    deck_sizes: Dict[str, np.ndarray]
+    visibility: Dict[str, Visibility]
+    # State filled in place by `edit`, rather than a new state each time
+    _edited_state: Optional[FullState]
+    # Cards by their data, as decks are refilled on every edit
+    _cards: Dict[Tuple[int, ...], Any]
+
+    def __init__(self, template: FullState, number_of_games: int):
+        self.state_class = template.__class__
+        self.number_of_games = number_of_games
+        self.number_of_players = template.number_of_players
+        self.columns = {}
+        self.deck_sizes = {}
+        self.visibility = {}
+        self._edited_state = None
+        self._cards = {}
+
+        leading_axes = {
+            "": (number_of_games,),
+            PLAYER_PREFIX: (number_of_games, self.number_of_players),
+        }
+        sub_states: List[Tuple[str, SubState]] = [("", template)]
+        if self.number_of_players:
+            sub_states.append((PLAYER_PREFIX, template.players[0]))
+        for prefix, sub_state in sub_states:
+            for name, visibility in sub_state.visibility.items():
+                value = getattr(sub_state, name)
+                column_name = prefix + name
+                self.visibility[column_name] = visibility
+                self.columns[column_name] = np.zeros(
+                    leading_axes[prefix] + _field_shape(value), dtype=np.int64
+                )
+                if isinstance(value, Deck):
+                    self.deck_sizes[column_name] = np.zeros(
+                        leading_axes[prefix], dtype=np.int64
+                    )
+
+        if number_of_games:
+            self.set_state(0, template)
+            for column in list(self.columns.values()) + list(self.deck_sizes.values()):
+                column[1:] = column[0]
+
+    @classmethod
+    def from_states(cls, states: Sequence[FullState]) -> "BatchedState":
+        assert states, "Requires at least one state"
+        batch = cls(states[0], len(states))
+        for i, state in enumerate(states[1:], start=1):
+            batch.set_state(i, state)
+        return batch
+
+    def __len__(self):
+        return self.number_of_games
+
+    # ---------
+    # Single game access
+    # ---------
+
+    def _set_sub_state(self, index: Tuple, prefix: str, sub_state: SubState):
+        for name in sub_state.visibility.keys():
+            column_name = prefix + name
+            value = getattr(sub_state, name)
+            column = self.columns[column_name]
+            if isinstance(value, Deck):
+                size = len(value)
+                column[index] = value.generic_card.get_null_data()
+                if size:
+                    column[index][:size] = value.to_data()
+                self.deck_sizes[column_name][index] = size
+            elif isinstance(value, Component):
+                column[index] = value.to_data()
+            else:
+                column[index] = value
+
+    def _get_sub_data(self, index: Tuple, prefix: str, names) -> Dict:
+        data: Dict = {}
+        for name in names:
+            column_name = prefix + name
+            value = self.columns[column_name][index]
+            if column_name in self.deck_sizes:
+                size = self.deck_sizes[column_name][index]
+                data[name] = value[:size].tolist()
+            elif value.ndim:
+                data[name] = value.tolist()
+            else:
+                data[name] = int(value)
+        return data
+
+    def _fill_sub_state(self, index: Tuple, prefix: str, sub_state: SubState):
+        """Set the fields of the state in place, as `StateTemplate.restore`"""
+        for name in sub_state.visibility.keys():
+            column_name = prefix + name
+            value = getattr(sub_state, name)
+            column = self.columns[column_name][index]
+            if isinstance(value, Deck):
+                size = self.deck_sizes[column_name][index]
+                cards = []
+                for row in column[:size].tolist():
+                    key = tuple(row)
+                    card = self._cards.get(key)
+                    if card is None:
+                        card = self._cards[key] = value.generic_card.from_data(row)
+                    cards.append(card)
+                value.set_cards(cards)
+            elif isinstance(value, Component):
+                value.value = value.__class__.from_data(column.tolist()).value
+                if value._observers:
+                    value._notify_change()
+            else:
+                setattr(sub_state, name, int(column))
+
+    def set_state(self, game: int, state: FullState):
+        assert isinstance(state, self.state_class)
+        assert state.number_of_players == self.number_of_players
+        self._set_sub_state((game,), "", state)
+        for pid, player_state in enumerate(state.players):
+            self._set_sub_state((game, pid), PLAYER_PREFIX, player_state)
+
+    def to_data(self, game: int) -> Dict:
+        """Same as `FullState.to_data` of the game"""
+        data = self._get_sub_data((game,), "", self.state_class.visibility.keys())
+        player_names = self.state_class.player_state_class.visibility.keys()
+        data["players"] = [
+            self._get_sub_data((game, pid), PLAYER_PREFIX, player_names)
+            for pid in range(self.number_of_players)
+        ]
+        return data
+
+    def get_state(self, game: int) -> FullState:
+        """Return a new `FullState` with a copy of the game"""
+        return self.state_class.from_data(self.to_data(game))
+
+    @contextlib.contextmanager
+    def edit(self, game: int) -> Generator[FullState, None, None]:
+        """Work on a copy of a game as a `FullState`, e.g. with handlers
+
+        Changes are written back into the columns on exit, even when the
+        handler raised.  The same `FullState` is filled in place on each
+        edit, so it must not be kept after the block.
+
+            with batch.edit(3) as s:
+                handle_bet(s, action)
+        """
+        state = self._edited_state
+        if state is None:
+            state = self._edited_state = self.get_state(game)
+        else:
+            self._fill_sub_state((game,), "", state)
+            for pid, player_state in enumerate(state.players):
+                self._fill_sub_state((game, pid), PLAYER_PREFIX, player_state)
+        # Taken while in use, so a nested edit gets a state of its own
+        self._edited_state = None
+        try:
+            yield state
+        finally:
+            self.set_state(game, state)
+            self._edited_state = state
+
+    # ---------
+    # Batch access
+    # ---------
+
+    def player_columns(self, player_id: int) -> Dict[str, np.ndarray]:
+        """Slice the columns visible to the player, for all games
+
+        Mirrors `FullState.to_player_data`: `self.` columns contain the
+        player's own fields, and `others.` columns contain the visible fields
+        of the other players, with a leading (games, other players) axes.
+        """
+        others = [p for p in range(self.number_of_players) if p != player_id]
+        data = {}
+        for column_name, visibility in self.visibility.items():
+            column = self.columns[column_name]
+            if not column_name.startswith(PLAYER_PREFIX):
+                if Visibility.is_visible_to(visibility, Visibility.SELF):
+                    data[column_name] = column
+                continue
+            name = column_name[len(PLAYER_PREFIX) :]
+            data["self." + name] = column[:, player_id]
+            if Visibility.is_visible_to(visibility, Visibility.ALL):
+                data["others." + name] = column[:, others]
+        return data
@@ -1,5 +1,14 @@
-from .card import Card, BaseCard, Deck, BasicDeck
-from .core import Component
+from .card import (
+    Card,
+    BaseCard,
+    Deck,
+    DeckAggregate,
+    BasicDeck,
+    CardCountDeck,
+    Shoe,
+    OutOfCardsError,
+)
+from .core import Component, ComponentObserver
 from .counter import Counter
 from .token import Token
 from .resource import Resource
@@ -8,8 +17,13 @@ __all__ = [
     "Card",
     "BaseCard",
     "Deck",
+    "DeckAggregate",
     "BasicDeck",
+    "CardCountDeck",
+    "Shoe",
+    "OutOfCardsError",
     "Component",
+    "ComponentObserver",
     "Counter",
     "Token",
     "Announcer",
@@ -3,12 +3,30 @@ import enum
 import logging
 import random
 from copy import copy
-from typing import List, Type, Sequence, Optional, Dict, Generic, TypeVar, Union, Tuple
+from typing import (
+    Any,
+    Callable,
+    List,
+    Type,
+    Sequence,
+    Optional,
+    Dict,
+    Generic,
+    TypeVar,
+    Union,
+    Tuple,
+)
 
 import numpy as np
 import gym.spaces as spaces
 
-from .core import Component
+from .core import Component, ComponentObserver
+
+
+class OutOfCardsError(RuntimeError):
+    """Raised when dealing from an empty deck"""
+
+    pass
 
 
 class BaseCard(Component):
@@ -84,6 +102,49 @@ class Card(BaseCard):
 
 
 C = TypeVar("C", bound=BaseCard)
+V = TypeVar("V")
+
+
+class DeckAggregate(ComponentObserver, Generic[C, V]):
+    """A value maintained incrementally over the cards of a deck
+
+    `add` and `remove` fold a card in and out of the value, e.g. a running
+    sum.  When the deck changes in any other way (e.g. reset), the value
+    is recomputed from `initial`.  See `Deck.aggregate`.
+
+    Note that the functions must be picklable (i.e. module level functions)
+    to allow decks to be sent across processes.
+    """
+
+    name: str
+    value: V
+
+    def __init__(
+        self,
+        name: str,
+        initial: Callable[[], V],
+        add: Callable[[V, C], V],
+        remove: Callable[[V, C], V],
+    ):
+        self.name = name
+        self.initial = initial
+        self.add = add
+        self.remove = remove
+
+    def recompute(self, deck: "Deck"):
+        value = self.initial()
+        for card in deck.value:
+            value = self.add(value, card)
+        self.value = value
+
+    def on_insert(self, component, index: int, item):
+        self.value = self.add(self.value, item)
+
+    def on_remove(self, component, index: int, item):
+        self.value = self.remove(self.value, item)
+
+    def on_change(self, component):
+        self.recompute(component)
 
 
 # TODO: Refactor this as a more generic component
@@ -134,38 +195,86 @@ class Deck(Component, Generic[C]):
         self.shuffle = shuffle
         self.reset()
 
+    # Aggregates created on first read of `aggregate`, by name
+    default_aggregates: Dict[str, Callable[[], DeckAggregate]] = {}
+
+    def aggregate(self, name: str) -> Any:
+        """Return the value of the aggregate over the cards in the deck
+
+        The aggregate is kept up to date as cards are added or removed, so
+        this is O(1), apart from the first read of a default aggregate.
+        Note that the returned value must not be mutated.
+        """
+        for observer in self._observers:
+            if isinstance(observer, DeckAggregate) and observer.name == name:
+                return observer.value
+        if name not in self.default_aggregates:
+            raise KeyError(f"Unknown aggregate {name} for {self.__class__}")
+        return self.add_aggregate(self.default_aggregates[name]()).value
+
+    def add_aggregate(self, aggregate: DeckAggregate) -> DeckAggregate:
+        """Maintain a custom aggregate, which can be read with `aggregate`"""
+        aggregate.recompute(self)
+        self.add_observer(aggregate)
+        return aggregate
+
     def reset(self):
         # We use init_value to ensure that when we reset, we still
         # keep the same set of cards ready
-        self.value = copy(self.init_value)
+        self.set_cards(copy(self.init_value))
+
+    def set_cards(self, cards: List[C]):
+        """Replace the cards of the deck, e.g. with sampled hidden cards
+
+        Use this rather than assigning `value`, so aggregates are updated.
+        """
+        self.value = cards
+        if self._observers:
+            self._notify_change()
 
     def deal(self, other: "Deck", count=1, all=False):
         """Deal cards to another deck"""
         if all:
             count = len(self)
         for _ in range(count):
-            assert self.value, f"Oops - Deck {self.__class__} ran out of card."
-            other.add(self.value.pop())
+            if not self.value:
+                raise OutOfCardsError(f"Oops - Deck {self.__class__} ran out of card.")
+            card = self.value.pop()
+            if self._observers:
+                self._notify_remove(len(self.value), card)
+            other.add(card)
 
     def pop(self, index=-1, count=1, all=False) -> List[C]:
         if all:
             count = len(self)
         cards_popped = []
         for _ in range(count):
-            cards_popped.append(self.value.pop(index))
+            card = self.value.pop(index)
+            if self._observers:
+                self._notify_remove(
+                    index if index >= 0 else len(self.value) + index + 1, card
+                )
+            cards_popped.append(card)
         return cards_popped
 
     def move_to(self, other: "Deck", card: C):
         """Move a specific card to other deck"""
         assert isinstance(other, self.__class__)
-        self.value.remove(card)
+        self.remove(card)
         other.add(card)
 
     def add(self, card: C):
         self.value.append(card)
+        if self._observers:
+            self._notify_insert(len(self.value) - 1, card)
 
     def remove(self, card: C):
-        self.value.remove(card)
+        if self._observers:
+            index = self.value.index(card)
+            removed = self.value.pop(index)
+            self._notify_remove(index, removed)
+        else:
+            self.value.remove(card)
 
     def __len__(self):
         return len(self.value)
@@ -210,11 +319,123 @@ class Deck(Component, Generic[C]):
         return [0] * card_len
 
 
+def _add_rank(total: int, card: Card) -> int:
+    return total + card.number
+
+
+def _remove_rank(total: int, card: Card) -> int:
+    return total - card.number
+
+
+def _new_rank_count() -> np.ndarray:
+    return np.zeros(len(CardNumber) + 1, dtype=np.int64)
+
+
+def _add_rank_count(counts: np.ndarray, card: Card) -> np.ndarray:
+    counts[card.number] += 1
+    return counts
+
+
+def _remove_rank_count(counts: np.ndarray, card: Card) -> np.ndarray:
+    counts[card.number] -= 1
+    return counts
+
+
+def _new_suite_count() -> np.ndarray:
+    return np.zeros(len(CardSuite) + 1, dtype=np.int64)
+
+
+def _add_suite_count(counts: np.ndarray, card: Card) -> np.ndarray:
+    counts[int(card.suite)] += 1
+    return counts
+
+
+def _remove_suite_count(counts: np.ndarray, card: Card) -> np.ndarray:
+    counts[int(card.suite)] -= 1
+    return counts
+
+
+def total_rank() -> DeckAggregate:
+    """Sum of the numbers of the cards"""
+    return DeckAggregate("total_rank", int, _add_rank, _remove_rank)
+
+
+def rank_count() -> DeckAggregate:
+    """Count of cards by number, indexed by `CardNumber`"""
+    return DeckAggregate(
+        "rank_count", _new_rank_count, _add_rank_count, _remove_rank_count
+    )
+
+
+def suite_count() -> DeckAggregate:
+    """Count of cards by suite, indexed by `CardSuite`"""
+    return DeckAggregate(
+        "suite_count", _new_suite_count, _add_suite_count, _remove_suite_count
+    )
+
+
 class BasicDeck(Deck[Card]):
     generic_card = Card
 
+    default_aggregates = {
+        "total_rank": total_rank,
+        "rank_count": rank_count,
+        "suite_count": suite_count,
+    }
+
     value_type = [Card] * 52
 
     @staticmethod
     def get_max_size() -> int:
         return 52
+
+
+class CardCountDeck(BasicDeck):
+    """Deck of cards observed as counts of cards by number and suite
+
+    The observation is of fixed size, whatever the size of the deck, and is
+    read from the aggregates of the deck (see `Deck.aggregate`):
+
+        [count of A, count of 2, ..., count of K, count of S, ..., count of C]
+
+    Note that the order of the cards is not observed.  `to_data` still
+    returns the list of cards.
+    """
+
+    def to_data_for_numpy(self):
+        counts = np.concatenate(
+            [self.aggregate("rank_count")[1:], self.aggregate("suite_count")[1:]]
+        )
+        return counts.tolist()
+
+    @classmethod
+    def get_observation_space(cls) -> spaces.Space:
+        return spaces.Box(
+            low=0,
+            high=cls.get_max_size(),
+            shape=(len(CardNumber) + len(CardSuite),),
+            dtype=np.int16,
+        )
+
+
+class Shoe(CardCountDeck):
+    """Multiple decks of cards shuffled together
+
+    The number of decks can be set by subclassing, e.g.
+
+        class SixDeckShoe(Shoe):
+            number_of_decks = 6
+    """
+
+    number_of_decks: int = 6
+
+    @classmethod
+    def get_max_size(cls) -> int:
+        return 52 * cls.number_of_decks
+
+    def __init__(self, cards=None, shuffle=False, all_cards=False):
+        if all_cards:
+            cards = self.generic_card.get_all_cards() * self.number_of_decks
+            if shuffle:
+                random.shuffle(cards)
+        super().__init__(cards=cards, shuffle=shuffle)
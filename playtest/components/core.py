@@ -16,10 +16,37 @@ import gym.spaces as spaces
 SEPERATOR = ","
 
 
+class ComponentObserver:
+    """Get notified when a component is mutated
+
+    See `Component.add_observer`.  Components only notify when they have
+    observers, so there is no cost when nothing is observed.
+    """
+
+    def on_insert(self, component: "Component", index: int, item):
+        """Item was inserted at index of the component's value"""
+        self.on_change(component)
+
+    def on_remove(self, component: "Component", index: int, item):
+        """Item was removed from index of the component's value"""
+        self.on_change(component)
+
+    def on_change(self, component: "Component"):
+        """Component's value changed in any other way (e.g. reset)"""
+        pass
+
+    def on_set_attribute(self, component: "Component", name: str, value):
+        """An attribute of a SubState was set"""
+        pass
+
+
 class Component(abc.ABC):
     """Core component class that is to be inherited
     """
 
+    # Observers of mutation, see add_observer
+    _observers: Sequence[ComponentObserver] = ()
+
     # Note this is a tuple - since this maps to the
     # open_ai_gym.Box space
     value: Union[List]
@@ -34,6 +61,31 @@ class Component(abc.ABC):
         typeguard.check_argument_types()
         self.value = value
 
+    def add_observer(self, observer: ComponentObserver):
+        """Notify observer when this component is mutated
+
+        Subclasses are responsible for calling the `_notify_*` methods when
+        mutating `value` in place.
+        """
+        if not self._observers:
+            self._observers = []
+        self._observers.append(observer)  # type: ignore
+
+    def remove_observer(self, observer: ComponentObserver):
+        self._observers.remove(observer)  # type: ignore
+
+    def _notify_insert(self, index: int, item):
+        for observer in self._observers:
+            observer.on_insert(self, index, item)
+
+    def _notify_remove(self, index: int, item):
+        for observer in self._observers:
+            observer.on_remove(self, index, item)
+
+    def _notify_change(self):
+        for observer in self._observers:
+            observer.on_change(self)
+
     def __eq__(self, x):
         """Return equality if structure is deeply equal"""
         # Numpy supports deep comparison n
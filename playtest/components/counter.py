@@ -14,6 +14,8 @@ class Counter(Component):
 
     def increment(self, value=1):
         self.value[0] += value
+        if self._observers:
+            self._notify_change()
 
     @classmethod
     def get_observation_space(cls):
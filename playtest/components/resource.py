@@ -2,7 +2,7 @@ import abc
 import enum
 from collections import Counter
 import numpy as np
-from typing import Dict, List, TypeVar, Generic, Type
+from typing import Dict, List, TypeVar, Generic, Type, Sequence, Union
 
 import gym.spaces as spaces
 
@@ -50,57 +50,68 @@ class Resource(Component, Generic[R]):
             low=0, high=cls.get_max_amount(), shape=(type_of_resource,), dtype=np.uint8,
         )
 
+    # ---------
+    # Arithmetic - all done on numpy arrays of the value
+    # ---------
+
+    def to_numpy(self) -> np.ndarray:
+        value = np.asarray(self.value, dtype=np.int64)
+        assert len(value) == len(
+            self.generic_resource
+        ), f"Not all resources are there: {self.value} vs {list(self.generic_resource)}"
+        return value
+
+    def _set_numpy(self, value: np.ndarray):
+        self.value = value.tolist()
+        if self._observers:
+            self._notify_change()
+
+    @classmethod
+    def stack_resources(cls, resources: Sequence["Resource"]) -> np.ndarray:
+        """Stack resources into a matrix of (number of resources, resource type)
+
+        e.g. the cost of every card in a market
+        """
+        if not resources:
+            type_of_resource = len(cls.generic_resource)  # type: ignore
+            return np.zeros((0, type_of_resource), dtype=np.int64)
+        return np.stack([r.to_numpy() for r in resources])
+
     def has_required(self, required: "Resource") -> bool:
-        my = self.stack
-        theirs = required.stack
-        assert set(my.keys()) == set(
-            [s.name for s in self.generic_resource]
-        ), f"Not all resources are there: {my.keys()} vs {set(self.generic_resource)}"
-        return all([theirs.get(res, 0) <= my_count for res, my_count in my.items()])
-
-    # TODO: fix these
-    # def sub_resource(self, required: "Resource"):
-    #     my = self.stack
-    #     theirs = required.stack
-    #     assert sorted(my.keys()) == self.get_all_resources()
-    #     self.value = self.struct_to_value(
-    #         {res: my_count - theirs.get(res, 0) for res, my_count in my.items()}
-    #     )
-
-    # def sub_with_remainder(self, required: "Resource") -> "Resource":
-    #     my = self.stack
-    #     theirs = required.stack
-    #     assert sorted(my.keys()) == self.get_all_resources()
-    #     result = {res: my_count - theirs.get(res, 0) for res, my_count in my.items()}
-    #     new_my_value = {}
-    #     remainder = {}
-    #     for k, v in result.items():
-    #         if result[k] < 0:
-    #             remainder[k] = -v
-    #             new_my_value[k] = 0
-    #         else:
-    #             new_my_value[k] = v
-    #     self.value = self.struct_to_value(new_my_value)
-    #     return Resource(self.struct_to_value(remainder))
-
-    # def add_resource(self, required: "Resource"):
-    #     my = self.stack
-    #     theirs = required.stack
-    #     assert sorted(my.keys()) == self.get_all_resources()
-    #     self.value = self.struct_to_value(
-    #         {res: my_count + theirs.get(res, 0) for res, my_count in my.items()}
-    #     )
-
-    # def pop_lowest(self: R, amount) -> R:
-    #     """Pop number of cheapest resources"""
-    #     assert len(self) >= amount, f"Must have {amount} resources"
-    #     data = self.stack
-    #     popped_data: Dict[str, int] = {}
-    #     for c in self.all_resources:
-    #         if data[c] > 0 and sum(popped_data.values()) <= amount:
-    #             to_discard = min(amount, data[c])
-    #             data[c] -= to_discard
-    #             popped_data[c] = to_discard
-    #             amount -= to_discard
-    #     self.value = self.struct_to_value(data)
-    #     return self.__class__(self.struct_to_value(popped_data))
+        return bool(np.all(required.to_numpy() <= self.to_numpy()))
+
+    def affordable_mask(
+        self, costs: Union[np.ndarray, Sequence["Resource"]]
+    ) -> np.ndarray:
+        """Check which of the costs can be paid with this resource
+
+        :param costs: matrix of (number of costs, resource type), or a list
+          of resources (see `stack_resources`)
+        :return: boolean mask, one per cost
+        """
+        if not isinstance(costs, np.ndarray):
+            costs = self.stack_resources(costs)
+        return np.all(costs <= self.to_numpy(), axis=1)
+
+    def add_resource(self, other: "Resource"):
+        self._set_numpy(self.to_numpy() + other.to_numpy())
+
+    def sub_resource(self, required: "Resource"):
+        assert self.has_required(required), f"{self} does not have {required}"
+        self._set_numpy(self.to_numpy() - required.to_numpy())
+
+    def sub_with_remainder(self, required: "Resource") -> "Resource":
+        """Subtract as much as we can, return what is missing"""
+        result = self.to_numpy() - required.to_numpy()
+        self._set_numpy(np.maximum(result, 0))
+        return self.__class__(np.maximum(-result, 0).tolist())
+
+    def pop_lowest(self, amount: int) -> "Resource":
+        """Pop number of cheapest resources (in order of the resource enum)"""
+        assert len(self) >= amount, f"Must have {amount} resources"
+        value = self.to_numpy()
+        # Amount left to pop before reaching each resource
+        remaining = amount - (np.cumsum(value) - value)
+        popped = np.clip(remaining, 0, value)
+        self._set_numpy(value - popped)
+        return self.__class__(popped.tolist())
@@ -1,8 +1,16 @@
 import numpy as np
+import pytest
 
 import gym.spaces as spaces
 
-from playtest.components.card import Card, BasicDeck as Deck
+from playtest.components.card import (
+    Card,
+    CardCountDeck,
+    DeckAggregate,
+    OutOfCardsError,
+    Shoe,
+    BasicDeck as Deck,
+)
 
 
 def test_observation():
@@ -83,3 +91,104 @@ def test_reset():
     assert len(deck) == 2
     deck.reset()
     assert deck[0] == Card.from_str("A,D")
+
+
+def test_aggregates():
+    deck = Deck(all_cards=True, shuffle=True)
+    hand = Deck([])
+    assert deck.aggregate("total_rank") == 4 * sum(range(1, 14))
+    assert hand.aggregate("total_rank") == 0
+    assert (deck.aggregate("rank_count")[1:] == 4).all()
+    assert (deck.aggregate("suite_count")[1:] == 13).all()
+
+    def check(d):
+        assert d.aggregate("total_rank") == sum([c.number for c in d])
+        rank_count = np.bincount([c.number for c in d], minlength=14)
+        assert (d.aggregate("rank_count") == rank_count).all()
+        suite_count = np.bincount([int(c.suite) for c in d], minlength=5)
+        assert (d.aggregate("suite_count") == suite_count).all()
+
+    deck.deal(hand, 3)
+    check(deck)
+    check(hand)
+
+    deck.move_to(hand, deck[10])
+    hand.pop(index=0)
+    hand.add(deck.pop()[0])
+    check(deck)
+    check(hand)
+
+    deck.reset()
+    hand.deal(deck, all=True)
+    check(deck)
+    check(hand)
+
+    hand.set_cards(deck.value[:5])
+    check(hand)
+
+
+def test_custom_aggregate():
+    deck = Deck(all_cards=True, shuffle=True)
+    hand = Deck([])
+    hand.add_aggregate(
+        DeckAggregate(
+            "aces",
+            int,
+            lambda v, c: v + (c.number == 1),
+            lambda v, c: v - (c.number == 1),
+        )
+    )
+    deck.deal(hand, 20)
+    assert hand.aggregate("aces") == len([c for c in hand if c.number == 1])
+
+    with pytest.raises(KeyError):
+        hand.aggregate("unknown")
+
+
+class TwoDeckShoe(Shoe):
+    number_of_decks = 2
+
+
+def test_card_count_observation():
+    deck = CardCountDeck(all_cards=True, shuffle=True)
+    hand = CardCountDeck([])
+    deck.deal(hand, 3)
+
+    obs_space = hand.get_observation_space()
+    assert obs_space.shape == (17,)
+    numpy_data = hand.to_data_for_numpy()
+    assert obs_space.contains(np.array(numpy_data, dtype=np.int16))
+    assert sum(numpy_data[:13]) == sum(numpy_data[13:]) == 3
+    for card in hand:
+        assert numpy_data[card.number - 1] > 0
+        assert numpy_data[13 + int(card.suite) - 1] > 0
+
+    flattened = spaces.flatten(obs_space, numpy_data)
+    assert flattened.shape == (17,)
+
+    # Serialization still keeps the cards
+    assert CardCountDeck.from_data(hand.to_data()).to_data() == hand.to_data()
+
+
+def test_shoe():
+    shoe = TwoDeckShoe(all_cards=True, shuffle=True)
+    assert len(shoe) == 104 == TwoDeckShoe.get_max_size()
+    assert Shoe.get_max_size() == 52 * 6
+    assert shoe.get_observation_space().shape == (17,)
+
+    numpy_data = shoe.to_data_for_numpy()
+    assert numpy_data == [8] * 13 + [26] * 4
+
+    discarded = TwoDeckShoe([])
+    shoe.deal(discarded, 100)
+    assert discarded.to_data_for_numpy()[13:] == list(
+        discarded.aggregate("suite_count")[1:]
+    )
+    assert sum(discarded.to_data_for_numpy()[:13]) == 100
+
+
+def test_deal_empty():
+    deck = PartialDeck(cards=[Card.from_str("A,S")])
+    hand = PartialDeck(cards=[])
+    with pytest.raises(OutOfCardsError):
+        deck.deal(hand, count=2)
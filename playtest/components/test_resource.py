@@ -54,3 +54,46 @@ def test_resource_comparison():
     assert r.has_required(FooBarResource([2, 1])) is True
     assert r.has_required(FooBarResource([4, 5])) is False
     assert r.has_required(FooBarResource([4, 1])) is False
+
+
+def test_resource_arithmetic():
+    r = FooBarResource([2, 3])
+    r.add_resource(FooBarResource([1, 1]))
+    assert r.value == [3, 4]
+
+    r.sub_resource(FooBarResource([3, 1]))
+    assert r.value == [0, 3]
+    with pytest.raises(AssertionError):
+        r.sub_resource(FooBarResource([1, 0]))
+
+    remainder = r.sub_with_remainder(FooBarResource([2, 1]))
+    assert r.value == [0, 2]
+    assert isinstance(remainder, FooBarResource)
+    assert remainder.value == [2, 0]
+
+
+def test_resource_pop_lowest():
+    r = FooBarResource([2, 3])
+    popped = r.pop_lowest(3)
+    assert popped.value == [2, 1], "Cheapest resource popped first"
+    assert r.value == [0, 2]
+
+    with pytest.raises(AssertionError):
+        r.pop_lowest(3)
+
+
+def test_resource_affordable_mask():
+    r = FooBarResource([2, 3])
+    market = [
+        FooBarResource([2, 1]),
+        FooBarResource([4, 5]),
+        FooBarResource([4, 1]),
+        FooBarResource([0, 3]),
+    ]
+    mask = r.affordable_mask(market)
+    assert mask.tolist() == [True, False, False, True]
+
+    costs = FooBarResource.stack_resources(market)
+    assert costs.shape == (4, 2)
+    assert (r.affordable_mask(costs) == mask).all()
+    assert [r.has_required(c) for c in market] == mask.tolist()
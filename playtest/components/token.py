@@ -17,6 +17,7 @@ class Token(Component):
             value = [0]
         self.max_amount = max_amount
         super().__init__(value)
+        self.init_value = list(value)
         self.reset()
 
     @property
@@ -24,7 +25,9 @@ class Token(Component):
         return self.value[0]
 
     def reset(self):
-        pass
+        self.value = list(self.init_value)
+        if self._observers:
+            self._notify_change()
 
     def take_from(self, other: "Token", value: int = None, all=True):
         if not value:
@@ -32,6 +35,10 @@ class Token(Component):
             value = other.value[0]
         self.value[0] += value
         other.value[0] -= value
+        if self._observers:
+            self._notify_change()
+        if other._observers:
+            other._notify_change()
 
     def to_data(self):
         return self.value
@@ -0,0 +1,374 @@
+"""Stream the view of a state, as deltas between versions
+
+Sending the whole view of the state (e.g. `to_player_data`) on every step
+sends every deck and bank again, when a single card moved.  A `StateStream`
+instead sends the operations changing the last view acknowledged by the
+client into the new view, and a `StateReplica` applies them on the client.
+
+Views are JSON values, so visibility is respected as with the full view:
+e.g. a card dealt from the hidden deck only shows up as inserted in the
+hand.  The operations are lists, with a path of keys and indices:
+
+* `["set", path, value]`: replace the value at the path, e.g. a bank
+  going from 10 to 7
+* `["del", path]`: delete the key at the path
+* `["splice", path, index, count, items]`: replace `count` items of the
+  list at `index` with the items, e.g. a card drawn
+* `["move", from_path, from_index, to_path, to_index]`: move one item
+  between lists, e.g. a card discarded from a hand
+
+A full view (a keyframe) is sent for the first version, every
+`keyframe_interval` versions, and when the client lags behind.
+
+Views are never modified once computed, so they are shared rather than
+copied: between the streams of the same view (see `StateStream.update`),
+and between the versions of a replica, which only copies the lists and
+dicts a delta changes.
+"""
+import collections
+import functools
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .state import FullState
+
+Path = List[Any]
+Operation = List[Any]
+ViewFunction = Callable[[FullState], Dict]
+
+
+class DeltaError(RuntimeError):
+    """Raised when a delta cannot be applied, a keyframe is then required"""
+
+    pass
+
+
+def to_json_value(value: Any) -> Any:
+    """Copy the data (e.g. `to_player_data`) into plain JSON values"""
+    if isinstance(value, dict):
+        return {str(k): to_json_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_json_value(v) for v in value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        # e.g. IntEnum of cards
+        return int(value)
+    if isinstance(value, (float, str)):
+        return value
+    return str(value)
+
+
+@functools.lru_cache(maxsize=None)
+def player_view(player_id: int) -> ViewFunction:
+    """What the player can see, see `FullState.to_player_data`
+
+    The same function is returned for the same player, to share the view
+    between streams.
+    """
+    return lambda state: state.to_player_data(player_id)
+
+
+def spectator_view(state: FullState) -> Dict:
+    """What is visible to all"""
+    data = state.to_visible_data()
+    data["players"] = [p.to_visible_data() for p in state.players]
+    return data
+
+
+# ---------
+# Diff
+# ---------
+
+
+def _diff(old: Any, new: Any, path: Path, ops: List[Operation]):
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys():
+            if key not in new:
+                ops.append(["del", path + [key]])
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["set", path + [key], value])
+            elif old[key] != value:
+                _diff(old[key], value, path + [key], ops)
+    elif isinstance(old, list) and isinstance(new, list):
+        if (
+            len(old) == len(new)
+            and old
+            and isinstance(old[0], dict)
+            and isinstance(new[0], dict)
+        ):
+            # e.g. the other players
+            for i, (old_item, new_item) in enumerate(zip(old, new)):
+                if old_item != new_item:
+                    _diff(old_item, new_item, path + [i], ops)
+            return
+        start = 0
+        while start < min(len(old), len(new)) and old[start] == new[start]:
+            start += 1
+        end = 0
+        while (
+            end < min(len(old), len(new)) - start
+            and old[len(old) - 1 - end] == new[len(new) - 1 - end]
+        ):
+            end += 1
+        count = len(old) - start - end
+        items = new[start : len(new) - end]
+        if count == 1 and len(items) == 1 and not isinstance(items[0], list):
+            # e.g. the value of a token
+            ops.append(["set", path + [start], items[0]])
+        else:
+            ops.append(["splice", path, start, count, items])
+    else:
+        ops.append(["set", path, new])
+
+
+def _pair_moves(ops: List[Operation]) -> List[Operation]:
+    """Replace a single item removed from a list and inserted in another"""
+    removed: Dict[str, List[int]] = collections.defaultdict(list)
+    for i, op in enumerate(ops):
+        if op[0] == "splice" and op[3] == 1 and not op[4]:
+            # Key by the value, which is not hashable
+            removed[repr(op[5])].append(i)
+    if not removed:
+        return [op[:5] if op[0] == "splice" else op for op in ops]
+
+    result: List[Optional[Operation]] = [
+        op[:5] if op[0] == "splice" else op for op in ops
+    ]
+    for i, op in enumerate(ops):
+        if op[0] != "splice" or op[3] != 0 or len(op[4]) != 1:
+            continue
+        candidates = removed.get(repr(op[4][0]))
+        if not candidates:
+            continue
+        j = candidates.pop()
+        removal = ops[j]
+        result[i] = ["move", removal[1], removal[2], op[1], op[2]]
+        result[j] = None
+    return [op for op in result if op is not None]
+
+
+def diff(old: Any, new: Any) -> List[Operation]:
+    """Return the operations changing the old view into the new view"""
+    ops: List[Operation] = []
+    _diff(old, new, [], ops)
+    # Keep the removed item of splices, to find the moves
+    for op in ops:
+        if op[0] == "splice":
+            path = op[1]
+            old_list = _get(old, path)
+            op.append(old_list[op[2]] if op[3] == 1 else None)
+    return _pair_moves(ops)
+
+
+# ---------
+# Apply
+# ---------
+
+
+def _get(data: Any, path: Path) -> Any:
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _get_copied(root: List[Any], path: Path, copied: Set[int]) -> Any:
+    """Return the value at the path, copying the lists and dicts on the way
+
+    :param root: list holding the data, as the data itself can be replaced
+    :param copied: ids of the values copied already, which are not copied
+      again
+    """
+    parent: Any = root
+    for key in [0] + list(path):
+        value = parent[key]
+        if id(value) not in copied:
+            value = list(value) if isinstance(value, list) else dict(value)
+            copied.add(id(value))
+            parent[key] = value
+        parent = value
+    return parent
+
+
+def apply_delta(data: Any, ops: List[Operation]) -> Any:
+    """Return the data changed by the operations
+
+    The data is not modified: only the lists and dicts on the path of an
+    operation are copied, and everything else is shared with the data.
+    The operations must be applied on the same view they were computed from.
+    """
+    root = [data]
+    copied: Set[int] = set()
+    moved: List[Tuple[Path, int, Any]] = []
+    for op in ops:
+        kind = op[0]
+        if kind == "move":
+            # Remove everything first, as indices are of the old lists
+            _, from_path, from_index, to_path, to_index = op
+            item = _get_copied(root, from_path, copied).pop(from_index)
+            moved.append((to_path, to_index, item))
+    for op in ops:
+        kind = op[0]
+        if kind == "set":
+            path = op[1]
+            if not path:
+                return op[2]
+            _get_copied(root, path[:-1], copied)[path[-1]] = op[2]
+        elif kind == "del":
+            path = op[1]
+            del _get_copied(root, path[:-1], copied)[path[-1]]
+        elif kind == "splice":
+            _, path, index, count, items = op
+            _get_copied(root, path, copied)[index : index + count] = items
+        elif kind != "move":
+            raise DeltaError(f"Unknown operation {kind}")
+    for to_path, to_index, item in moved:
+        _get_copied(root, to_path, copied).insert(to_index, item)
+    return root[0]
+
+
+# ---------
+# Stream
+# ---------
+
+
+class StateStream:
+    """Versions of the view of a client, sent as deltas
+
+    Each update is sent as a delta from the last version acknowledged by
+    the client, so a lost or late message never corrupts the replica.
+
+    :param view: what the client can see, e.g. `player_view(0)` or
+      `spectator_view`
+    :param keyframe_interval: send the full view every that many versions
+    :param max_unacked: send the full view once the client lags behind by
+      that many versions
+    """
+
+    view: ViewFunction
+    keyframe_interval: int
+    max_unacked: int
+
+    version: int
+    acked_version: Optional[int]
+    # Views sent since the acknowledged version, by version
+    views: "collections.OrderedDict[int, Any]"
+
+    def __init__(
+        self, view: ViewFunction, keyframe_interval: int = 50, max_unacked: int = 16
+    ):
+        assert keyframe_interval > 0 and max_unacked > 0
+        self.view = view
+        self.keyframe_interval = keyframe_interval
+        self.max_unacked = max_unacked
+        self.version = 0
+        self.acked_version = None
+        self.views = collections.OrderedDict()
+        self._keyframe_version = 0
+
+    def update(self, state: FullState, views: Optional[Dict] = None) -> Dict:
+        """Return the message of the new version of the view
+
+        :param views: views of the state by view function, shared between
+          the streams updated for the same state (e.g. of every spectator
+          of a table), so that each view is computed once
+        Return: `{"version", "state"}` for a keyframe, or
+          `{"version", "base", "delta"}`
+        """
+        if views is None:
+            view = to_json_value(self.view(state))
+        elif self.view in views:
+            view = views[self.view]
+        else:
+            view = views[self.view] = to_json_value(self.view(state))
+        self.version += 1
+        base = self.acked_version
+        message: Dict[str, Any] = {"version": self.version}
+        if (
+            base is None
+            or self.version - self._keyframe_version >= self.keyframe_interval
+            or self.version - base > self.max_unacked
+        ):
+            message["state"] = view
+            self._keyframe_version = self.version
+        else:
+            message["base"] = base
+            message["delta"] = diff(self.views[base], view)
+        self.views[self.version] = view
+        # Keep the acknowledged view, as the base of the next delta
+        while len(self.views) > self.max_unacked + 1:
+            oldest = next(iter(self.views))
+            if oldest == self.acked_version:
+                self.acked_version = None
+            del self.views[oldest]
+        return message
+
+    def ack(self, version: int):
+        """The client received the version, which can be the base of deltas"""
+        if version not in self.views:
+            return
+        if self.acked_version is not None and version <= self.acked_version:
+            return
+        self.acked_version = version
+        while next(iter(self.views)) < version:
+            self.views.popitem(last=False)
+
+
+class StateReplica:
+    """Rebuild the view of the state from the messages of a `StateStream`
+
+    :param max_versions: number of versions kept as base of the deltas,
+      which should be more than the `max_unacked` of the stream
+    """
+
+    max_versions: int
+    version: Optional[int]
+    # Views received, which can still be the base of a delta, by version
+    views: "collections.OrderedDict[int, Any]"
+
+    def __init__(self, max_versions: int = 64):
+        self.max_versions = max_versions
+        self.version = None
+        self.views = collections.OrderedDict()
+
+    @property
+    def state(self) -> Any:
+        assert self.version is not None, "No state received yet"
+        return self.views[self.version]
+
+    def apply(self, message: Dict) -> Any:
+        """Apply the message, and return the view
+
+        The returned view, and the state of the message, must not be
+        modified, as they are shared with the next versions.
+
+        Raise: DeltaError when the base version of the delta is unknown
+        """
+        version = message["version"]
+        if "state" in message:
+            view = message["state"]
+        else:
+            base = message["base"]
+            if base not in self.views:
+                raise DeltaError(f"Unknown base version {base}")
+            view = apply_delta(self.views[base], message["delta"])
+            # Older versions are never used as base again
+            while next(iter(self.views)) < base:
+                self.views.popitem(last=False)
+        self.views[version] = view
+        while len(self.views) > self.max_versions:
+            self.views.popitem(last=False)
+        self.version = version
+        return view
+
+    def ack(self) -> Dict:
+        """Return the message acknowledging the last version"""
+        return {"type": "ack", "version": self.version}
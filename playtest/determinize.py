@@ -0,0 +1,276 @@
+"""Determinization of hidden information
+
+An `InformationSet` is what a player knows about the state: the state with
+every field hidden from the player blanked, and the pool of unseen cards.
+A determinization is a complete state consistent with the information set,
+where the unseen cards are dealt back to the hidden decks at random.
+
+Fields hidden to a player are the ones missing from `to_player_data`:
+
+* fields of the full state which are not visible to the players (i.e.
+  below `Visibility.SELF`), e.g. the draw pile
+* fields of other players which are not visible to all, e.g. their hands
+
+Hidden decks are emptied, and their cards pooled.  Other hidden fields are
+blanked to 0, as nothing is known of them.
+
+Note that only the multiset of unseen cards is kept, i.e. the pool is the
+same whichever way the cards are distributed across the hidden decks.
+
+Search agents need many determinizations per decision, so
+`DeterminizationSampler` samples them in batch: each sample is a row of
+a random permutation of the unseen cards, split across the hidden decks.
+`InformationSet.determinize_batched` writes the samples into the columns
+of a `BatchedState`, without building a state per sample.
+"""
+import random
+import collections
+from dataclasses import dataclass
+from typing import Generator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .state import FullState, SubState, Visibility
+from .batch import BatchedState, PLAYER_PREFIX
+from .components.core import Component
+from .components.card import Deck
+from .solver import clone_state
+
+# Owner of a field (e.g. a deck): None for the full state, or the player id
+DeckPath = Tuple[Optional[int], str]
+
+
+def hidden_field_paths(state: FullState, player_id: int) -> List[DeckPath]:
+    """Return the fields which are hidden to the player"""
+    paths: List[DeckPath] = []
+    owners: List[Tuple[Optional[int], SubState, Visibility]] = [
+        (None, state, Visibility.SELF)
+    ]
+    for pid, player_state in enumerate(state.players):
+        if pid != player_id:
+            owners.append((pid, player_state, Visibility.ALL))
+    for owner, sub_state, min_visibility in owners:
+        for name, visibility in sub_state.visibility.items():
+            if not Visibility.is_visible_to(visibility, min_visibility):
+                paths.append((owner, name))
+    return paths
+
+
+def hidden_deck_paths(state: FullState, player_id: int) -> List[DeckPath]:
+    """Return the decks which are hidden to the player"""
+    return [
+        path
+        for path in hidden_field_paths(state, player_id)
+        if isinstance(get_field(state, path), Deck)
+    ]
+
+
+def visible_decks(state: FullState, player_id: int) -> List[Deck]:
+    """Return the decks which the player can see"""
+    hidden = set(hidden_field_paths(state, player_id))
+    decks = []
+    owners: List[Tuple[Optional[int], SubState]] = [(None, state)]
+    owners.extend(enumerate(state.players))
+    for owner, sub_state in owners:
+        for name in sub_state.visibility.keys():
+            value = getattr(sub_state, name)
+            if (owner, name) not in hidden and isinstance(value, Deck):
+                decks.append(value)
+    return decks
+
+
+def unseen_cards(
+    state: FullState, player_id: int, universe: Sequence[Sequence[int]]
+) -> np.ndarray:
+    """Cards of the universe which the player cannot see
+
+    :param universe: data of all the cards of the game
+    """
+    remaining = collections.Counter(tuple(c) for c in universe)
+    for deck in visible_decks(state, player_id):
+        for card in deck.to_data():
+            card = tuple(card)
+            assert remaining[card] > 0, f"Card {card} is not in the universe"
+            remaining[card] -= 1
+    unseen = sorted(remaining.elements())
+    return np.array(unseen, dtype=np.int64).reshape(len(unseen), -1)
+
+
+class DeterminizationSampler:
+    """Sample the hidden decks, consistent with a player's view
+
+    Samples are drawn in one vectorized call, for many samples at once.
+    Each sample deals the unseen cards (without replacement) to the hidden
+    decks, so the multiset of cards is preserved.
+
+        sampler = DeterminizationSampler.from_state(state, 0, universe)
+        deck, other_hand = sampler.sample(1000)
+        deck.shape  # (1000, 45, 2)
+    """
+
+    # Data of the unseen cards, of shape (cards, card data)
+    unseen: np.ndarray
+    # Number of cards of each hidden deck
+    sizes: List[int]
+
+    def __init__(self, unseen: np.ndarray, sizes: Sequence[int]):
+        assert sum(sizes) <= len(unseen), "Not enough unseen cards to deal"
+        self.unseen = unseen
+        self.sizes = list(sizes)
+
+    @classmethod
+    def from_state(
+        cls,
+        state: FullState,
+        player_id: int,
+        universe: Sequence[Sequence[int]],
+        hidden_sizes: Optional[Sequence[int]] = None,
+    ) -> "DeterminizationSampler":
+        """Sampler of what the player cannot see of the state
+
+        :param hidden_sizes: number of cards of each of `hidden_deck_paths`,
+          defaults to the sizes of the hidden decks of the state
+        """
+        if hidden_sizes is None:
+            hidden_sizes = [
+                len(get_deck(state, path))
+                for path in hidden_deck_paths(state, player_id)
+            ]
+        return cls(unseen_cards(state, player_id, universe), hidden_sizes)
+
+    def permutations(
+        self, k: int, rng: Optional[np.random.RandomState] = None
+    ) -> np.ndarray:
+        """Return k random orders of the unseen cards, of shape (k, cards)"""
+        rng = rng or np.random
+        keys = rng.random_sample((k, len(self.unseen)))
+        return np.argsort(keys, axis=1)
+
+    def split(self, permutations: np.ndarray) -> List[np.ndarray]:
+        """Split the permutations into indices of each hidden deck"""
+        bounds = np.cumsum([0] + self.sizes)
+        return [permutations[:, a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def sample(
+        self, k: int, rng: Optional[np.random.RandomState] = None
+    ) -> List[np.ndarray]:
+        """Return the card data of each hidden deck, of shape (k, size, data)"""
+        return [self.unseen[i] for i in self.split(self.permutations(k, rng))]
+
+
+def _owner(state: FullState, path: DeckPath) -> SubState:
+    return state if path[0] is None else state.players[path[0]]
+
+
+def get_field(state: FullState, path: DeckPath):
+    return getattr(_owner(state, path), path[1])
+
+
+def get_deck(state: FullState, path: DeckPath) -> Deck:
+    return get_field(state, path)
+
+
+@dataclass
+class InformationSet:
+    """What the player knows of the state"""
+
+    player_id: int
+    # State with the hidden decks emptied, and other hidden fields blanked
+    state: FullState
+    hidden_paths: List[DeckPath]
+    # Number of cards in each hidden deck
+    hidden_sizes: List[int]
+    # Unseen cards, in a canonical order
+    unseen: list
+
+    @classmethod
+    def from_state(cls, state: FullState, player_id: int) -> "InformationSet":
+        """Strip the information hidden to the player out of the state
+
+        i.e. the state only holds what is in `to_player_data(player_id)`.
+        """
+        view = clone_state(state)
+        paths = []
+        sizes = []
+        unseen = []
+        for path in hidden_field_paths(view, player_id):
+            value = get_field(view, path)
+            if isinstance(value, Deck):
+                paths.append(path)
+                sizes.append(len(value))
+                unseen.extend(value.value)
+                value.set_cards([])
+            elif isinstance(value, Component):
+                # The component is a copy, see `clone_state`
+                value.value = [0] * len(value.value)
+            else:
+                setattr(_owner(view, path), path[1], 0)
+        unseen.sort(key=lambda c: c.to_data())
+        return cls(player_id, view, paths, sizes, unseen)
+
+    def get_sampler(self) -> DeterminizationSampler:
+        unseen = np.array([c.to_data() for c in self.unseen], dtype=np.int64)
+        return DeterminizationSampler(
+            unseen.reshape(len(self.unseen), -1), self.hidden_sizes
+        )
+
+    def _deal_batch(
+        self, sampler: DeterminizationSampler, k: int, rng
+    ) -> Generator[FullState, None, None]:
+        cards = np.empty(len(self.unseen), dtype=object)
+        cards[:] = self.unseen
+        hidden_cards = [cards[i] for i in sampler.split(sampler.permutations(k, rng))]
+        for n in range(k):
+            state = clone_state(self.state)
+            for path, deck_cards in zip(self.hidden_paths, hidden_cards):
+                get_deck(state, path).set_cards(deck_cards[n].tolist())
+            yield state
+
+    def determinize_batch(
+        self, k: int, rng: Optional[np.random.RandomState] = None
+    ) -> List[FullState]:
+        """Return k states consistent with the information set"""
+        return list(self._deal_batch(self.get_sampler(), k, rng))
+
+    def determinize_batched(
+        self, k: int, rng: Optional[np.random.RandomState] = None
+    ) -> BatchedState:
+        """Return k states consistent with the information set, column-wise
+
+        The states are built in one vectorized call, without a `FullState`
+        per sample, e.g. for vectorized evaluation of the samples.
+        """
+        batch = BatchedState(self.state, k)
+        for path, cards in zip(self.hidden_paths, self.get_sampler().sample(k, rng)):
+            owner, name = path
+            if owner is None:
+                index: Tuple = (slice(None),)
+            else:
+                index = (slice(None), owner)
+                name = PLAYER_PREFIX + name
+            # Hidden decks are empty in the information set, i.e. padded
+            batch.columns[name][index + (slice(0, cards.shape[1]),)] = cards
+            batch.deck_sizes[name][index] = cards.shape[1]
+        return batch
+
+    def iter_determinize(
+        self, rng: Optional[np.random.RandomState] = None, batch_size: int = 256
+    ) -> Generator[FullState, None, None]:
+        """Generate states consistent with the information set
+
+        The hidden cards are sampled in batches of `batch_size`.
+        """
+        sampler = self.get_sampler()
+        while True:
+            yield from self._deal_batch(sampler, batch_size, rng)
+
+    def determinize(self, rng: Optional[random.Random] = None) -> FullState:
+        """Return a state consistent with the information set"""
+        cards = list(self.unseen)
+        (rng or random).shuffle(cards)
+        state = clone_state(self.state)
+        start = 0
+        for path, size in zip(self.hidden_paths, self.hidden_sizes):
+            get_deck(state, path).set_cards(cards[start : start + size])
+            start += size
+        return state
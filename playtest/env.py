@@ -1,8 +1,21 @@
 import logging
-from typing import Tuple, Generator, Optional, List, Dict, Sequence, Type, Any, Callable
+from typing import (
+    TYPE_CHECKING,
+    Tuple,
+    Generator,
+    Optional,
+    List,
+    Dict,
+    Sequence,
+    Type,
+    Any,
+    Callable,
+)
 from pprint import pprint
 import warnings
 import enum
+import time
+from dataclasses import dataclass
 
 import gym.spaces as spaces
 
@@ -14,12 +27,15 @@ import numpy as np
 import gym
 import gym.utils.seeding as seeding
 import gym.spaces as spaces
-from rl.core import Agent
 
-from .game import GameHandler, TypeHandlerReturn
-from .state import FullState
+from .game import GameHandler, CompiledGameHandler, TypeHandlerReturn
+from .state import FullState, StateTemplate
 from .constant import Reward
 from .action import BaseDecision, ActionInstance
+from .render import Renderer, render_state
+
+if TYPE_CHECKING:
+    from .agents.base import BaseAgent
 
 
 class TooManyInvalidActions(Exception):
@@ -35,9 +51,9 @@ class GameWrapperEnvironment(gym.Env):
     gym: envs/classic_control/cartpole.py
     """
 
-    metadata = {"render.modes": ["human"]}
+    metadata = {"render.modes": ["human", "text", "ansi"]}
 
-    game_handler: GameHandler
+    game_handler: CompiledGameHandler
     state: FullState
     decision_class: Type[BaseDecision]
 
@@ -54,6 +70,19 @@ class GameWrapperEnvironment(gym.Env):
     verbose: bool
     # If not allow invalid, raise exception when action is invalid
     allow_invalid: bool
+    # Reset on the end of the game, returning the first observation of the
+    # next game along with the final rewards
+    auto_reset: bool
+    # End the game after this number of steps, with no winner
+    max_episode_steps: Optional[int]
+    episode_steps: int
+    # State restored on reset, see `StateTemplate`
+    template: StateTemplate
+    # Shuffle the decks on reset, with the random generator of `seed`, so
+    # that each episode gets a new deal
+    reshuffle: bool
+    # Only render when a renderer is set
+    renderer: Optional[Renderer]
 
     def __init__(
         self,
@@ -63,14 +92,26 @@ class GameWrapperEnvironment(gym.Env):
         decision_class: Type[BaseDecision],
         verbose=True,
         allow_invalid=True,
+        renderer: Optional[Renderer] = None,
+        auto_reset=False,
+        max_episode_steps: Optional[int] = None,
+        reshuffle=True,
     ):
         # Categories of information required
         self.state = s
-        self.game_handler = gh
+        self.game_handler = (
+            gh if isinstance(gh, CompiledGameHandler) else gh.compile(start_state)
+        )
         self.start_state = start_state
         self.decision_class = decision_class
         self.verbose = verbose
         self.allow_invalid = allow_invalid
+        self.renderer = renderer
+        self.auto_reset = auto_reset
+        self.max_episode_steps = max_episode_steps
+        self.template = StateTemplate(s)
+        self.reshuffle = reshuffle
+        self.np_random, _ = seeding.np_random(None)
 
         # Now setting internal state flags
         self.next_player = 0
@@ -79,11 +120,17 @@ class GameWrapperEnvironment(gym.Env):
 
         # Initialize other status
         self.continuous_invalid_inputs = []
+        self.episode_steps = 0
 
     @property
     def n_agents(self) -> int:
         return self.state.number_of_players
 
+    @property
+    def transition_counts(self) -> Dict[Tuple[enum.Enum, enum.Enum], int]:
+        """Number of times each transition between game states happened"""
+        return self.game_handler.transition_counts
+
     @property
     def action_space(self) -> spaces.Space:
         """Return the size of action space
@@ -99,14 +146,18 @@ class GameWrapperEnvironment(gym.Env):
         obs = [None] * self.n_agents
 
         next_player: int = self.next_player
-        action_obs: Dict[str, np.ndarray] = decision.action_range_to_numpy()
         player_obs_space = self.state.to_player_data(next_player, for_numpy=True)
 
         # TODO: only set action for the next player
-        obs[next_player] = spaces.flatten(
-            # Note this includes action observation
-            self.observation_space,
-            [action_obs, player_obs_space],
+        # Same as flattening observation_space, with the (memoized) action
+        # observation followed by the state observation
+        obs[next_player] = np.concatenate(
+            [
+                decision.action_range_vector(),
+                spaces.flatten(
+                    self.state.get_observation_space_from_player(), player_obs_space
+                ),
+            ]
         )
         return obs
 
@@ -124,20 +175,19 @@ class GameWrapperEnvironment(gym.Env):
 
     @property
     def reward_range(self) -> Tuple[int, int]:
-        low, high = self.game.reward_range
-        assert low >= Reward.INVALID_ACTION, "Punish reward must be higher than game"
-        return low, high
+        return Reward.INVALID_ACTION, Reward.WINNER
 
     def reset(self) -> List[np.ndarray]:
-        """Return instance of environment
+        """Restart the game from the start state
+
+        The state is restored to the state given on creation.
         """
-        self.state.reset()
+        self.template.restore(
+            self.state, rng=self.np_random if self.reshuffle else None
+        )
 
-        handler_func: Callable[
-            [FullState, Optional[ActionInstance]], TypeHandlerReturn
-        ] = self.game_handler.get_handler(self.current_state)
-        new_state, decision, next_game_state, next_player = handler_func(
-            self.state, None
+        new_state, decision, next_game_state, next_player = self.game_handler.handle(
+            self.state, self.start_state
         )
 
         self.state = new_state
@@ -150,6 +200,7 @@ class GameWrapperEnvironment(gym.Env):
         self.next_player = next_player
 
         self.continuous_invalid_inputs = []
+        self.episode_steps = 0
 
         return self.__get_all_players_observation_with_action(
             self.state, self.next_accepted_action
@@ -179,16 +230,25 @@ class GameWrapperEnvironment(gym.Env):
             raise TooManyInvalidActions(err_msg)
         logging.warning(f"🙅‍♂️ Action {action} is not valid.")
         assert self.next_accepted_action is not None
+        rewards = [Reward.DEFAULT] * self.n_agents
+        rewards[self.next_player] = Reward.INVALID_ACTION
         return (
             self.__get_all_players_observation_with_action(
                 self.state, self.next_accepted_action
             ),
-            # TODO: setup rewards
-            [0] * self.n_agents,
+            rewards,
             [False] * self.n_agents,
             {},
         )
 
+    def __end_of_game_return(
+        self, rewards: List[int], info: Dict
+    ) -> Tuple[List[Optional[np.ndarray]], List[int], List[bool], Dict]:
+        observations: List[Optional[np.ndarray]] = [None] * self.n_agents
+        if self.auto_reset:
+            observations = self.reset()
+        return observations, rewards, [True] * self.n_agents, info
+
     def step(
         self, agents_action: List[Optional[int]]
     ) -> Tuple[
@@ -198,14 +258,17 @@ class GameWrapperEnvironment(gym.Env):
         Dict,  # info
     ]:
         """Given the action, forward to the player
-        """
-        # TODO: not setting the rewards
-        rewards = [0] * self.n_agents
 
+        When the game ends, every player is done, and gets the rewards of
+        `GameHandler.get_rewards`.  Without `auto_reset`, `reset` must be
+        called before the next step.
+        """
         # Given a list of action, map action into necessary int
         current_player_action_int = agents_action[self.next_player]
         assert current_player_action_int is not None
-        assert self.next_accepted_action is not None
+        assert (
+            self.next_accepted_action is not None
+        ), "The game has ended, reset the environment"
         action_to_send: ActionInstance = self.next_accepted_action.from_int(
             current_player_action_int
         )
@@ -218,36 +281,52 @@ class GameWrapperEnvironment(gym.Env):
                 action_to_send = self.next_accepted_action.pick_random_action()
 
         # Now sending the necessary actions
-        handler_func: Callable[
-            [FullState, Optional[ActionInstance]], TypeHandlerReturn
-        ] = self.game_handler.get_handler(self.current_state)
-        new_state, decision, next_game_state, next_player = handler_func(
-            self.state, action_to_send
+        new_state, decision, next_game_state, next_player = self.game_handler.handle(
+            self.state, self.current_state, action_to_send
         )
 
         self.state = new_state
         self.next_accepted_action: Optional[BaseDecision] = decision
-        assert (
-            self.next_accepted_action is not None
-        ), "Must provide decision on initialization"
         self.current_state = next_game_state
+        self.episode_steps += 1
+        if self.next_accepted_action is None:
+            # No more decision to be made, the game has ended
+            return self.__end_of_game_return(
+                self.game_handler.get_rewards(self.state), {}
+            )
         assert next_player is not None
         self.next_player = next_player
 
+        if (
+            self.max_episode_steps is not None
+            and self.episode_steps >= self.max_episode_steps
+        ):
+            self.next_accepted_action = None
+            return self.__end_of_game_return(
+                [Reward.DEFAULT] * self.n_agents, {"truncated": True}
+            )
+
         return (
             self.__get_all_players_observation_with_action(
                 self.state, self.next_accepted_action
             ),
-            # TODO: setup rewards
-            [0] * self.n_agents,
+            [Reward.DEFAULT] * self.n_agents,
             [False] * self.n_agents,
             {},
         )
 
-    def render(self, mode="human"):
+    def render(self, mode="human") -> Optional[str]:
         """Render the relevant cards
+
+        In human mode, the frame is dispatched to the viewers of the
+        renderer, and is only built if any viewer is attached.  Other modes
+        (text, ansi) return the full state frame as a string.
         """
-        pass
+        if mode == "human":
+            if self.renderer is None:
+                return None
+            return self.renderer.render(self.state)
+        return render_state(self.state, mode=mode)
 
     def to_player_data(self, player_id: int) -> Dict:
         return self.state.to_player_data(player_id)
@@ -261,36 +340,127 @@ class GameWrapperEnvironment(gym.Env):
         return
 
 
+@dataclass
+class EpisodeResult:
+    """Result of a single episode played by `EnvironmentInteration`"""
+
+    episode: int
+    # Total reward of each player
+    rewards: List[int]
+    length: int
+    # Player with the unique highest reward, if episode is done
+    winner: Optional[int]
+    steps_per_second: float
+    # False if the episode was cut short by `rounds`
+    done: bool = True
+
+
+class PlayStats:
+    """Aggregate counters over the played episodes"""
+
+    episodes: int
+    steps: int
+    elapsed: float
+    total_rewards: List[int]
+    wins: List[int]
+
+    def __init__(self, n_agents: int):
+        self.episodes = 0
+        self.steps = 0
+        self.elapsed = 0.0
+        self.total_rewards = [0] * n_agents
+        self.wins = [0] * n_agents
+
+    def add(self, result: EpisodeResult, elapsed: float):
+        self.episodes += 1
+        self.steps += result.length
+        self.elapsed += elapsed
+        for i, r in enumerate(result.rewards):
+            self.total_rewards[i] += r
+        if result.winner is not None:
+            self.wins[result.winner] += 1
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.steps / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (
+            f"PlayStats(episodes={self.episodes}, steps={self.steps}, "
+            f"wins={self.wins}, steps_per_second={self.steps_per_second:.1f})"
+        )
+
+
+def _get_winner(rewards: List[int], done: bool) -> Optional[int]:
+    if not done:
+        return None
+    best = max(rewards)
+    if rewards.count(best) > 1:
+        return None
+    return rewards.index(best)
+
+
 class EnvironmentInteration:
-    """Represent a game that can be played"""
+    """Represent a game that can be played
+
+    :param render: render the environment at every step
+    :param verbose: print a summary of each episode
+    """
 
     env: GameWrapperEnvironment
-    agents: List[Agent]
+    agents: List["BaseAgent"]
     episodes: int
     rounds: Optional[int]
     max_same_player: int
+    render: bool
+    verbose: bool
+    stats: PlayStats
 
-    def __init__(self, env, agents, episodes=1, rounds=None, max_same_player=20):
+    def __init__(
+        self,
+        env,
+        agents,
+        episodes=1,
+        rounds=None,
+        max_same_player=20,
+        render=False,
+        verbose=False,
+    ):
         assert len(agents) == env.n_agents
         self.env = env
         self.agents = agents
         self.episodes = episodes
         self.rounds = rounds
         self.max_same_player = max_same_player
+        self.render = render
+        self.verbose = verbose
+        self.stats = PlayStats(env.n_agents)
+
+    def iter_episodes(self) -> Generator[EpisodeResult, None, None]:
+        """Play the agents against the environment, yielding each episode
 
-    def play(self):
+        Aggregate counters are kept in `self.stats`.  If `rounds` is
+        reached, the last episode is yielded with `done=False`.
+        """
         env = self.env
 
         rounds = 0
+        obs_n: Optional[List] = None
         for ep_i in range(self.episodes):
             done_n = [False for _ in range(env.n_agents)]
-            ep_reward = 0
-
-            obs_n = env.reset()
-            env.render()
+            ep_reward_n = [0] * env.n_agents
+            ep_length = 0
+            start_time = time.perf_counter()
+
+            # With auto reset, the env already started the next game
+            if obs_n is None or not env.auto_reset:
+                obs_n = env.reset()
+            if self.render:
+                env.render()
 
             same_player_count = 0
             last_player = None
+            reached_rounds = False
             while not all(done_n):
                 player_id = env.next_player
                 assert player_id is not None
@@ -302,11 +472,9 @@ class EnvironmentInteration:
                             f"playing more than {self.max_same_player} rounds"
                         )
 
-                action_n = [None] * env.n_agents
-                # print(f"Player {player_id} taking action...")
+                action_n: List[Optional[int]] = [None] * env.n_agents
 
                 action_taken = self.agents[player_id].forward(obs_n[player_id])
-                # print(f"Action taken: {action_taken}")
                 assert isinstance(
                     int(action_taken), int
                 ), f"Forward agent {self.agents[player_id]} should return an integer. (Got: {action_taken.__class__})"
@@ -314,17 +482,149 @@ class EnvironmentInteration:
                 action_n[player_id] = action_taken
 
                 obs_n, reward_n, done_n, _ = env.step(action_n)
-                ep_reward += sum(reward_n)
-                env.render()
+                for i, r in enumerate(reward_n):
+                    ep_reward_n[i] += r
+                ep_length += 1
+                if self.render:
+                    env.render()
 
                 last_player = player_id
 
                 # Check how many rounds we have done.
                 rounds += 1
                 if self.rounds is not None and rounds >= self.rounds:
-                    print(f"Reached {rounds} rounds. exiting.")
-                    env.close()
-                    return
+                    reached_rounds = True
+                    break
+
+            elapsed = time.perf_counter() - start_time
+            done = all(done_n)
+            result = EpisodeResult(
+                episode=ep_i,
+                rewards=ep_reward_n,
+                length=ep_length,
+                winner=_get_winner(ep_reward_n, done),
+                steps_per_second=ep_length / elapsed if elapsed > 0 else 0.0,
+                done=done,
+            )
+            self.stats.add(result, elapsed)
+            if self.verbose:
+                print("Episode #{} Reward: {}".format(ep_i, sum(ep_reward_n)))
+            yield result
 
-            print("Episode #{} Reward: {}".format(ep_i, ep_reward))
+            if reached_rounds:
+                if self.verbose:
+                    print(f"Reached {rounds} rounds. exiting.")
+                break
         env.close()
+
+    def play(self, callback: Optional[Callable[[EpisodeResult], Any]] = None):
+        """Play all episodes
+
+        :param callback: called with the `EpisodeResult` of each episode
+        :return: the aggregated `PlayStats`
+        """
+        for result in self.iter_episodes():
+            if callback is not None:
+                callback(result)
+        return self.stats
+
+    def play_batch(
+        self,
+        envs: Sequence[GameWrapperEnvironment],
+        callback: Optional[Callable[[EpisodeResult], Any]] = None,
+    ) -> PlayStats:
+        """Play the agents against a batch of environments in lockstep
+
+        At each step, all environments waiting on the same player are
+        grouped, and agents providing `forward_batch` (e.g. `KerasDQNAgent`)
+        are called once per group with the legal action masks.  Other
+        agents fall back to `forward` for each environment.
+
+        Each environment plays `self.episodes` episodes.  `self.rounds`
+        limits the number of batched steps.
+
+        :param callback: called with the `EpisodeResult` of each finished
+          episode
+        :return: the aggregated `PlayStats`
+        """
+        assert envs, "Must provide at least one environment"
+        assert all([e.n_agents == len(self.agents) for e in envs])
+
+        obs_batch = [e.reset() for e in envs]
+        done_batch = [[False] * e.n_agents for e in envs]
+        ep_rewards = [[0] * e.n_agents for e in envs]
+        ep_lengths = [0] * len(envs)
+        ep_starts = [time.perf_counter()] * len(envs)
+        episodes_left = [self.episodes] * len(envs)
+
+        rounds = 0
+        while any(episodes_left):
+            active = [i for i, left in enumerate(episodes_left) if left]
+
+            # Group environments by the player to move
+            by_player: Dict[int, List[int]] = {}
+            for i in active:
+                by_player.setdefault(envs[i].next_player, []).append(i)
+
+            actions: Dict[int, int] = {}
+            for player_id, env_indexes in by_player.items():
+                agent = self.agents[player_id]
+                forward_batch = getattr(agent, "forward_batch", None)
+                if forward_batch is not None:
+                    legal_masks = []
+                    for i in env_indexes:
+                        decision = envs[i].next_accepted_action
+                        assert decision is not None
+                        legal_masks.append(decision.legal_action_mask())
+                    batch_actions = forward_batch(
+                        [obs_batch[i][player_id] for i in env_indexes],
+                        legal_masks=legal_masks,
+                    )
+                    actions.update(zip(env_indexes, batch_actions))
+                else:
+                    for i in env_indexes:
+                        actions[i] = agent.forward(obs_batch[i][player_id])
+
+            for i in active:
+                env = envs[i]
+                action_n: List[Optional[int]] = [None] * env.n_agents
+                action_n[env.next_player] = int(actions[i])
+                obs_batch[i], reward_n, done_batch[i], _ = env.step(action_n)
+                for p, r in enumerate(reward_n):
+                    ep_rewards[i][p] += r
+                ep_lengths[i] += 1
+
+                if all(done_batch[i]):
+                    elapsed = time.perf_counter() - ep_starts[i]
+                    result = EpisodeResult(
+                        episode=self.episodes - episodes_left[i],
+                        rewards=ep_rewards[i],
+                        length=ep_lengths[i],
+                        winner=_get_winner(ep_rewards[i], True),
+                        steps_per_second=ep_lengths[i] / elapsed
+                        if elapsed > 0
+                        else 0.0,
+                    )
+                    self.stats.add(result, elapsed)
+                    if self.verbose:
+                        print("Env #{} Reward: {}".format(i, sum(ep_rewards[i])))
+                    if callback is not None:
+                        callback(result)
+
+                    ep_rewards[i] = [0] * env.n_agents
+                    ep_lengths[i] = 0
+                    ep_starts[i] = time.perf_counter()
+                    episodes_left[i] -= 1
+                    # With auto reset, the env already started the next game
+                    if episodes_left[i] and not env.auto_reset:
+                        obs_batch[i] = env.reset()
+
+            rounds += 1
+            if self.rounds is not None and rounds >= self.rounds:
+                if self.verbose:
+                    print(f"Reached {rounds} rounds. exiting.")
+                break
+
+        for env in envs:
+            env.close()
+        return self.stats
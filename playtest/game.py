@@ -1,26 +1,231 @@
-from typing import Dict, Callable, Tuple, Optional
+from typing import Dict, Callable, Tuple, Optional, Sequence, List, Union
+from dataclasses import dataclass
+import collections
+import functools
 import enum
 import abc
 
 from .state import FullState
 from .action import BaseDecision, ActionInstance
+from .constant import Reward
 
 # Gamestate must be of enum
 GameState = enum.Enum
 
+
+@dataclass(frozen=True)
+class ContinueTo:
+    """Returned by a handler to continue with the handler of another state
+
+    The handler of `game_state` is then called with no action.  This
+    replaces calling the other handler directly, so that long chains of
+    handlers do not grow the stack.
+    """
+
+    game_state: enum.Enum
+
+
 # State, ActionDecision, GameState, next player
 TypeHandlerReturn = Tuple[FullState, Optional[BaseDecision], GameState, Optional[int]]
+# Returned by handlers, which may continue with another handler
+TypeHandlerResult = Union[TypeHandlerReturn, ContinueTo]
+TypeHandler = Callable[[FullState, Optional[ActionInstance]], TypeHandlerResult]
+
+
+class InvalidTransitionError(RuntimeError):
+    """Raised when a handler goes to a state it does not declare"""
+
+    pass
 
 
 class GameHandler:
     """A class which contains a mapping of various handler function
+
+    Optionally, `transitions` declares the states each handler may go to
+    (either returned, or with `ContinueTo`), which is validated by `compile`
+    and checked on each transition of the compiled handler.  States in
+    `terminal_states` (e.g. end of game) have no handler.
     """
 
+    transitions: Optional[Dict[enum.Enum, Sequence[enum.Enum]]] = None
+    terminal_states: Sequence[enum.Enum] = ()
+
     @abc.abstractproperty
     def handler(self) -> Dict[enum.Enum, Callable]:
         raise NotImplementedError()
 
-    def get_handler(
-        self, game_state: enum.Enum
-    ) -> Callable[[FullState, Optional[ActionInstance]], TypeHandlerReturn]:
+    def get_handler(self, game_state: enum.Enum) -> TypeHandler:
         return self.handler[game_state]
+
+    def get_winners(self, s: FullState) -> Sequence[int]:
+        """Return the winners, once the game has ended (i.e. no decision)
+
+        Override to reward the players, see `get_rewards`.
+        """
+        return []
+
+    def get_rewards(self, s: FullState) -> List[int]:
+        """Rewards of each player at the end of the game
+
+        `Reward.WINNER` for each winner, and `Reward.LOSER` for the other
+        players.  If there is no winner, every player gets `Reward.DEFAULT`.
+        """
+        winners = self.get_winners(s)
+        if not winners:
+            return [Reward.DEFAULT] * s.number_of_players
+        return [
+            Reward.WINNER if pid in winners else Reward.LOSER
+            for pid in range(s.number_of_players)
+        ]
+
+    def handle(
+        self,
+        s: FullState,
+        game_state: enum.Enum,
+        action: Optional[ActionInstance] = None,
+    ) -> TypeHandlerReturn:
+        """Call the handler of the state, following `ContinueTo`"""
+        result = self.get_handler(game_state)(s, action)
+        while isinstance(result, ContinueTo):
+            result = self.get_handler(result.game_state)(s, None)
+        return result
+
+    def compile(self, start_state: enum.Enum) -> "CompiledGameHandler":
+        """Validate the states, and return a handler counting transitions"""
+        return CompiledGameHandler(self, start_state)
+
+
+class CompiledGameHandler(GameHandler):
+    """Game handler with validated states and an int indexed dispatch table
+
+    On compile, every state reachable from the start state through the
+    declared `transitions` must have a handler, unless it is terminal.
+
+    Each step follows the int index of the current state: the next state is
+    looked up (by name) in the allowed next states of the current one,
+    which also checks the transition is declared.  The index of the state
+    returned last is kept, so the next `handle` from that state starts
+    without a lookup.
+
+    This also counts the transitions between states (including the ones
+    through `ContinueTo`), see `transition_counts`.  With the checks and
+    counts, a step costs about the same as `GameHandler.handle`, see
+    `examples/benchmark_handlers.py`.
+    """
+
+    game_handler: GameHandler
+    # Index of each game state in the dispatch table
+    state_index: Dict[enum.Enum, int]
+    dispatch: List[TypeHandler]
+    # Index of the allowed next states of each state, by name
+    next_index: List[Dict[str, int]]
+    _counts: List[List[int]]
+
+    def __init__(self, game_handler: GameHandler, start_state: enum.Enum):
+        self.game_handler = game_handler
+        self.transitions = game_handler.transitions
+        self.terminal_states = game_handler.terminal_states
+        game_states = list(start_state.__class__)
+        self.states = game_states
+        self.state_index = {gs: i for i, gs in enumerate(game_states)}
+
+        handlers = game_handler.handler
+        for game_state in handlers.keys():
+            assert game_state in self.state_index, f"Unknown state {game_state}"
+        self._validate(handlers, start_state)
+
+        self.dispatch = [
+            handlers.get(gs, functools.partial(_missing_handler, gs))
+            for gs in game_states
+        ]
+        all_states = {gs.name: i for i, gs in enumerate(game_states)}
+        self.next_index = [all_states] * len(game_states)
+        if self.transitions is not None:
+            for gs, next_states in self.transitions.items():
+                self.next_index[self.state_index[gs]] = {
+                    n.name: self.state_index[n] for n in next_states
+                }
+        self._last_state = start_state
+        self._last_index = self.state_index[start_state]
+        self.reset_counts()
+
+    def _validate(self, handlers, start_state):
+        assert start_state in handlers, f"No handler for start state {start_state}"
+        if self.transitions is None:
+            return
+        for game_state in handlers.keys():
+            assert (
+                game_state in self.transitions
+            ), f"Transitions of {game_state} are not declared"
+        reached = set()
+        to_visit = [start_state]
+        while to_visit:
+            game_state = to_visit.pop()
+            if game_state in reached:
+                continue
+            reached.add(game_state)
+            if game_state in self.terminal_states:
+                continue
+            assert game_state in handlers, f"No handler for state {game_state}"
+            to_visit.extend(self.transitions[game_state])
+
+    @property
+    def handler(self) -> Dict[enum.Enum, Callable]:
+        return self.game_handler.handler
+
+    def get_winners(self, s: FullState) -> Sequence[int]:
+        return self.game_handler.get_winners(s)
+
+    def reset_counts(self):
+        size = len(self.states)
+        self._counts = [[0] * size for _ in range(size)]
+
+    @property
+    def transition_counts(self) -> Dict[Tuple[enum.Enum, enum.Enum], int]:
+        """Number of times each transition happened"""
+        counts: Dict[Tuple[enum.Enum, enum.Enum], int] = collections.OrderedDict()
+        for i, row in enumerate(self._counts):
+            for j, count in enumerate(row):
+                if count:
+                    counts[(self.states[i], self.states[j])] = count
+        return counts
+
+    def _invalid(self, from_index: int, to_state: enum.Enum) -> InvalidTransitionError:
+        return InvalidTransitionError(
+            f"Transition {self.states[from_index]} -> {to_state} is not declared"
+        )
+
+    def handle(
+        self,
+        s: FullState,
+        game_state: enum.Enum,
+        action: Optional[ActionInstance] = None,
+    ) -> TypeHandlerReturn:
+        if game_state is self._last_state:
+            index = self._last_index
+        else:
+            index = self.state_index[game_state]
+        dispatch = self.dispatch
+        next_index = self.next_index
+        counts = self._counts
+        result = dispatch[index](s, action)
+        # The transition is followed inline, as this runs on every step
+        while isinstance(result, ContinueTo):
+            to_index = next_index[index].get(result.game_state._name_)
+            if to_index is None:
+                raise self._invalid(index, result.game_state)
+            counts[index][to_index] += 1
+            index = to_index
+            result = dispatch[index](s, None)
+        game_state = result[2]
+        to_index = next_index[index].get(game_state._name_)
+        if to_index is None:
+            raise self._invalid(index, game_state)
+        counts[index][to_index] += 1
+        self._last_state = game_state
+        self._last_index = to_index
+        return result
+
+
+def _missing_handler(game_state: enum.Enum, s: FullState, action=None):
+    raise KeyError(f"No handler for state {game_state}")
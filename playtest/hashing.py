@@ -0,0 +1,193 @@
+"""Zobrist-style hashing of states
+
+`StateHasher` maintains a 64-bit hash of a `FullState`, updated
+incrementally as the components are mutated (cards moving between decks,
+token transfers, counter increments, int fields being set).
+
+Each piece of the state is given a stable random key, i.e. the same over
+processes and runs, and the hash is the xor of the keys of all pieces:
+
+* deck: (path, position, card)
+* other components: (path, index, value)
+* int fields: (path, value)
+
+The hash is kept per owner and visibility, so that the hash of what a
+player can see (see `FullState.to_player_data`) can be obtained without
+going over the whole state.
+"""
+import hashlib
+import functools
+from typing import Dict, Optional, Tuple
+
+from .components.core import Component, ComponentObserver
+from .components.card import Deck
+from .state import FullState, SubState, Visibility
+
+# Owner of a field: None for the full state, or the player id
+Owner = Optional[int]
+Path = Tuple[Owner, str]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def zobrist_key(*parts) -> int:
+    """Stable 64-bit random key for the given (hashable) parts"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _item_key(item) -> Tuple:
+    if isinstance(item, Component):
+        return tuple(int(v) for v in item.value)
+    return (int(item),)
+
+
+class StateHasher(ComponentObserver):
+    """Incrementally maintained hash of a state
+
+    The hasher observes the state and its components from creation, until
+    `detach` is called.
+
+        hasher = StateHasher(state)
+        state.deck.deal(state.players[0].hand)
+        hasher.hash()           # hash of the full state
+        hasher.player_hash(1)   # hash of what player 1 can see
+    """
+
+    state: FullState
+    # Hash contribution of each path
+    _contributions: Dict[Path, int]
+    # Hash of each (owner, visibility)
+    _buckets: Dict[Tuple[Owner, Visibility], int]
+    # Path of each observed component, by id
+    _paths: Dict[int, Path]
+    _components: Dict[Path, Component]
+    _visibility: Dict[Path, Visibility]
+    _owners: Dict[int, Owner]
+
+    def __init__(self, state: FullState):
+        self.state = state
+        self._contributions = {}
+        self._buckets = {}
+        self._paths = {}
+        self._components = {}
+        self._visibility = {}
+        self._owners = {}
+
+        self._observe_sub_state(None, state)
+        for player_id, player_state in enumerate(state.players):
+            self._observe_sub_state(player_id, player_state)
+
+    def _observe_sub_state(self, owner: Owner, sub_state: SubState):
+        self._owners[id(sub_state)] = owner
+        sub_state.add_observer(self)
+        for name, visibility in sub_state.visibility.items():
+            path = (owner, name)
+            self._visibility[path] = visibility
+            self._set_field(path, getattr(sub_state, name))
+
+    def _set_field(self, path: Path, value):
+        if isinstance(value, Component):
+            if self._components.get(path) is not value:
+                self._components[path] = value
+                self._paths[id(value)] = path
+                value.add_observer(self)
+            self._update(path, self._component_hash(path, value))
+        else:
+            self._update(path, zobrist_key(path, int(value)))
+
+    def _component_hash(self, path: Path, component: Component) -> int:
+        h = 0
+        for i, item in enumerate(component.value):
+            h ^= zobrist_key(path, i, _item_key(item))
+        return h
+
+    def _update(self, path: Path, contribution: int):
+        """Replace the contribution of the path"""
+        self._xor(path, self._contributions.get(path, 0) ^ contribution)
+        self._contributions[path] = contribution
+
+    def _xor(self, path: Path, key: int):
+        bucket = (path[0], self._visibility[path])
+        self._buckets[bucket] = self._buckets.get(bucket, 0) ^ key
+
+    def detach(self):
+        """Stop observing the state"""
+        for sub_state in [self.state] + list(self.state.players):
+            sub_state.remove_observer(self)
+        for component in self._components.values():
+            component.remove_observer(self)
+        self._components = {}
+        self._paths = {}
+
+    # ---------
+    # Observer
+    # ---------
+
+    def on_insert(self, component: Component, index: int, item):
+        path = self._paths[id(component)]
+        if isinstance(component, Deck) and index == len(component) - 1:
+            # Appending a card only adds the key of the card
+            key = zobrist_key(path, index, _item_key(item))
+            self._contributions[path] ^= key
+            self._xor(path, key)
+        else:
+            self.on_change(component)
+
+    def on_remove(self, component: Component, index: int, item):
+        path = self._paths[id(component)]
+        if isinstance(component, Deck) and index == len(component):
+            # Removing the last card only removes the key of the card
+            key = zobrist_key(path, index, _item_key(item))
+            self._contributions[path] ^= key
+            self._xor(path, key)
+        else:
+            self.on_change(component)
+
+    def on_change(self, component: Component):
+        path = self._paths[id(component)]
+        self._update(path, self._component_hash(path, component))
+
+    def on_set_attribute(self, component: Component, name: str, value):
+        owner = self._owners.get(id(component))
+        path = (owner, name)
+        if path not in self._visibility:
+            return
+        old_value = self._components.get(path)
+        if old_value is not None and old_value is not value:
+            # The field is replaced, stop observing the old component
+            old_value.remove_observer(self)
+            del self._paths[id(old_value)]
+            del self._components[path]
+        self._set_field(path, value)
+
+    # ---------
+    # Hash
+    # ---------
+
+    def hash(self) -> int:
+        """Hash of the full state"""
+        h = 0
+        for bucket_hash in self._buckets.values():
+            h ^= bucket_hash
+        return h
+
+    def player_hash(self, player_id: int) -> int:
+        """Hash of what the player can see, i.e. its information set"""
+        h = zobrist_key("seat", player_id)
+        for (owner, visibility), bucket_hash in self._buckets.items():
+            if owner is None:
+                visible = Visibility.is_visible_to(visibility, Visibility.SELF)
+            elif owner == player_id:
+                visible = True
+            else:
+                visible = Visibility.is_visible_to(visibility, Visibility.ALL)
+            if visible:
+                h ^= bucket_hash
+        return h
+
+
+def state_hash(state: FullState) -> int:
+    """Compute the hash of the state from scratch"""
+    hasher = StateHasher(state)
+    hasher.detach()
+    return hasher.hash()
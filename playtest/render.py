@@ -0,0 +1,160 @@
+"""Rendering of the game state
+
+Frames are only built when a viewer is attached to the `Renderer`, or
+frames are being recorded, so rendering costs nothing when nobody is
+watching.
+"""
+import enum
+import time
+from typing import Callable, List, Optional
+
+from .components.core import Component
+from .components.card import Card, CardSuite, Deck
+from .state import FullState, SubState, Visibility
+
+
+class RenderMode(enum.Enum):
+    TEXT = "text"
+    ANSI = "ansi"
+
+
+ANSI_RED = "\x1b[31m"
+ANSI_BOLD = "\x1b[1m"
+ANSI_RESET = "\x1b[0m"
+
+RED_SUITES = {CardSuite.H, CardSuite.D}
+
+# Number of cards to show of a deck
+DECK_MAX_CARDS = 5
+
+
+def _format_card(card, mode: RenderMode) -> str:
+    card_str = repr(card)
+    if mode == RenderMode.ANSI and isinstance(card, Card) and card.suite in RED_SUITES:
+        return f"{ANSI_RED}{card_str}{ANSI_RESET}"
+    return card_str
+
+
+def format_deck(deck: Deck, mode=RenderMode.TEXT) -> str:
+    """Show the size and top cards of the deck (the last ones to be dealt)"""
+    shown = deck.value[-DECK_MAX_CARDS:]
+    prefix = "..." if len(deck) > len(shown) else ""
+    return "{}[{}]({}{})".format(
+        deck.__class__.__name__,
+        len(deck),
+        prefix,
+        ",".join([_format_card(c, RenderMode(mode)) for c in shown]),
+    )
+
+
+def _format_value(value, mode: RenderMode) -> str:
+    if isinstance(value, Deck):
+        return format_deck(value, mode)
+    if isinstance(value, Component):
+        return repr(value)
+    return str(value)
+
+
+def _render_substate(
+    sub_state: SubState, min_visibility: Visibility, mode: RenderMode, indent=""
+) -> List[str]:
+    lines = []
+    for name, visibility in sub_state.visibility.items():
+        if not Visibility.is_visible_to(visibility, min_visibility):
+            continue
+        value = getattr(sub_state, name)
+        lines.append(f"{indent}{name}: {_format_value(value, mode)}")
+    return lines
+
+
+def render_state(
+    state: FullState, player_id: Optional[int] = None, mode=RenderMode.TEXT
+) -> str:
+    """Render the state as a string
+
+    :param player_id: render only what the player can see.  If None, render
+      the full state (e.g. for a spectator).
+    """
+    mode = RenderMode(mode)
+    top_visibility = Visibility.NONE if player_id is None else Visibility.SELF
+    lines = _render_substate(state, top_visibility, mode)
+    for pid, player_state in enumerate(state.players):
+        is_self = player_id is None or pid == player_id
+        title = f"player {pid}" + (" (you)" if pid == player_id else "")
+        if mode == RenderMode.ANSI:
+            title = f"{ANSI_BOLD}{title}{ANSI_RESET}"
+        lines.append(title)
+        lines.extend(
+            _render_substate(
+                player_state,
+                Visibility.NONE if is_self else Visibility.ALL,
+                mode,
+                indent="  ",
+            )
+        )
+    return "\n".join(lines)
+
+
+class Renderer:
+    """Build and dispatch frames to the attached viewers
+
+    :param mode: text or ansi
+    :param player_id: only render what the player can see
+    :param max_fps: skip frames rendered too close to the previous one
+    :param record: keep all rendered frames in `frames`
+    """
+
+    viewers: List[Callable[[str], None]]
+    frames: List[str]
+    skipped_frames: int
+
+    def __init__(
+        self,
+        mode=RenderMode.TEXT,
+        player_id: Optional[int] = None,
+        max_fps: Optional[float] = None,
+        record=False,
+    ):
+        self.mode = RenderMode(mode)
+        self.player_id = player_id
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.record = record
+        self.viewers = []
+        self.frames = []
+        self.skipped_frames = 0
+        self._last_frame_time: Optional[float] = None
+
+    def attach(self, viewer: Callable[[str], None]):
+        self.viewers.append(viewer)
+
+    def detach(self, viewer: Callable[[str], None]):
+        self.viewers.remove(viewer)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.viewers) or self.record
+
+    def render(self, state: FullState, force=False) -> Optional[str]:
+        """Render a frame, if anyone is watching
+
+        :param force: ignore the frame rate limit, e.g. for the final frame
+        :return: the frame, or None if not rendered
+        """
+        if not self.active:
+            return None
+        now = time.monotonic()
+        if (
+            not force
+            and self._last_frame_time is not None
+            and now - self._last_frame_time < self.min_interval
+        ):
+            self.skipped_frames += 1
+            return None
+        self._last_frame_time = now
+
+        frame = render_state(state, player_id=self.player_id, mode=self.mode)
+        for viewer in self.viewers:
+            viewer(frame)
+        if self.record:
+            self.frames.append(frame)
+        return frame
@@ -0,0 +1,464 @@
+"""Asyncio game server for playtesting sessions
+
+A `GameServer` hosts many tables, each with its own environment.  Humans
+connect (over TCP, or in process with `connect_local`), join a table, and
+bots fill the seats left.  Each table runs in its own task, so a slow
+player only ever holds up their own table.
+
+Messages are JSON objects, one per line over TCP:
+
+* client: `{"type": "join"}`, then `{"type": "action", "action": "bet(3)"}`
+  (the string of `BaseDecision.from_str`, or the int of `from_int`), and
+  `{"type": "ack", "version": 3}` for each state received.  Or
+  `{"type": "spectate", "table": 0}` to watch a table.
+* server: `joined` (table and player id), `state` (what the player can
+  see, from `to_player_data`, and the legal actions on their turn),
+  `error`, `timeout` (a random action was taken) and `end` (rewards).
+
+The state is streamed with `playtest.delta.StateStream`: a message either
+has the full `state`, or the `delta` from the `base` version acknowledged
+by the client, which a `playtest.delta.StateReplica` applies.
+
+e.g. to host tables of 2 players, with one human per table:
+
+    server = GameServer(make_env, humans_per_table=1)
+    asyncio.run(server.serve("127.0.0.1", 8888))
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .action import BaseDecision, InvalidActionError
+from .delta import StateStream, player_view, spectator_view, to_json_value
+from .env import GameWrapperEnvironment
+from .agents.base import BaseAgent
+from .agents.random import RandomAgent
+
+EnvFactory = Callable[[], GameWrapperEnvironment]
+BotFactory = Callable[[GameWrapperEnvironment], BaseAgent]
+
+
+def decision_to_json(decision: BaseDecision) -> Dict[str, Any]:
+    """Legal range of each legal action, by name of the action"""
+    return {
+        key.value: to_json_value(legal_range)
+        for key, legal_range in decision.legal_action.items()
+    }
+
+
+class Connection:
+    """A connected client, which sends and receives messages"""
+
+    async def send(self, message: Dict):
+        raise NotImplementedError()
+
+    async def receive(self) -> Optional[Dict]:
+        """Return the next message, or None when the client disconnected"""
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class StreamConnection(Connection):
+    """Connection with JSON lines, over asyncio streams"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, message: Dict):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def receive(self) -> Optional[Dict]:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return None
+            try:
+                return json.loads(line)
+            except ValueError:
+                await self.send({"type": "error", "message": "Malformed message"})
+
+    def close(self):
+        self.writer.close()
+
+
+class QueueConnection(Connection):
+    """In process connection, e.g. for tests and local clients"""
+
+    def __init__(self, incoming: asyncio.Queue, outgoing: asyncio.Queue):
+        self.incoming = incoming
+        self.outgoing = outgoing
+
+    async def send(self, message: Dict):
+        await self.outgoing.put(message)
+
+    async def receive(self) -> Optional[Dict]:
+        return await self.incoming.get()
+
+    def close(self):
+        self.outgoing.put_nowait(None)
+
+
+class Table:
+    """A game, played by the humans connected to the seats, and bots"""
+
+    table_id: int
+    env: GameWrapperEnvironment
+    # Connection of the human of each seat, None for bots
+    seats: List[Optional[Connection]]
+    bots: Dict[int, BaseAgent]
+    # State stream and actions received of each human seat
+    streams: Dict[int, StateStream]
+    actions: Dict[int, asyncio.Queue]
+    spectators: List[Tuple[Connection, StateStream]]
+    started: bool
+    finished: asyncio.Event
+    rewards: Optional[List[int]]
+
+    def __init__(self, table_id: int, env: GameWrapperEnvironment):
+        self.table_id = table_id
+        self.env = env
+        self.seats = [None] * env.n_agents
+        self.bots = {}
+        self.streams = {}
+        self.actions = {}
+        self.spectators = []
+        self.started = False
+        self.finished = asyncio.Event()
+        self.rewards = None
+
+    @property
+    def number_of_humans(self) -> int:
+        return len([s for s in self.seats if s is not None])
+
+    def add_human(self, connection: Connection) -> int:
+        player_id = self.seats.index(None)
+        self.seats[player_id] = connection
+        self.streams[player_id] = StateStream(player_view(player_id))
+        self.actions[player_id] = asyncio.Queue()
+        return player_id
+
+
+class GameServer:
+    """Host tables of a game for human players, with bots in empty seats
+
+    :param env_factory: create the environment of a new table
+    :param bot_factory: create the bot of an empty seat, a random agent by
+      default
+    :param humans_per_table: a table starts once that many humans joined
+    :param max_tables: number of tables played at once
+    :param action_timeout: seconds a human has to act, before a random
+      action is taken for them
+    :param run_bots_in_executor: run bots in threads, so a slow bot (e.g. a
+      search agent) does not block other tables.  Only for bots which can
+      run in any thread: a `KerasDQNAgent` must run in the thread owning its
+      graph, or use an `InferenceAgent` instead.
+    """
+
+    env_factory: EnvFactory
+    bot_factory: BotFactory
+    humans_per_table: int
+    max_tables: int
+    action_timeout: float
+    run_bots_in_executor: bool
+
+    tables: Dict[int, Table]
+    # Table waiting for humans to join
+    waiting_table: Optional[Table]
+    tables_played: int
+
+    def __init__(
+        self,
+        env_factory: EnvFactory,
+        bot_factory: BotFactory = RandomAgent,
+        humans_per_table: int = 1,
+        max_tables: int = 256,
+        action_timeout: float = 60.0,
+        run_bots_in_executor: bool = False,
+    ):
+        self.env_factory = env_factory
+        self.bot_factory = bot_factory
+        self.humans_per_table = humans_per_table
+        self.max_tables = max_tables
+        self.action_timeout = action_timeout
+        self.run_bots_in_executor = run_bots_in_executor
+        self.tables = {}
+        self.waiting_table = None
+        self.tables_played = 0
+        self._next_table_id = 0
+        self._tasks: Set[asyncio.Future] = set()
+
+    def _spawn(self, coroutine) -> asyncio.Future:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------
+    # Connections
+    # ---------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8888):
+        """Start accepting TCP clients, return the `asyncio.Server`"""
+        return await asyncio.start_server(self._handle_stream, host, port)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8888):
+        """Accept TCP clients until cancelled"""
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_stream(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        await self.handle_connection(StreamConnection(reader, writer))
+
+    def connect_local(self) -> QueueConnection:
+        """Connect an in process client, which must be used in the same loop
+
+        Return: the connection of the client, i.e. `send` to the server
+        """
+        to_server: asyncio.Queue = asyncio.Queue()
+        to_client: asyncio.Queue = asyncio.Queue()
+        self._spawn(self.handle_connection(QueueConnection(to_server, to_client)))
+        return QueueConnection(to_client, to_server)
+
+    async def handle_connection(self, connection: Connection):
+        """Seat the client at a table, and wait for the end of the game"""
+        try:
+            message = await connection.receive()
+            if message is None:
+                return
+            if message.get("type") == "spectate":
+                await self._spectate(connection, message.get("table"))
+                return
+            if message.get("type") != "join":
+                await connection.send(
+                    {"type": "error", "message": "Must join a table first"}
+                )
+                return
+            table = self._get_waiting_table()
+            if table is None:
+                await connection.send({"type": "error", "message": "Server is full"})
+                return
+            player_id = table.add_human(connection)
+            await connection.send(
+                {"type": "joined", "table": table.table_id, "player": player_id}
+            )
+            if table.number_of_humans >= self.humans_per_table:
+                self._start(table)
+            await self._read_until_finished(
+                table, connection, table.streams[player_id], player_id
+            )
+        finally:
+            connection.close()
+
+    async def _spectate(self, connection: Connection, table_id: Any):
+        table = self.tables.get(table_id)
+        if table is None:
+            await connection.send({"type": "error", "message": "Unknown table"})
+            return
+        spectator = (connection, StateStream(spectator_view))
+        table.spectators.append(spectator)
+        await connection.send({"type": "spectating", "table": table.table_id})
+        try:
+            await self._read_until_finished(table, connection, spectator[1])
+        finally:
+            table.spectators.remove(spectator)
+
+    async def _read_until_finished(
+        self,
+        table: Table,
+        connection: Connection,
+        stream: StateStream,
+        player_id: Optional[int] = None,
+    ):
+        """Read the messages of the client, until it leaves or the game ends
+
+        Acks are handled as they arrive, and other messages of a seated
+        player are queued for `_human_action`.
+        """
+        actions = table.actions[player_id] if player_id is not None else None
+
+        async def read():
+            while True:
+                message = await connection.receive()
+                if message is not None and message.get("type") == "ack":
+                    stream.ack(message.get("version"))
+                elif actions is not None:
+                    actions.put_nowait(message)
+                if message is None:
+                    if player_id is not None:
+                        self._leave(table, player_id, connection)
+                    return
+
+        reader = asyncio.ensure_future(read())
+        finished = asyncio.ensure_future(table.finished.wait())
+        try:
+            await asyncio.wait([reader, finished], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            reader.cancel()
+            finished.cancel()
+
+    # ---------
+    # Tables
+    # ---------
+
+    def _get_waiting_table(self) -> Optional[Table]:
+        if self.waiting_table is None:
+            if len(self.tables) >= self.max_tables:
+                return None
+            table = Table(self._next_table_id, self.env_factory())
+            assert (
+                table.env.n_agents >= self.humans_per_table
+            ), "Not enough seats for the humans"
+            self._next_table_id += 1
+            self.tables[table.table_id] = table
+            self.waiting_table = table
+        return self.waiting_table
+
+    def _leave(self, table: Table, player_id: int, connection: Connection):
+        """Free the seat of a human who left, a bot takes over once started"""
+        if table.seats[player_id] is not connection:
+            return
+        logging.info(f"Player {player_id} left table {table.table_id}")
+        table.seats[player_id] = None
+        if table.started:
+            table.bots[player_id] = self.bot_factory(table.env)
+
+    async def _send(self, connection: Connection, message: Dict) -> bool:
+        """Send the message, return False if the client is gone
+
+        A client leaving must not crash the table of the others.
+        """
+        try:
+            await connection.send(message)
+        except (ConnectionError, OSError) as e:
+            logging.info(f"Failed to send to a client: {e}")
+            return False
+        return True
+
+    def _start(self, table: Table):
+        if self.waiting_table is table:
+            self.waiting_table = None
+        table.started = True
+        for player_id, connection in enumerate(table.seats):
+            if connection is None:
+                table.bots[player_id] = self.bot_factory(table.env)
+        self._spawn(self._play(table))
+
+    async def _play(self, table: Table):
+        env = table.env
+        try:
+            obs_n = env.reset()
+            done = False
+            while not done:
+                player_id = env.next_player
+                await self._broadcast_state(table)
+                action = None
+                if table.seats[player_id] is not None:
+                    action = await self._human_action(table, player_id)
+                if action is None:
+                    action = await self._bot_action(table, player_id, obs_n[player_id])
+                action_n: List[Optional[int]] = [None] * env.n_agents
+                action_n[player_id] = action
+                obs_n, rewards, done_n, _ = env.step(action_n)
+                done = all(done_n)
+            table.rewards = list(rewards)
+            for connection in self._watchers(table):
+                await self._send(connection, {"type": "end", "rewards": table.rewards})
+        except Exception:
+            logging.exception(f"Table {table.table_id} crashed")
+            for seat in table.seats:
+                if seat is not None:
+                    await self._send(
+                        seat, {"type": "error", "message": "The game crashed"}
+                    )
+        finally:
+            self.tables_played += 1
+            del self.tables[table.table_id]
+            table.finished.set()
+
+    def _watchers(self, table: Table) -> List[Connection]:
+        """Connections of the humans seated, and of the spectators"""
+        connections = [c for c in table.seats if c is not None]
+        return connections + [c for c, _ in table.spectators]
+
+    async def _broadcast_state(self, table: Table):
+        env = table.env
+        decision = env.next_accepted_action
+        assert decision is not None
+        streams: List[Tuple[Connection, StateStream, Optional[int]]] = [
+            (connection, table.streams[player_id], player_id)
+            for player_id, connection in enumerate(table.seats)
+            if connection is not None
+        ]
+        streams += [
+            (connection, stream, None) for connection, stream in table.spectators
+        ]
+        # Each view is computed once, e.g. for all the spectators
+        views: Dict = {}
+        for connection, stream, player_id in streams:
+            message = {"type": "state", "next_player": env.next_player}
+            message.update(stream.update(env.state, views))
+            if player_id == env.next_player:
+                message["decision"] = decision_to_json(decision)
+            if not await self._send(connection, message) and player_id is not None:
+                self._leave(table, player_id, connection)
+
+    async def _bot_action(self, table: Table, player_id: int, observation) -> int:
+        bot = table.bots[player_id]
+        if self.run_bots_in_executor:
+            loop = asyncio.get_event_loop()
+            return int(await loop.run_in_executor(None, bot.forward, observation))
+        return int(bot.forward(observation))
+
+    async def _human_action(self, table: Table, player_id: int) -> Optional[int]:
+        """Wait for a legal action, or take a random action on timeout
+
+        Return: None if the player left, and a bot took over the seat
+        """
+        connection = table.seats[player_id]
+        assert connection is not None
+        actions = table.actions[player_id]
+        decision = table.env.next_accepted_action
+        assert decision is not None
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.action_timeout
+        while True:
+            try:
+                message = await asyncio.wait_for(actions.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                await self._send(connection, {"type": "timeout"})
+                return decision.to_int(decision.pick_random_action())
+            if message is None or table.seats[player_id] is not connection:
+                # Disconnected, so a bot takes over the seat
+                self._leave(table, player_id, connection)
+                return None
+            try:
+                return self._parse_action(decision, message)
+            except (InvalidActionError, KeyError, AssertionError, ValueError) as e:
+                await self._send(connection, {"type": "error", "message": str(e)})
+
+    def _parse_action(self, decision: BaseDecision, message: Dict) -> int:
+        if message.get("type") != "action":
+            raise ValueError(f"Expected an action, got {message.get('type')}")
+        value = message.get("action")
+        if isinstance(value, int):
+            action = decision.from_int(value)
+        else:
+            action = decision.from_str(str(value))
+        if not decision.is_legal(action):
+            raise InvalidActionError(f"Action {action} is not legal")
+        return decision.to_int(action)
+
+    async def close(self):
+        """Cancel all tables"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
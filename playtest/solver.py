@@ -0,0 +1,341 @@
+"""Exact expectimax solver for small games
+
+The solver walks the `GameHandler` transitions of a game from a given
+state.  At each decision node the deciding player picks the action that
+maximizes its own payoff, and the draws from hidden decks (of
+`Visibility.NONE`) are chance nodes: every distinct card remaining in the
+deck is an outcome, weighted by its count in the deck.
+
+Hidden decks are treated as unordered, so the canonical key of a state
+sorts the hidden decks.  Values are memoized in a transposition table of
+bounded size, which evicts the least recently used entries.
+
+    solver = Solver(BlackjackHandler(), payoff_fn=bank_payoff, max_depth=4)
+    result = solver.solve(State(param), GameState.start)
+    result.values                   # expected payoff of each player
+    solver.stats.nodes_per_second
+"""
+import copy
+import math
+import time
+import collections
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+import enum
+
+import numpy as np
+
+from .game import GameHandler
+from .state import FullState, SubState, Visibility
+from .action import BaseDecision, ActionInstance
+from .components.core import Component
+from .components.card import Deck, DeckAggregate, OutOfCardsError
+
+# Expected payoff of each player
+Values = Tuple[float, ...]
+PayoffFunction = Callable[[FullState], Sequence[float]]
+
+
+class _ChanceDraw(Exception):
+    """Raised when a handler draws a card which is not decided yet"""
+
+    def __init__(self, counts: Dict[Hashable, int]):
+        self.counts = counts
+
+
+class _ChanceCards(list):
+    """List of cards of a hidden deck, where drawing is a chance event
+
+    Drawing from the top (`pop()`) returns the card decided by the solver
+    (`draws`), or raise `_ChanceDraw` with the distinct cards which can be
+    drawn.
+    """
+
+    def __init__(self, cards, draws: List[Hashable]):
+        super().__init__(cards)
+        self.draws = draws
+
+    def pop(self, index=-1):
+        if index != -1:
+            return super().pop(index)
+        if not self:
+            raise OutOfCardsError("Ran out of cards")
+        if not self.draws:
+            raise _ChanceDraw(collections.Counter(_card_key(c) for c in self))
+        key = self.draws.pop(0)
+        for i, card in enumerate(self):
+            if _card_key(card) == key:
+                return super().pop(i)
+        raise RuntimeError(f"Card {key} not found in deck")
+
+
+def _card_key(card) -> Tuple[int, ...]:
+    return tuple(card.to_data())
+
+
+def _shallow_copy(obj):
+    clone = object.__new__(obj.__class__)
+    clone.__dict__.update(obj.__dict__)
+    observers = clone.__dict__.pop("_observers", None)
+    if observers:
+        # Aggregates are recomputed once the copy has its own cards.
+        # Other observers (e.g. a StateHasher) observe the original state.
+        clone._observers = [
+            copy.copy(o) for o in observers if isinstance(o, DeckAggregate)
+        ]
+    return clone
+
+
+def _clone_sub_state(sub_state: SubState) -> SubState:
+    """Copy the sub state, sharing the cards but not the containers"""
+    clone = _shallow_copy(sub_state)
+    for name in sub_state.visibility.keys():
+        value = clone.__dict__[name]
+        if isinstance(value, Component):
+            value = _shallow_copy(value)
+            if isinstance(value, Deck):
+                value.set_cards(list(value.value))
+            else:
+                value.value = list(value.value)
+            clone.__dict__[name] = value
+    return clone
+
+
+def clone_state(state: FullState) -> FullState:
+    """Copy of the state, which can be mutated by the handlers
+
+    This is much cheaper than a deepcopy, as cards are shared with the
+    original state (cards are moved around, but never mutated).
+    """
+    clone = _clone_sub_state(state)
+    clone.__dict__["players"] = [_clone_sub_state(p) for p in state.players]
+    return clone  # type: ignore
+
+
+def _hidden_decks(state: FullState) -> List[Deck]:
+    decks = []
+    sub_states: List[SubState] = [state]
+    sub_states.extend(state.players)
+    for sub_state in sub_states:
+        for name, visibility in sub_state.visibility.items():
+            value = getattr(sub_state, name)
+            if visibility == Visibility.NONE and isinstance(value, Deck):
+                decks.append(value)
+    return decks
+
+
+@dataclass
+class Node:
+    """A state of the game, where the player need to make a decision"""
+
+    state: FullState = field(repr=False)
+    game_state: enum.Enum
+    decision: Optional[BaseDecision]
+    next_player: Optional[int]
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.decision is None
+
+
+@dataclass
+class SolverStats:
+    nodes: int = 0
+    lookups: int = 0
+    hits: int = 0
+    evictions: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class SolverResult:
+    # Expected payoff of each player
+    values: Values
+    # Expected payoff of each legal action, for the deciding player of root
+    action_values: Dict[int, Values] = field(default_factory=dict)
+    best_action: Optional[int] = None
+
+
+class Solver:
+    """Memoized expectimax over the transitions of a game
+
+    :param payoff_fn: payoff of each player, evaluated at the end of the game
+      (or when `max_depth` decisions have been made)
+    :param max_depth: maximum number of decisions to look ahead, None for
+      searching until the end of the game
+    :param table_size: maximum number of entries of the transposition table
+    """
+
+    game_handler: GameHandler
+    payoff_fn: PayoffFunction
+    max_depth: Optional[int]
+    table_size: int
+
+    stats: SolverStats
+    # Transposition table, ordered from the least recently used
+    _table: "collections.OrderedDict[Hashable, Values]"
+
+    def __init__(
+        self,
+        game_handler: GameHandler,
+        payoff_fn: PayoffFunction,
+        max_depth: Optional[int] = None,
+        table_size: int = 1 << 16,
+    ):
+        assert table_size > 0
+        self.game_handler = game_handler
+        self.payoff_fn = payoff_fn
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.stats = SolverStats()
+        self._table = collections.OrderedDict()
+
+    def clear(self):
+        self._table.clear()
+        self.stats = SolverStats()
+
+    def solve(self, state: FullState, game_state: enum.Enum) -> SolverResult:
+        """Solve the game from the given handler state
+
+        The handler of `game_state` is called with no action, e.g. the start
+        state of the game.  The given state is not modified.
+        """
+        start_time = time.perf_counter()
+        outcomes = self.transition(state, game_state, None)
+        values = self._expectation(outcomes, depth=0)
+        self.stats.elapsed += time.perf_counter() - start_time
+        return SolverResult(values=values)
+
+    def solve_node(self, node: Node) -> SolverResult:
+        """Solve a decision node, returning the value of each legal action"""
+        start_time = time.perf_counter()
+        if node.is_terminal:
+            result = SolverResult(values=self._payoff(node.state))
+        else:
+            action_values = self._action_values(node, depth=0)
+            assert action_values, "No possible action"
+            best_action = self._best_action(node, action_values)
+            result = SolverResult(
+                values=action_values[best_action],
+                action_values=action_values,
+                best_action=best_action,
+            )
+        self.stats.elapsed += time.perf_counter() - start_time
+        return result
+
+    def transition(
+        self, state: FullState, game_state: enum.Enum, action: Optional[ActionInstance]
+    ) -> List[Tuple[float, Node]]:
+        """Return the possible outcomes of the action, with their probability
+
+        The handler is run once per outcome, over a copy of the state, where
+        the cards drawn from the hidden decks are forced.
+        """
+        outcomes: List[Tuple[float, Node]] = []
+        pending: List[Tuple[List[Hashable], float]] = [([], 1.0)]
+        while pending:
+            draws, probability = pending.pop()
+            new_state = clone_state(state)
+            decks = _hidden_decks(new_state)
+            forced = list(draws)
+            for deck in decks:
+                deck.set_cards(_ChanceCards(deck.value, forced))
+            try:
+                result = self.game_handler.handle(new_state, game_state, action)
+            except _ChanceDraw as draw:
+                total = sum(draw.counts.values())
+                for key, count in draw.counts.items():
+                    pending.append((draws + [key], probability * count / total))
+                continue
+            except OutOfCardsError:
+                # This outcome cannot happen
+                continue
+            new_state, decision, next_game_state, next_player = result
+            for deck in decks:
+                deck.set_cards(list(deck.value))
+            outcomes.append(
+                (probability, Node(new_state, next_game_state, decision, next_player))
+            )
+        return outcomes
+
+    def canonical_key(self, node: Node, depth: int) -> Hashable:
+        """Key of the node, where the order of hidden decks is ignored"""
+        decks = _hidden_decks(node.state)
+        cards = [deck.value for deck in decks]
+        for deck in decks:
+            deck.set_cards(sorted(deck.value, key=_card_key))
+        try:
+            data = repr(node.state.to_data())
+        finally:
+            for deck, value in zip(decks, cards):
+                deck.set_cards(value)
+        remaining = None if self.max_depth is None else self.max_depth - depth
+        return (node.game_state, node.next_player, remaining, data)
+
+    def _payoff(self, state: FullState) -> Values:
+        return tuple(float(v) for v in self.payoff_fn(state))
+
+    def _expectation(self, outcomes: List[Tuple[float, Node]], depth: int) -> Values:
+        assert outcomes, "Expected at least one outcome"
+        total = math.fsum(probability for probability, _ in outcomes)
+        weighted = [
+            [probability * v for v in self._value(node, depth)]
+            for probability, node in outcomes
+        ]
+        return tuple(math.fsum(values) / total for values in zip(*weighted))
+
+    def _value(self, node: Node, depth: int) -> Values:
+        if node.is_terminal or (self.max_depth is not None and depth >= self.max_depth):
+            return self._payoff(node.state)
+
+        key = self.canonical_key(node, depth)
+        self.stats.lookups += 1
+        if key in self._table:
+            self.stats.hits += 1
+            self._table.move_to_end(key)
+            return self._table[key]
+
+        action_values = self._action_values(node, depth)
+        if action_values:
+            values = action_values[self._best_action(node, action_values)]
+        else:
+            values = self._payoff(node.state)
+
+        self._table[key] = values
+        if len(self._table) > self.table_size:
+            self._table.popitem(last=False)
+            self.stats.evictions += 1
+        return values
+
+    def _action_values(self, node: Node, depth: int) -> Dict[int, Values]:
+        assert node.decision is not None
+        self.stats.nodes += 1
+        action_values: Dict[int, Values] = {}
+        for action_int in np.flatnonzero(node.decision.legal_action_mask()):
+            action = node.decision.from_int(int(action_int))
+            outcomes = self.transition(node.state, node.game_state, action)
+            if outcomes:
+                action_values[int(action_int)] = self._expectation(outcomes, depth + 1)
+        return action_values
+
+    @staticmethod
+    def _best_action(node: Node, action_values: Dict[int, Values]) -> int:
+        assert node.next_player is not None
+        player = node.next_player
+        return max(action_values.keys(), key=lambda a: action_values[a][player])
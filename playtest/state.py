@@ -1,11 +1,23 @@
 import inspect
-from typing import Dict, Type, Sequence, Union, TypeVar, Generic
+from typing import (
+    Any,
+    Dict,
+    Type,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    TypeVar,
+    Generic,
+)
 import numpy as np
-from enum import IntEnum
+from enum import Enum, IntEnum
 
 import gym.spaces as spaces
 
 from .components.core import Component
+from .components.card import Deck
 
 
 class Visibility(IntEnum):
@@ -33,6 +45,13 @@ class SubState(Component):
     def __init__(self, param=None):
         pass
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Every assignment goes through here, so skip the loop without observers
+        if self._observers:
+            for observer in self._observers:
+                observer.on_set_attribute(self, name, value)
+
     def reset(self):
         for name in self.visibility.keys():
             attr_val = getattr(self, name, None)
@@ -43,7 +62,7 @@ class SubState(Component):
             elif issubclass(attr_val.__class__, Component):
                 attr_val.reset()
             elif type(attr_val) is int:
-                # TODO: this is not reset, but we really should reset it
+                # Int fields are not kept, restore a `StateTemplate` instead
                 pass
             else:
                 raise TypeError(f"Unknown type for {name}: value {attr_val}")
@@ -146,6 +165,21 @@ class SubState(Component):
         return instance
 
 
+class OthersEncoding(Enum):
+    """How the visible data of the other players is observed
+
+    TUPLE keeps a copy of the visible space for each other player.  The
+    others pool the (flattened) visible fields across the other players, so
+    the observation is of fixed size whatever the number of players, with
+    a `count` of the other players.
+    """
+
+    TUPLE = "tuple"
+    SUM = "sum"
+    MEAN = "mean"
+    MAX = "max"
+
+
 S = TypeVar("S", bound="SubState")
 
 
@@ -160,6 +194,10 @@ class FullState(SubState, Generic[S]):
     players: Sequence[S]
     current_player: int
 
+    # Note pooling works best with numeric fields, e.g. a CardCountDeck
+    # rather than a list of cards
+    others_encoding: OthersEncoding = OthersEncoding.TUPLE
+
     def __init__(self, param=None):
         """Initialize the players
 
@@ -243,8 +281,29 @@ class FullState(SubState, Generic[S]):
                     player_state.to_visible_data(to_data_func_name=to_data_func_name)
                 )
 
+        if for_numpy and self.others_encoding != OthersEncoding.TUPLE:
+            all_data["others"] = self._pool_others(all_data["others"])
+
         return all_data
 
+    def _pool_others(self, others_data: Sequence[Dict]) -> Dict:
+        """Pool the visible numpy data of other players"""
+        field_spaces = self.players[0].get_observation_space_visible().spaces
+        pool_func = {
+            OthersEncoding.SUM: np.sum,
+            OthersEncoding.MEAN: np.mean,
+            OthersEncoding.MAX: np.max,
+        }[self.others_encoding]
+        pooled: Dict = {}
+        for name, field_space in field_spaces.items():
+            if not others_data:
+                pooled[name] = np.zeros(spaces.flatdim(field_space))
+                continue
+            values = [spaces.flatten(field_space, data[name]) for data in others_data]
+            pooled[name] = pool_func(values, axis=0)
+        pooled["count"] = np.array([len(others_data)])
+        return pooled
+
     @classmethod
     def get_observation_space(cls):
         raise NotImplementedError("Use get_observation_space_from_player instead.")
@@ -258,7 +317,70 @@ class FullState(SubState, Generic[S]):
         obs_dict["self"] = example_state.get_observation_space_full()
 
         number_of_players = len(self.players)
-        obs_dict["others"] = spaces.Tuple(
-            [example_state.get_observation_space_visible()] * (number_of_players - 1)
-        )
+        if self.others_encoding == OthersEncoding.TUPLE:
+            obs_dict["others"] = spaces.Tuple(
+                [example_state.get_observation_space_visible()]
+                * (number_of_players - 1)
+            )
+        else:
+            pooled_dict = {
+                name: spaces.Box(
+                    low=-np.inf, high=np.inf, shape=(spaces.flatdim(field_space),)
+                )
+                for name, field_space in example_state.get_observation_space_visible().spaces.items()
+            }
+            pooled_dict["count"] = spaces.Box(low=0, high=0xFF, shape=[1])
+            obs_dict["others"] = spaces.Dict(pooled_dict)
         return spaces.Dict(obs_dict)
+
+
+class StateTemplate:
+    """Snapshot of a state, which can be restored in place
+
+    This is a faster `reset` for many short episodes: the values of every
+    field (including int fields) are captured once, e.g. of the state
+    before the first game, and restored with a copy.
+
+        template = StateTemplate(state)
+        ...
+        template.restore(state, rng=np.random.RandomState(0))
+
+    With a `rng`, decks created with `shuffle=True` are restored in a
+    random order, so that each episode gets a new deal.
+    """
+
+    # (player id or None for the full state, name, value, shuffle)
+    fields: List[Tuple[Optional[int], str, Any, bool]]
+
+    def __init__(self, state: FullState):
+        self.fields = []
+        owners: List[Tuple[Optional[int], SubState]] = [(None, state)]
+        owners.extend(enumerate(state.players))
+        for owner, sub_state in owners:
+            for name in sub_state.visibility.keys():
+                value = getattr(sub_state, name)
+                if isinstance(value, Component):
+                    shuffle = isinstance(value, Deck) and value.shuffle
+                    self.fields.append((owner, name, list(value.value), shuffle))
+                else:
+                    assert type(value) is int, f"Unknown type for {name}: {value}"
+                    self.fields.append((owner, name, value, False))
+
+    def restore(self, state: FullState, rng=None):
+        """Restore the state, which must be of the same shape as the template
+
+        :param rng: `np.random.RandomState`, to shuffle the decks
+        """
+        players = state.players
+        for owner, name, value, shuffle in self.fields:
+            sub_state = state if owner is None else players[owner]
+            if type(value) is int:
+                setattr(sub_state, name, value)
+                continue
+            component = getattr(sub_state, name)
+            if shuffle and rng is not None:
+                component.value = [value[i] for i in rng.permutation(len(value))]
+            else:
+                component.value = list(value)
+            if component._observers:
+                component._notify_change()
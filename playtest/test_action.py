@@ -21,7 +21,8 @@ import gym.spaces as spaces
 from .constant import Param
 import playtest.action as acn
 from .test_state import MockState
-from .action_range import action_bool, action_int
+from .action_range import action_bool, action_int, action_subset
+from .components.card import Card
 
 
 class MockActionName(enum.Enum):
@@ -145,3 +146,196 @@ def test_range_action(md: MockDecision):
 
     invalid_action = md.from_str("range(17)")
     assert not md.is_legal(invalid_action)
+
+
+def test_legal_action_mask(md: MockDecision):
+    mask = md.legal_action_mask()
+    assert mask.dtype == bool
+    assert len(mask) == md.get_number_of_actions()
+
+    legal_ints = [i for i, is_legal in enumerate(mask) if is_legal]
+    # bool + set {3, 5} + range [11, 13)
+    assert legal_ints == [0, 2, 3, 5, 6]
+    for i in range(md.get_number_of_actions()):
+        assert md.is_legal(md.from_int(i)) == mask[i]
+
+
+def test_intern():
+    legal = {
+        MockActionName.DECIDE_BOOLEAN: True,
+        MockActionName.DECIDE_INT_IN_SET: {3, 5},
+    }
+    md = MockDecision.intern(legal)
+    assert MockDecision.intern(dict(legal)) is md
+    assert MockDecision.intern({MockActionName.DECIDE_BOOLEAN: True}) is not md
+    # Unhashable ranges are not interned
+    unhashable = {MockActionName.DECIDE_INT_IN_SET: [{3: True}]}
+    assert MockDecision.intern(unhashable) is not MockDecision.intern(unhashable)
+
+
+def test_intern_eviction(monkeypatch):
+    monkeypatch.setattr(MockDecision, "intern_cache_size", 2)
+    decisions = [
+        MockDecision.intern({MockActionName.DECIDE_INT_IN_RANGE: (10, 10 + i)})
+        for i in range(3)
+    ]
+    assert (
+        MockDecision.intern({MockActionName.DECIDE_INT_IN_RANGE: (10, 12)})
+        is decisions[2]
+    )
+    assert (
+        MockDecision.intern({MockActionName.DECIDE_INT_IN_RANGE: (10, 10)})
+        is not decisions[0]
+    )
+
+
+def test_memoized_encoding():
+    md = MockDecision(
+        {
+            MockActionName.DECIDE_BOOLEAN: True,
+            MockActionName.DECIDE_INT_IN_RANGE: (11, 13),
+        }
+    )
+    mask = md.legal_action_mask()
+    assert md.legal_action_mask() is mask
+    assert not mask.flags.writeable
+
+    vector = md.action_range_vector()
+    assert md.action_range_vector() is vector
+    assert not vector.flags.writeable
+    assert np.array_equal(
+        vector,
+        spaces.flatten(
+            MockDecision.action_space_possible(), md.action_range_to_numpy()
+        ),
+    )
+
+
+def test_factored_action(md: MockDecision):
+    assert MockDecision.get_parameter_sizes() == [1, 3, 10]
+    assert MockDecision.factored_action_space() == spaces.Tuple(
+        (spaces.Discrete(3), spaces.Discrete(10))
+    )
+    for i in range(md.get_number_of_actions()):
+        type_index, parameter = md.to_factored(i)
+        assert md.from_factored(type_index, parameter) == i
+    # range(12)
+    assert md.to_factored(6) == (2, 2)
+
+    assert list(md.action_type_mask()) == [True, True, True]
+    assert list(md.parameter_mask(2)) == [False, True, True] + [False] * 7
+    no_set = MockDecision({MockActionName.DECIDE_BOOLEAN: True})
+    assert list(no_set.action_type_mask()) == [True, False, False]
+
+
+def test_factored_combination_matrix():
+    matrix = MockDecision.factored_combination_matrix()
+    # 3 action types, parameters of the set, and heads of the range
+    assert matrix.shape == (3 + 3 + acn.ORDINAL_PARAMETER_HEADS, 14)
+    heads = np.arange(matrix.shape[0], dtype=float)
+    q_values = heads.dot(matrix)
+    assert q_values[0] == 0
+    # type 1 + parameter 1 of the set
+    assert q_values[2] == 1 + 4
+    # type 2 + parameter 0 of the range
+    assert q_values[4] == 2 + 6
+    # Values of the range are interpolated between the first and last heads
+    assert q_values[-1] == 2 + 13
+    assert 2 + 6 < q_values[5] < 2 + 7
+
+
+def test_ordinal_encoding():
+    encoding = acn.ordinal_encoding(100, 8)
+    assert encoding.shape == (8, 100)
+    assert np.allclose(encoding.sum(axis=0), 1)
+    assert (encoding[:, 0] == np.eye(8)[0]).all()
+    assert (encoding[:, -1] == np.eye(8)[-1]).all()
+    assert (acn.ordinal_encoding(3, 8) == np.eye(3)).all()
+
+
+# ----------------------
+# Testing card subsets
+# ----------------------
+
+
+class SubsetActionName(enum.Enum):
+    SKIP = "skip"
+    DISCARD = "discard"
+
+
+class SubsetDecision(acn.BaseDecision):
+    action_enum = SubsetActionName
+
+    decision_ranges = OrderedDict(
+        [
+            (
+                SubsetActionName.SKIP,
+                action_bool.ActionBooleanRange(SubsetActionName.SKIP, None),
+            ),
+            (
+                SubsetActionName.DISCARD,
+                action_subset.ActionCardSubset(SubsetActionName.DISCARD, 5),
+            ),
+        ]
+    )
+
+
+@pytest.fixture
+def hand() -> List[Card]:
+    return [Card.from_str(c) for c in ["_2,S", "_5,S", "_5,H", "K,S"]]
+
+
+def test_subset_action(hand: List[Card]):
+    decision = SubsetDecision(
+        {
+            SubsetActionName.SKIP: True,
+            SubsetActionName.DISCARD: action_subset.CardSubsets(
+                hand, action_subset.SubsetConstraint(min_size=2, max_size=2)
+            ),
+        }
+    )
+    assert decision.get_number_of_actions() == 1 + 32
+
+    action = decision.from_str("discard(0, 2)")
+    assert action.value == (0, 2)
+    assert decision.is_legal(action)
+    assert decision.from_int(decision.to_int(action)) == action
+    assert not decision.is_legal(decision.from_str("discard(1)"))
+    # Only 4 cards in hand
+    assert not decision.is_legal(decision.from_str("discard(0,4)"))
+    assert not decision.is_legal(acn.ActionInstance(SubsetActionName.DISCARD, 2))
+
+    mask = decision.legal_action_mask()
+    # skip, and the 6 pairs out of 4 cards
+    assert mask.sum() == 1 + 6
+    for _ in range(20):
+        assert decision.is_legal(decision.pick_random_action())
+    assert list(decision.action_range_to_numpy()["DISCARD"]) == [1, 1, 1, 1, 0]
+
+
+def test_subset_factored():
+    matrix = SubsetDecision.factored_combination_matrix()
+    # 2 action types, and a head per card
+    assert matrix.shape == (2 + 5, 1 + 32)
+    heads = np.arange(matrix.shape[0], dtype=float)
+    q_values = heads.dot(matrix)
+    discard = 1 + action_subset.to_bitmask([0, 2])
+    # type 1 + card 0 + card 2
+    assert q_values[discard] == 1 + 2 + 4
+
+
+@pytest.mark.parametrize(
+    "constraint,expected",
+    [
+        (action_subset.SubsetConstraint(same_suite=True, min_size=2), 4),
+        (action_subset.SubsetConstraint(same_number=True, min_size=2), 1),
+        (action_subset.SubsetConstraint(total=(10, 11)), 1),
+        (action_subset.SubsetConstraint(total=(7, 8), same_suite=True), 1),
+    ],
+)
+def test_subset_constraint(hand: List[Card], constraint, expected):
+    mask = constraint.legal_mask(hand, 5)
+    assert mask.sum() == expected
+    for subset in np.flatnonzero(mask):
+        positions = action_subset.from_bitmask(int(subset))
+        assert constraint.is_legal(hand, positions)
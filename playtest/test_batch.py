@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+
+from .constant import Param
+from .batch import BatchedState
+from .test_state import MockState
+
+NUMBER_OF_GAMES = 4
+
+
+@pytest.fixture
+def states():
+    states = []
+    for i in range(NUMBER_OF_GAMES):
+        state = MockState(Param(number_of_players=2))
+        state.deck.deal(state.players[0].hand, i)
+        state.deck.deal(state.players[1].open_hand, 1)
+        states.append(state)
+    return states
+
+
+def test_round_trip(states):
+    batch = BatchedState.from_states(states)
+    assert len(batch) == NUMBER_OF_GAMES
+    assert batch.columns["deck"].shape == (NUMBER_OF_GAMES, 52, 2)
+    assert batch.columns["players.hand"].shape == (NUMBER_OF_GAMES, 2, 52, 2)
+
+    for i, state in enumerate(states):
+        assert batch.to_data(i) == state.to_data()
+        assert batch.get_state(i).to_data() == state.to_data()
+
+    assert batch.deck_sizes["players.hand"][:, 0].tolist() == [0, 1, 2, 3]
+    assert (
+        batch.deck_sizes["deck"] == 52 - batch.deck_sizes["players.hand"][:, 0] - 1
+    ).all()
+
+
+def test_edit_writes_back(states):
+    batch = BatchedState.from_states(states)
+    with batch.edit(2) as s:
+        s.deck.deal(s.discarded, 3)
+
+    assert batch.deck_sizes["discarded"].tolist() == [0, 0, 3, 0]
+    assert batch.to_data(2)["discarded"] == batch.get_state(2).discarded.to_data()
+    assert batch.to_data(1) == states[1].to_data(), "Other games untouched"
+
+    with pytest.raises(ValueError):
+        with batch.edit(2) as s:
+            s.deck.deal(s.discarded, 1)
+            raise ValueError()
+    assert batch.deck_sizes["discarded"].tolist() == [0, 0, 4, 0]
+
+
+def test_edit_reuses_state(states):
+    batch = BatchedState.from_states(states)
+    with batch.edit(0) as first:
+        pass
+    for i in [3, 1, 3]:
+        with batch.edit(i) as s:
+            assert s is first, "Filled in place"
+            assert s.to_data() == states[i].to_data()
+            assert s.deck.aggregate("total_rank") == states[i].deck.aggregate(
+                "total_rank"
+            )
+            with batch.edit(2) as nested:
+                assert nested is not s
+                assert nested.to_data() == states[2].to_data()
+
+
+def test_player_columns(states):
+    batch = BatchedState.from_states(states)
+    data = batch.player_columns(0)
+
+    assert "deck" not in data, "Deck is not visible"
+    assert "discarded" in data
+    assert data["self.hand"].shape == (NUMBER_OF_GAMES, 52, 2)
+    assert "others.hand" not in data, "Cannot see other hands"
+    assert data["others.open_hand"].shape == (NUMBER_OF_GAMES, 1, 52, 2)
+    assert (
+        data["others.open_hand"][:, 0, 0] == batch.columns["players.open_hand"][:, 1, 0]
+    ).all()
@@ -0,0 +1,138 @@
+import copy
+import json
+import random
+
+import pytest
+
+from .constant import Param
+from .delta import (
+    DeltaError,
+    StateReplica,
+    StateStream,
+    apply_delta,
+    diff,
+    player_view,
+    spectator_view,
+    to_json_value,
+)
+from .test_state import MockState
+
+
+@pytest.fixture
+def state():
+    return MockState(Param(number_of_players=2))
+
+
+def view_of(state, player_id=0):
+    return to_json_value(state.to_player_data(player_id))
+
+
+def test_diff_apply():
+    old = {"a": 1, "b": [1, 2, 3], "c": {"d": [[1, 2]]}, "e": 0}
+    new = {"a": 2, "b": [1, 3, 4, 5], "c": {"d": []}, "f": [1]}
+    ops = diff(old, new)
+    assert apply_delta(copy.deepcopy(old), ops) == new
+    assert ["del", ["e"]] in ops
+    assert ["set", ["a"], 2] in ops
+    assert diff(new, new) == []
+    assert apply_delta({"a": 1}, diff({"a": 1}, [1])) == [1]
+
+
+def test_apply_shares(state):
+    state.deck.deal(state.players[0].hand, count=2)
+    old = view_of(state)
+    frozen = copy.deepcopy(old)
+    state.players[0].hand.move_to(state.discarded, state.players[0].hand[0])
+    new = apply_delta(old, diff(old, view_of(state)))
+    assert new == view_of(state)
+    # Only what changed is copied
+    assert old == frozen
+    assert new["self"] is not old["self"]
+    assert new["self"]["open_hand"] is old["self"]["open_hand"]
+    assert new["others"] is old["others"]
+
+
+def test_diff_moves(state):
+    old = view_of(state)
+    state.deck.deal(state.players[0].hand, count=3)
+    # Dealing from the hidden deck only shows the cards in the hand
+    dealt = view_of(state)
+    ops = diff(old, dealt)
+    assert ops == [["splice", ["self", "hand"], 0, 0, dealt["self"]["hand"]]]
+
+    state.players[0].hand.move_to(state.discarded, state.players[0].hand[1])
+    moved = view_of(state)
+    ops = diff(dealt, moved)
+    assert ops == [["move", ["self", "hand"], 1, ["discarded"], 0]]
+    assert apply_delta(copy.deepcopy(dealt), ops) == moved
+
+
+def test_diff_hidden(state):
+    """Only what the player can see is ever in the delta"""
+    old = view_of(state, 1)
+    state.deck.deal(state.players[0].hand, count=2)
+    assert diff(old, view_of(state, 1)) == []
+
+    card = state.players[0].hand[0]
+    state.players[0].hand.move_to(state.players[0].open_hand, card)
+    assert diff(old, view_of(state, 1)) == [
+        ["splice", ["others", 0, "open_hand"], 0, 0, [to_json_value(card.to_data())]]
+    ]
+
+
+def test_stream(state):
+    random.seed(0)
+    stream = StateStream(player_view(0), keyframe_interval=10, max_unacked=4)
+    replica = StateReplica()
+    messages = []
+    for i in range(30):
+        if random.random() < 0.5 and len(state.deck):
+            state.deck.deal(state.players[0].hand)
+        elif len(state.players[0].hand):
+            state.players[0].hand.move_to(state.discarded, state.players[0].hand[0])
+        message = json.loads(json.dumps(stream.update(state)))
+        messages.append(message)
+        assert replica.apply(message) == view_of(state)
+        # Some messages are never acknowledged
+        if i % 3:
+            stream.ack(replica.ack()["version"])
+        assert len(stream.views) <= 5
+
+    keyframes = [m["version"] for m in messages if "state" in m]
+    assert keyframes[0] == 1
+    assert all(b - a <= 10 for a, b in zip(keyframes, keyframes[1:]))
+    assert len(keyframes) < len(messages) / 2
+    assert all(m["base"] <= stream.version for m in messages if "base" in m)
+
+
+def test_stream_shared_views(state):
+    streams = [StateStream(spectator_view) for _ in range(3)]
+    streams.append(StateStream(player_view(0)))
+    views: dict = {}
+    messages = [stream.update(state, views) for stream in streams]
+    assert len(views) == 2
+    assert messages[0]["state"] is messages[2]["state"]
+    assert messages[3]["state"] == view_of(state)
+    assert player_view(1) is player_view(1)
+
+
+def test_stream_lagging(state):
+    stream = StateStream(spectator_view, max_unacked=2)
+    replica = StateReplica()
+    replica.apply(stream.update(state))
+    stream.ack(1)
+
+    # Lost messages, which are never acknowledged
+    state.deck.deal(state.players[0].open_hand)
+    stream.update(state)
+    state.deck.deal(state.players[1].open_hand)
+    message = stream.update(state)
+    assert message["base"] == 1
+    assert replica.apply(message)["players"][1]["open_hand"]
+
+    # Too far behind, so a keyframe is sent
+    state.deck.deal(state.discarded)
+    assert "state" in stream.update(state)
+
+    with pytest.raises(DeltaError):
+        StateReplica().apply({"version": 2, "base": 1, "delta": []})
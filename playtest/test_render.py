@@ -0,0 +1,62 @@
+import pytest
+
+from .constant import Param
+from .components.card import Card
+from .render import Renderer, RenderMode, format_deck, render_state, ANSI_RED
+from .test_state import MockState
+
+
+@pytest.fixture
+def state():
+    state = MockState(Param(number_of_players=2))
+    state.deck.deal(state.players[0].hand, 2)
+    state.deck.deal(state.players[1].hand, 1)
+    state.deck.deal(state.players[1].open_hand, 1)
+    return state
+
+
+def test_render_full_state(state):
+    frame = render_state(state)
+    assert "deck: BasicDeck[48](...Card(" in frame
+    assert "player 1" in frame
+    assert format_deck(state.players[1].hand) in frame
+
+
+def test_render_player_view(state):
+    frame = render_state(state, player_id=0)
+    assert "deck" not in frame, "Cannot see the deck"
+    assert "player 0 (you)" in frame
+    assert format_deck(state.players[0].hand) in frame
+    assert format_deck(state.players[1].hand) not in frame, "Cannot see other hands"
+    assert format_deck(state.players[1].open_hand) in frame
+
+
+def test_render_ansi(state):
+    state.discarded.add(Card.from_str("T,H"))
+    frame = render_state(state, mode=RenderMode.ANSI)
+    assert f"{ANSI_RED}Card(T,H)" in frame
+
+
+def test_renderer_inactive(state, monkeypatch):
+    renderer = Renderer()
+    assert not renderer.active
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Frame should not be built")
+
+    monkeypatch.setattr("playtest.render.render_state", fail)
+    assert renderer.render(state) is None
+
+
+def test_renderer_viewer_and_rate_limit(state):
+    frames = []
+    renderer = Renderer(max_fps=0.001, record=True)
+    renderer.attach(frames.append)
+
+    assert renderer.render(state) is not None
+    assert renderer.render(state) is None, "Too soon for the next frame"
+    assert renderer.skipped_frames == 1
+    assert renderer.render(state, force=True) is not None
+
+    assert len(frames) == 2
+    assert renderer.frames == frames
@@ -1,12 +1,15 @@
 """This define a set of state related operation
 """
+from typing import Type
+
+import numpy as np
 import pytest
 
 import gym.spaces as spaces
 
 from .constant import Param
-from .components.card import BasicDeck, Card
-from .state import SubState, FullState, Visibility
+from .components.card import BasicDeck, Card, CardCountDeck, Shoe
+from .state import SubState, FullState, Visibility, OthersEncoding
 
 
 class MockPlayerState(SubState):
@@ -138,3 +141,84 @@ def test_observational_space(state):
     other_hand = st_data["others"][0]
     assert "hand" not in other_hand
     assert isinstance(other_hand["open_hand"], spaces.Tuple)
+
+
+class ShoeState(FullState):
+
+    # Widened, as the pooled state below has other player states
+    player_state_class: Type[SubState] = MockPlayerState
+
+    visibility = {
+        "deck": Visibility.NONE,
+        "discarded": Visibility.ALL,
+    }
+
+    deck: Shoe
+    discarded: Shoe
+
+    def __init__(self, param=None):
+        self.deck = Shoe(all_cards=True, shuffle=True)
+        self.discarded = Shoe([])
+        super().__init__(param=param)
+
+
+def test_histogram_observation():
+    state = ShoeState(Param(number_of_players=2))
+    state.deck.deal(state.discarded, 200)
+    obs_space = state.get_observation_space_from_player()
+    assert obs_space["discarded"].shape == (17,)
+
+    st_data = state.to_player_data(0, for_numpy=True)
+    assert sum(st_data["discarded"]) == 400
+    flattened = spaces.flatten(obs_space, st_data)
+    # Hands are still ordered, only the discarded pile is a histogram
+    assert flattened.shape == (17 + 52 * 2 * 2 + 52 * 2,)
+
+
+class CountPlayerState(SubState):
+
+    visibility = {
+        "hand": Visibility.SELF,
+        "open_hand": Visibility.ALL,
+    }
+
+    hand: BasicDeck
+    open_hand: CardCountDeck
+
+    def __init__(self, param=None):
+        self.hand = BasicDeck([])
+        self.open_hand = CardCountDeck([])
+
+
+class PooledState(ShoeState):
+    player_state_class = CountPlayerState
+
+
+@pytest.mark.parametrize(
+    "encoding", [OthersEncoding.SUM, OthersEncoding.MEAN, OthersEncoding.MAX]
+)
+def test_pooled_others(encoding):
+    observation_size = set()
+    for number_of_players in [2, 4, 8]:
+        state = PooledState(Param(number_of_players=number_of_players))
+        state.others_encoding = encoding
+        for p in state.players[1:]:
+            state.deck.deal(p.open_hand, 2)
+
+        obs_space = state.get_observation_space_from_player()
+        st_data = state.to_player_data(0, for_numpy=True)
+        others = st_data["others"]
+        assert others["count"] == [number_of_players - 1]
+
+        counts = np.array([p.open_hand.to_data_for_numpy() for p in state.players[1:]])
+        expected = {
+            OthersEncoding.SUM: counts.sum(axis=0),
+            OthersEncoding.MEAN: counts.mean(axis=0),
+            OthersEncoding.MAX: counts.max(axis=0),
+        }[encoding]
+        assert np.allclose(others["open_hand"], expected)
+
+        observation_size.add(spaces.flatten(obs_space, st_data).shape)
+        assert spaces.flatdim(obs_space) == spaces.flatten(obs_space, st_data).shape[0]
+
+    assert len(observation_size) == 1, "Size does not depend on number of players"
@@ -7,8 +7,9 @@ import numpy as np
 
 import gym.spaces as spaces
 
+from playtest.state import FullState
 from playtest.action import ActionInstance, ActionRange
-from playtest.game import GameHandler, TypeHandlerReturn
+from playtest.game import GameHandler, TypeHandlerReturn, TypeHandlerResult, ContinueTo
 
 import pt_blackjack.action as acn
 from pt_blackjack.state import State, PlayerState
@@ -28,16 +29,19 @@ class GameState(enum.Enum):
     """
 
     start = "start"
+    deal_round = "deal_round"
     place_bet = "place_bet"
     decide_hit_pass = "decide_hit_pass"
+    check_winner = "check_winner"
     end_of_round = "end_of_round"
+    reset_round = "reset_round"
+    find_final_winner = "find_final_winner"
     end = "end"
 
 
-def game_start(s: State, action=None) -> TypeHandlerReturn:
+def game_start(s: State, action=None) -> ContinueTo:
     logging.info("Start of next round!")
-    current_player = s.current_player
-    return deal_round(s)
+    return ContinueTo(GameState.deal_round)
 
 
 def deal_round(s: State, action=None) -> TypeHandlerReturn:
@@ -53,7 +57,9 @@ def deal_round(s: State, action=None) -> TypeHandlerReturn:
 
     return (
         s,
-        acn.ActionDecision({acn.ActionName.BET: (Param.min_bet_per_round, bank_value)}),
+        acn.ActionDecision.intern(
+            {acn.ActionName.BET: (Param.min_bet_per_round, bank_value)}
+        ),
         GameState.place_bet,
         current_player,
     )
@@ -62,6 +68,7 @@ def deal_round(s: State, action=None) -> TypeHandlerReturn:
 def handle_bet(s: State, action: ActionInstance) -> TypeHandlerReturn:
     assert action.key == acn.ActionName.BET, f"Invalid action name: {action}"
     bet_value = action.value
+    assert isinstance(bet_value, int), f"Invalid bet: {action}"
 
     current_player = s.current_player
     player_state: PlayerState = s.get_player_state(current_player)
@@ -73,13 +80,15 @@ def handle_bet(s: State, action: ActionInstance) -> TypeHandlerReturn:
     return (
         s,
         # TODO: this action is really tied to the state (instead of others)
-        acn.ActionDecision({acn.ActionName.HIT: True, acn.ActionName.SKIP: True,}),
+        acn.ActionDecision.intern(
+            {acn.ActionName.HIT: True, acn.ActionName.SKIP: True,}
+        ),
         GameState.decide_hit_pass,
         current_player,
     )
 
 
-def decide_hit_miss(s: State, action: ActionInstance) -> TypeHandlerReturn:
+def decide_hit_miss(s: State, action: ActionInstance) -> TypeHandlerResult:
     assert action.key in {
         acn.ActionName.HIT,
         acn.ActionName.SKIP,
@@ -98,7 +107,9 @@ def decide_hit_miss(s: State, action: ActionInstance) -> TypeHandlerReturn:
         s.hit_rounds += 1
         return (
             s,
-            acn.ActionDecision({acn.ActionName.HIT: True, acn.ActionName.SKIP: True,}),
+            acn.ActionDecision.intern(
+                {acn.ActionName.HIT: True, acn.ActionName.SKIP: True,}
+            ),
             GameState.decide_hit_pass,
             current_player,
         )
@@ -113,13 +124,13 @@ def decide_hit_miss(s: State, action: ActionInstance) -> TypeHandlerReturn:
         # do we have more players to play?
         if s.current_player == 0:
             # End of round - check for winner
-            return check_winner(s)
+            return ContinueTo(GameState.check_winner)
 
         # Next player bet
         # TODO: really should be just going to state?
         return (
             s,
-            acn.ActionDecision(
+            acn.ActionDecision.intern(
                 {
                     acn.ActionName.BET: (
                         Param.min_bet_per_round,
@@ -135,7 +146,7 @@ def decide_hit_miss(s: State, action: ActionInstance) -> TypeHandlerReturn:
     raise RuntimeError(f"Unknown action {action}")
 
 
-def check_winner(s: State, action=None) -> TypeHandlerReturn:
+def check_winner(s: State, action=None) -> ContinueTo:
     current_player = s.current_player
 
     # Now check for winner
@@ -145,7 +156,7 @@ def check_winner(s: State, action=None) -> TypeHandlerReturn:
     p: PlayerState
     for player_id, p in enumerate(s.players):
         ps = s.get_player_state(player_id)
-        score_in_hand = sum([c.number for c in ps.hand])
+        score_in_hand = ps.hand.aggregate("total_rank")
         if score_in_hand > Param.max_score:
             logging.info("Player {} is busted! ({})".format(player_id, score_in_hand))
             # losers.append(p)
@@ -174,10 +185,10 @@ def check_winner(s: State, action=None) -> TypeHandlerReturn:
             winner_pot.take_from(s.get_player_state(player_id).bet)
         logging.info("Player {} gains {} gold!".format(player_id, total_bets))
 
-    return end_of_round_next_round_check(s)
+    return ContinueTo(GameState.end_of_round)
 
 
-def end_of_round_next_round_check(s: State, action=None) -> TypeHandlerReturn:
+def end_of_round_next_round_check(s: State, action=None) -> ContinueTo:
     current_player = s.current_player
 
     all_banks = [
@@ -186,45 +197,68 @@ def end_of_round_next_round_check(s: State, action=None) -> TypeHandlerReturn:
     ]
     has_broke = any([b <= 1 for b in all_banks])
     if has_broke:
-        return find_final_winner(s)
+        return ContinueTo(GameState.find_final_winner)
 
     if current_player == 0:
         s.number_of_rounds += 1
         if s.number_of_rounds >= Param.number_of_rounds:
             logging.info("End of game - {s.number_of_rounds}")
-            return find_final_winner(s)
+            return ContinueTo(GameState.find_final_winner)
 
     # Go back into betting
-    return reset_round(s)
+    return ContinueTo(GameState.reset_round)
 
 
-def reset_round(s: State, action=None) -> TypeHandlerReturn:
+def reset_round(s: State, action=None) -> ContinueTo:
     p: PlayerState
     for player_id, p in enumerate(s.players):
         # reset all hands
         p.hand.deal(s.discarded, all=True)
     s.hit_rounds = 0
-    return deal_round(s)
+    return ContinueTo(GameState.deal_round)
 
 
-def find_final_winner(s: State, action=None) -> TypeHandlerReturn:
-    all_banks = [
-        s.get_player_state(player_id).bank.amount
-        for player_id, p in enumerate(s.players)
-    ]
-    winner = None
-    winner_amount = -0xFFFF
-    for i, v in enumerate(all_banks):
-        if v > winner_amount:
-            winner = i
+def get_winners(s: State) -> List[int]:
+    """Players with the most money"""
+    amounts = [p.bank.amount + p.bet.amount for p in s.players]
+    best = max(amounts)
+    return [pid for pid, amount in enumerate(amounts) if amount == best]
+
 
-    # TODO: setting up winner control
+def find_final_winner(s: State, action=None) -> TypeHandlerReturn:
+    logging.info("Players {} won the game".format(get_winners(s)))
     return (s, None, GameState.end, None)
 
 
 class BlackjackHandler(GameHandler):
     handler = {
         GameState.start: game_start,
+        GameState.deal_round: deal_round,
         GameState.place_bet: handle_bet,
         GameState.decide_hit_pass: decide_hit_miss,
+        GameState.check_winner: check_winner,
+        GameState.end_of_round: end_of_round_next_round_check,
+        GameState.reset_round: reset_round,
+        GameState.find_final_winner: find_final_winner,
     }
+
+    transitions = {
+        GameState.start: [GameState.deal_round],
+        GameState.deal_round: [GameState.place_bet],
+        GameState.place_bet: [GameState.decide_hit_pass],
+        GameState.decide_hit_pass: [
+            GameState.decide_hit_pass,
+            GameState.place_bet,
+            GameState.check_winner,
+        ],
+        GameState.check_winner: [GameState.end_of_round],
+        GameState.end_of_round: [GameState.find_final_winner, GameState.reset_round],
+        GameState.reset_round: [GameState.deal_round],
+        GameState.find_final_winner: [GameState.end],
+    }
+
+    terminal_states = [GameState.end]
+
+    def get_winners(self, s: FullState) -> List[int]:
+        assert isinstance(s, State)
+        return get_winners(s)
@@ -0,0 +1,42 @@
+"""Heuristic baseline for blackjack
+
+Always bet the minimum, and hit until the hand reaches a threshold.
+"""
+from typing import List
+
+from playtest.agents.base import BaseAgent
+from playtest.action import ActionInstance
+from playtest.state import FullState
+
+import pt_blackjack.action as acn
+from pt_blackjack.constant import Param
+
+HIT_BELOW = 16
+
+
+class HeuristicAgent(BaseAgent):
+    def forward(self, observation) -> int:
+        env = self.env
+        decision = env.next_accepted_action
+        assert decision is not None
+        if acn.ActionName.BET in decision.legal_action:
+            action = ActionInstance(acn.ActionName.BET, Param.min_bet_per_round)
+        else:
+            hand = env.state.get_player_state(env.next_player).hand
+            score = hand.aggregate("total_rank")
+            action = ActionInstance(
+                acn.ActionName.HIT if score < HIT_BELOW else acn.ActionName.SKIP, True
+            )
+        return decision.to_int(action)
+
+
+def bank_scores(env) -> List[float]:
+    """Score each player by the amount of money they own"""
+    return [float(p.bank.amount + p.bet.amount) for p in env.state.players]
+
+
+def bank_share(s: FullState) -> List[float]:
+    """Share of the money owned by each player, e.g. for search agents"""
+    amounts = [p.bank.amount + p.bet.amount for p in s.players]
+    total = sum(amounts)
+    return [a / total if total else 0.0 for a in amounts]
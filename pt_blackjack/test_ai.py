@@ -1,7 +1,13 @@
 import os
 import pytest
+import numpy as np
 
-from playtest.agents import KerasDQNAgent, train_agents
+from gym.spaces import flatdim
+from keras import backend as K
+from keras.optimizers import Adam
+
+from playtest.agents import KerasDQNAgent, train_agents, train_agents_async
+from playtest.agents.numpy_dqn import DenseNetwork
 from playtest.env import GameWrapperEnvironment, EnvironmentInteration
 
 from .test_env import env_allow_invalid
@@ -53,3 +59,60 @@ def test_playing(env_allow_invalid):
         len(state.players[0].hand) == 3 or len(state.discarded) == 4
     ), "Game progressed"
     assert True, "Game exists"
+
+
+def test_training_async(env_allow_invalid):
+    env = env_allow_invalid
+    agents = [KerasDQNAgent(env) for _ in range(env.n_agents)]
+    filename = "example_agent_async.h5f"
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+    memories = [a.memory for a in agents]
+    train_agents_async(
+        env,
+        agents,
+        save_filenames=[filename],
+        nb_steps=50,
+        nb_actors=2,
+        broadcast_interval=10,
+    )
+    assert os.path.exists(filename)
+    assert all([a.step > 0 for a in agents]), "All agents learned"
+    assert [a.memory for a in agents] == memories
+    assert all([a.memory.nb_entries > 0 for a in agents]), "Replay is kept"
+
+
+def count_trainable(agent: KerasDQNAgent) -> int:
+    return sum([K.count_params(w) for w in agent.model.trainable_weights])
+
+
+def test_factored_agent(env_allow_invalid):
+    env = env_allow_invalid
+    agent = KerasDQNAgent(env, factored=True)
+    agent.compile(Adam(lr=1e-3), metrics=["mae"])
+
+    # Fewer outputs, and fewer weights to train, than a head per action
+    heads = env.decision_class.factored_combination_matrix().shape[0]
+    assert heads < flatdim(env.action_space)
+    flat_agent = KerasDQNAgent(env)
+    assert count_trainable(agent) < count_trainable(flat_agent)
+
+    obs = env.reset()[env.next_player]
+    q_values = agent.compute_q_values([obs])
+    assert np.allclose(
+        q_values,
+        DenseNetwork.from_weights(agent.get_dense_weights())([obs])[0],
+        atol=1e-5,
+    )
+
+    decision = env.next_accepted_action
+    agent.training = True
+    agent.policy.eps = 1
+    for _ in range(20):
+        assert decision.legal_action_mask()[agent.forward(obs)]
+    agent.training = False
+    assert agent.forward(obs) == np.argmax(
+        np.where(decision.legal_action_mask(), q_values, -np.inf)
+    )
@@ -0,0 +1,26 @@
+from playtest.action import ActionInstance
+from playtest.batch import BatchedState
+
+from .constant import Param
+from .state import State
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def test_batched_handlers():
+    states = [State(Param(number_of_players=2)) for _ in range(3)]
+    for s in states:
+        gm.BlackjackHandler().handle(s, gm.GameState.start)
+    batch = BatchedState.from_states(states)
+    assert batch.columns["current_player"].shape == (3,)
+    assert batch.columns["players.bank"].shape == (3, 2, 1)
+
+    # Existing handlers work on a single game
+    with batch.edit(1) as s:
+        gm.handle_bet(s, ActionInstance(acn.ActionName.BET, 3))
+    assert batch.columns["players.bet"][:, 0, 0].tolist() == [0, 3, 0]
+    assert batch.columns["players.bank"][:, 0, 0].tolist() == [10, 7, 10]
+
+    # Vectorized logic updates all games at once
+    batch.columns["hit_rounds"] += 1
+    assert [batch.get_state(i).hit_rounds for i in range(3)] == [1, 1, 1]
@@ -0,0 +1,167 @@
+import random
+
+import numpy as np
+import pytest
+
+from playtest import Visibility
+from playtest.components import BasicDeck, Card
+from playtest.determinize import (
+    DeterminizationSampler,
+    InformationSet,
+    hidden_deck_paths,
+)
+
+from .constant import Param
+from .state import State, PlayerState
+
+
+def to_deck(cards):
+    return BasicDeck([Card.from_str(c) for c in cards])
+
+
+@pytest.fixture
+def state():
+    s = State(Param(number_of_players=2))
+    s.deck.deal(s.players[0].hand, 2)
+    s.deck.deal(s.players[1].hand, 2)
+    s.deck.deal(s.discarded, 3)
+    return s
+
+
+def test_hidden_decks(state):
+    assert hidden_deck_paths(state, 0) == [(None, "deck"), (1, "hand")]
+    assert hidden_deck_paths(state, 1) == [(None, "deck"), (0, "hand")]
+
+
+def test_information_set(state):
+    info_set = InformationSet.from_state(state, 0)
+    view = info_set.state
+    assert len(view.deck) == 0
+    assert len(view.players[1].hand) == 0
+    assert view.players[0].hand.to_data() == state.players[0].hand.to_data()
+    assert view.discarded.to_data() == state.discarded.to_data()
+    assert info_set.hidden_sizes == [45, 2]
+    assert len(info_set.unseen) == 47
+
+    # The original state is kept intact
+    assert len(state.deck) == 45
+    assert len(state.players[1].hand) == 2
+
+
+class SecretPlayerState(PlayerState):
+    visibility = dict(PlayerState.visibility, bet=Visibility.SELF)
+
+
+class SecretState(State):
+    visibility = dict(State.visibility, hit_rounds=Visibility.NONE)
+    player_state_class = SecretPlayerState
+
+
+def test_information_set_blank_hidden():
+    """Every field hidden to the player is blanked, not only decks"""
+    state = SecretState(Param(number_of_players=2))
+    state.hit_rounds = 2
+    for p in state.players:
+        p.bet.take_from(p.bank, 3)
+    info_set = InformationSet.from_state(state, 0)
+    view = info_set.state
+    assert view.hit_rounds == 0
+    assert view.players[1].bet.amount == 0
+    assert view.players[0].bet.amount == 3
+    assert view.to_player_data(0) == state.to_player_data(0)
+
+    assert state.hit_rounds == 2
+    assert state.players[1].bet.amount == 3
+
+
+def test_information_set_ignore_hidden(state):
+    """Information set is the same whatever the hidden cards are"""
+    other = State.from_data(state.to_data())
+    other.players[1].hand.deal(other.deck, all=True)
+    random.Random(0).shuffle(other.deck.value)
+    other.deck.deal(other.players[1].hand, 2)
+    assert other.players[1].hand.to_data() != state.players[1].hand.to_data()
+
+    info_set = InformationSet.from_state(state, 0)
+    other_info_set = InformationSet.from_state(other, 0)
+    assert info_set.state.to_data() == other_info_set.state.to_data()
+    assert [c.to_data() for c in info_set.unseen] == [
+        c.to_data() for c in other_info_set.unseen
+    ]
+
+
+def test_determinize(state):
+    info_set = InformationSet.from_state(state, 0)
+    rng = random.Random(0)
+    hands = set()
+    for _ in range(5):
+        s = info_set.determinize(rng)
+        assert len(s.deck) == 45
+        assert len(s.players[1].hand) == 2
+        assert s.players[0].hand.to_data() == state.players[0].hand.to_data()
+        cards = s.deck.to_data() + s.players[1].hand.to_data()
+        assert sorted(cards) == sorted(c.to_data() for c in info_set.unseen)
+        hands.add(repr(s.players[1].hand.to_data()))
+
+    assert len(hands) > 1, "Hidden hand is sampled"
+    assert len(info_set.state.deck) == 0, "Information set is kept intact"
+
+
+def test_determinize_batch(state):
+    info_set = InformationSet.from_state(state, 0)
+    states = info_set.determinize_batch(20, np.random.RandomState(0))
+    assert len(states) == 20
+    unseen = sorted(c.to_data() for c in info_set.unseen)
+    for s in states:
+        assert len(s.deck) == 45
+        assert len(s.players[1].hand) == 2
+        assert sorted(s.deck.to_data() + s.players[1].hand.to_data()) == unseen
+    assert len({repr(s.players[1].hand.to_data()) for s in states}) > 1
+
+
+def test_sampler_from_state(state):
+    universe = [c.to_data() for c in Card.get_all_cards()]
+    sampler = DeterminizationSampler.from_state(state, 0, universe)
+    assert sampler.sizes == [45, 2]
+
+    seen = state.players[0].hand.to_data() + state.discarded.to_data()
+    assert len(sampler.unseen) == 47
+    assert not set(map(tuple, sampler.unseen.tolist())) & set(map(tuple, seen))
+
+    deck, hand = sampler.sample(1000, np.random.RandomState(0))
+    assert deck.shape == (1000, 45, 2)
+    assert hand.shape == (1000, 2, 2)
+
+    # Each sample keeps the multiset of unseen cards
+    cards = np.concatenate([deck, hand], axis=1)
+    expected = np.sort(sampler.unseen[:, 0] * 10 + sampler.unseen[:, 1])
+    keys = np.sort(cards[:, :, 0] * 10 + cards[:, :, 1], axis=1)
+    assert (keys == expected).all()
+
+    # The hidden hand is uniformly drawn from the unseen cards
+    counts = np.bincount(hand[:, :, 0].ravel(), minlength=14)[1:]
+    assert counts.min() > 0
+
+
+def test_sampler_from_information_set(state):
+    info_set = InformationSet.from_state(state, 0)
+    universe = [c.to_data() for c in Card.get_all_cards()]
+    sampler = DeterminizationSampler.from_state(state, 0, universe)
+    assert sampler.sizes == info_set.hidden_sizes
+    assert (sampler.unseen == info_set.get_sampler().unseen).all()
+
+
+def test_determinize_batched(state):
+    info_set = InformationSet.from_state(state, 0)
+    batch = info_set.determinize_batched(50, np.random.RandomState(0))
+    assert len(batch) == 50
+    unseen = sorted(c.to_data() for c in info_set.unseen)
+    for i in [0, 49]:
+        s = batch.get_state(i)
+        assert len(s.deck) == 45
+        assert len(s.players[1].hand) == 2
+        assert sorted(s.deck.to_data() + s.players[1].hand.to_data()) == unseen
+        assert s.players[0].hand.to_data() == state.players[0].hand.to_data()
+        assert s.discarded.to_data() == state.discarded.to_data()
+    hands = batch.columns["players.hand"][:, 1, :2]
+    assert len({h.tobytes() for h in hands}) > 1
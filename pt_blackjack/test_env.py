@@ -1,10 +1,12 @@
 import pytest
+from typing import List
 
 import numpy as np
 import gym.spaces as spaces
 
-from playtest.env import GameWrapperEnvironment
+from playtest.env import GameWrapperEnvironment, EnvironmentInteration, EpisodeResult
 from playtest.action import InvalidActionError, ActionInstance
+from playtest.render import Renderer
 
 
 from .constant import Reward, Param
@@ -79,11 +81,9 @@ def test_action_space(env):
     assert spaces.flatdim(space) >= 23
 
 
-# @pytest.mark.xfail
-# def test_reward(env: GameWrapperEnvironment):
-#     # TODO: reward was not implemented
-#     assert env.reward_range[0] < 0
-#     assert env.reward_range[1] > 0
+def test_reward(env: GameWrapperEnvironment):
+    assert env.reward_range[0] < 0
+    assert env.reward_range[1] > 0
 
 
 def __action_int(env: GameWrapperEnvironment, action: ActionInstance) -> int:
@@ -110,10 +110,11 @@ def test_step_invalid_action(env_allow_invalid):
 
     # Now let's keep giving the player bad action
     # We already have one invalid action sent, so -1 count
-    for _ in range(env.max_continuous_invalid_inputs - 1):
+    for i in range(env.max_continuous_invalid_inputs - 1):
         obs, reward, _, _ = env.step([illegal_action_int, None])
-        # TODO: not yet punished
-        # assert reward[0] < 0, "Player is punished"
+        # The last invalid action is replaced by a random action
+        if i < env.max_continuous_invalid_inputs - 2:
+            assert reward[0] < 0, "Player is punished"
 
     state = env.state
     bet_made = state.get_player_state(0).bet.value[0]
@@ -154,3 +155,222 @@ def test_step(env: GameWrapperEnvironment):
     # TODO: reward not set
     # assert reward[0] == Reward.HITTED
     # assert all([r >= 0 for r in reward]), f"contain negative {reward}"
+
+
+class FirstLegalBatchAgent:
+    """Pick the first legal action for a batch of observations"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def forward_batch(self, observations, legal_masks=None):
+        self.batch_sizes.append(len(observations))
+        return np.argmax(np.asarray(legal_masks), axis=1)
+
+
+def test_play_batch():
+    envs = [
+        GameWrapperEnvironment(
+            gm.BlackjackHandler(),
+            State(Param(number_of_players=AGENT_COUNT)),
+            gm.GameState.start,
+            acn.ActionDecision,
+            allow_invalid=False,
+        )
+        for _ in range(3)
+    ]
+    agents = [FirstLegalBatchAgent() for _ in range(AGENT_COUNT)]
+
+    game = EnvironmentInteration(envs[0], agents, rounds=2)
+    game.play_batch(envs)
+
+    # All environments wait on player 0 and are batched together
+    assert agents[0].batch_sizes == [3, 3]
+    for env in envs:
+        # Bet on first legal bet, then skip
+        assert env.state.players[0].bet.amount == Param.min_bet_per_round
+        assert env.next_player == 1
+
+
+def test_play_batch_auto_reset():
+    envs = [
+        GameWrapperEnvironment(
+            gm.BlackjackHandler(),
+            State(Param(number_of_players=AGENT_COUNT)),
+            gm.GameState.start,
+            acn.ActionDecision,
+            allow_invalid=False,
+            auto_reset=True,
+            max_episode_steps=4,
+        )
+        for _ in range(2)
+    ]
+    resets = []
+    for env in envs:
+        env_reset = env.reset
+
+        def counted_reset(env_reset=env_reset):
+            resets.append(1)
+            return env_reset()
+
+        env.reset = counted_reset  # type: ignore
+    agents = [FirstLegalBatchAgent() for _ in range(AGENT_COUNT)]
+
+    game = EnvironmentInteration(envs[0], agents, episodes=3)
+    stats = game.play_batch(envs)
+
+    assert stats.episodes == 6
+    # Once at the start, then on the end of each game by the env itself
+    assert len(resets) == 2 + 6
+
+
+class FirstLegalAgent:
+    """Pick the first legal action of the environment"""
+
+    def __init__(self, env):
+        self.env = env
+
+    def forward(self, observation):
+        return int(np.argmax(self.env.next_accepted_action.legal_action_mask()))
+
+
+def test_play_results(env: GameWrapperEnvironment, capsys):
+    agents = [FirstLegalAgent(env) for _ in range(AGENT_COUNT)]
+    game = EnvironmentInteration(env, agents, episodes=1)
+
+    results: List[EpisodeResult] = []
+    stats = game.play(callback=results.append)
+    assert capsys.readouterr().out == "", "Nothing printed by default"
+
+    assert len(results) == 1
+    result = results[0]
+    assert result.done
+    assert result.length > 0
+    assert len(result.rewards) == AGENT_COUNT
+    assert result.steps_per_second > 0
+
+    assert stats is game.stats
+    assert stats.episodes == 1
+    assert stats.steps == result.length
+
+
+def test_play_results_rounds(env: GameWrapperEnvironment):
+    agents = [FirstLegalAgent(env) for _ in range(AGENT_COUNT)]
+    game = EnvironmentInteration(env, agents, episodes=3, rounds=2)
+
+    results = list(game.iter_episodes())
+    assert len(results) == 1
+    assert not results[0].done, "Episode cut short"
+    assert results[0].winner is None
+    assert results[0].length == 2
+
+
+def test_render(env: GameWrapperEnvironment):
+    env.reset()
+    assert env.render() is None, "No renderer, nothing rendered"
+    frame = env.render(mode="text")
+    assert frame is not None and "player 0" in frame
+
+    env.renderer = Renderer(player_id=0, record=True)
+    env.render()
+    assert len(env.renderer.frames) == 1
+    assert "deck" not in env.renderer.frames[0]
+
+
+def test_step_game_end(env: GameWrapperEnvironment):
+    env.reset()
+    bet_all_int = __action_int(env, ActionInstance(acn.ActionName.BET, 9))
+    skip_int = __action_int(env, ActionInstance(acn.ActionName.SKIP, True))
+
+    # Both players bet all but one coin, so someone is broke after the round
+    env.step([bet_all_int, None])
+    env.step([skip_int, None])
+    env.step([None, bet_all_int])
+    obs, reward, terminal, info = env.step([None, skip_int])
+
+    assert env.next_accepted_action is None
+    assert env.current_state == gm.GameState.end
+    assert all(terminal), "Game ended as one player is broke"
+    assert obs == [None] * AGENT_COUNT
+    assert sorted(reward) == [Reward.LOSER, Reward.WINNER]
+    # The player with the most money wins
+    banks = [p.bank.amount for p in env.state.players]
+    assert reward[int(np.argmax(banks))] == Reward.WINNER
+
+    counts = env.transition_counts
+    assert counts[(gm.GameState.place_bet, gm.GameState.decide_hit_pass)] == 2
+    assert counts[(gm.GameState.decide_hit_pass, gm.GameState.check_winner)] == 1
+    assert counts[(gm.GameState.end_of_round, gm.GameState.find_final_winner)] == 1
+    assert counts[(gm.GameState.find_final_winner, gm.GameState.end)] == 1
+
+
+def test_auto_reset():
+    env = GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        allow_invalid=False,
+        auto_reset=True,
+    )
+    agent = FirstLegalAgent(env)
+    env.reset()
+    episodes = 0
+    for _ in range(200):
+        action_n = [None] * AGENT_COUNT
+        action_n[env.next_player] = agent.forward(None)
+        obs, reward, terminal, _ = env.step(action_n)
+        if all(terminal):
+            episodes += 1
+            assert (
+                sorted(reward) == [Reward.LOSER, Reward.WINNER]
+                or reward == [Reward.WINNER] * AGENT_COUNT
+            )
+            # The next game already started
+            assert env.next_accepted_action is not None
+            assert obs[env.next_player] is not None
+            assert env.state.number_of_rounds == 0
+        if episodes == 2:
+            break
+    assert episodes == 2
+
+
+def test_max_episode_steps():
+    env = GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        max_episode_steps=2,
+    )
+    env.reset()
+    agent = FirstLegalAgent(env)
+    _, _, terminal, _ = env.step([agent.forward(None), None])
+    assert not any(terminal)
+    _, reward, terminal, info = env.step([agent.forward(None), None])
+    assert all(terminal)
+    assert info["truncated"]
+    assert reward == [Reward.DEFAULT] * AGENT_COUNT
+
+    env.reset()
+    assert env.episode_steps == 0
+    assert env.current_state == gm.GameState.place_bet
+
+
+def test_reset_reshuffle():
+    env = GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=AGENT_COUNT)),
+        gm.GameState.start,
+        acn.ActionDecision,
+    )
+    env.seed(0)
+    first_deal = env.reset()[0]
+    assert env.state.number_of_rounds == 0
+    assert not (env.reset()[0] == first_deal).all(), "New deal on reset"
+
+    env.seed(0)
+    assert (env.reset()[0] == first_deal).all(), "Same deal for the same seed"
+
+    env.reshuffle = False
+    assert (env.reset()[0] == env.reset()[0]).all(), "Same deal without reshuffle"
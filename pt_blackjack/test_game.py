@@ -2,6 +2,7 @@ from pprint import pprint
 import pytest
 
 from playtest.action import ActionInstance
+from playtest.game import GameHandler, ContinueTo, InvalidTransitionError
 
 from .constant import Param
 from .state import State, PlayerState
@@ -11,6 +12,8 @@ import pt_blackjack.action as acn
 
 NUMBER_OF_PLAYERS = 2
 
+handler = gm.BlackjackHandler().compile(gm.GameState.start)
+
 
 def test_start():
     # Arrange
@@ -18,7 +21,7 @@ def test_start():
     assert len(s.players[0].hand) == 0, "First hand is empty"
 
     # Act
-    returned_state, decision, next_state, _ = gm.game_start(s)
+    returned_state, decision, next_state, _ = handler.handle(s, gm.GameState.start)
     # pprint(s.to_data())
 
     # Assert - check next game state and what it should be
@@ -140,7 +143,9 @@ def test_skip_first_player():
 
     # Act - make a hit on the action
     skip_action = ActionInstance(acn.ActionName.SKIP, True)
-    returned_state, decision, next_state, _ = gm.decide_hit_miss(s, action=skip_action)
+    returned_state, decision, next_state, _ = handler.handle(
+        s, gm.GameState.decide_hit_pass, skip_action
+    )
 
     # Assert, ensure that we get another card, and same action
     assert len(s.players[0].hand) == 2, "Player one get another card"
@@ -180,7 +185,9 @@ def test_evaluate_round_end():
 
     # Act - make a hit on the action
     skip_action = ActionInstance(acn.ActionName.SKIP, True)
-    returned_state, decision, next_state, _ = gm.decide_hit_miss(s, action=skip_action)
+    returned_state, decision, next_state, _ = handler.handle(
+        s, gm.GameState.decide_hit_pass, skip_action
+    )
 
     # Assert, ensure that we get another card, and same action
     assert s.current_player == 0
@@ -226,8 +233,65 @@ def test_find_winner():
 
     # Act - make a hit on the action
     skip_action = ActionInstance(acn.ActionName.SKIP, True)
-    returned_state, decision, next_state, _ = gm.decide_hit_miss(s, action=skip_action)
+    returned_state, decision, next_state, _ = handler.handle(
+        s, gm.GameState.decide_hit_pass, skip_action
+    )
 
     # Now player 1 win!
     assert decision is None
     assert next_state == gm.GameState.end
+
+
+def test_compile():
+    with pytest.raises(AssertionError):
+
+        class MissingHandler(gm.BlackjackHandler):
+            handler = {
+                k: v
+                for k, v in gm.BlackjackHandler.handler.items()
+                if k != gm.GameState.reset_round
+            }
+
+        MissingHandler().compile(gm.GameState.start)
+
+    compiled = gm.BlackjackHandler().compile(gm.GameState.start)
+    s = State(Param(number_of_players=NUMBER_OF_PLAYERS))
+    compiled.handle(s, gm.GameState.start)
+    assert compiled.transition_counts == {
+        (gm.GameState.start, gm.GameState.deal_round): 1,
+        (gm.GameState.deal_round, gm.GameState.place_bet): 1,
+    }
+
+
+def test_compile_invalid_transition():
+    def skip_deal(s, action=None):
+        return ContinueTo(gm.GameState.check_winner)
+
+    class SkipDealHandler(gm.BlackjackHandler):
+        handler = dict(gm.BlackjackHandler.handler)
+        handler[gm.GameState.start] = skip_deal
+
+    compiled = SkipDealHandler().compile(gm.GameState.start)
+    s = State(Param(number_of_players=NUMBER_OF_PLAYERS))
+    with pytest.raises(InvalidTransitionError):
+        compiled.handle(s, gm.GameState.start)
+
+
+def test_deep_handler_chain():
+    """Handlers chaining through many rounds do not grow the stack"""
+
+    def chain(s, action=None):
+        s.hit_rounds += 1
+        if s.hit_rounds < 5000:
+            return ContinueTo(gm.GameState.check_winner)
+        return (s, None, gm.GameState.end, None)
+
+    class ChainHandler(GameHandler):
+        handler = {gm.GameState.start: chain, gm.GameState.check_winner: chain}
+
+    s = State(Param(number_of_players=NUMBER_OF_PLAYERS))
+    for h in [ChainHandler(), ChainHandler().compile(gm.GameState.start)]:
+        s.hit_rounds = 0
+        _, decision, next_state, _ = h.handle(s, gm.GameState.start)
+        assert next_state == gm.GameState.end
+        assert s.hit_rounds == 5000
@@ -0,0 +1,85 @@
+import pytest
+
+from playtest.hashing import StateHasher, state_hash
+
+from .constant import Param
+from .state import State
+from playtest.action import ActionInstance
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+NUMBER_OF_PLAYERS = 2
+
+
+@pytest.fixture
+def state():
+    param = Param(number_of_players=NUMBER_OF_PLAYERS)
+    return State(param)
+
+
+def test_incremental_hash(state):
+    hasher = StateHasher(state)
+    assert hasher.hash() == state_hash(state)
+
+    state.deck.deal(state.players[0].hand, 2)
+    state.deck.deal(state.players[1].hand, 2)
+    assert hasher.hash() == state_hash(state)
+
+    state.players[0].bet.take_from(state.players[0].bank, 3)
+    state.number_of_rounds += 1
+    assert hasher.hash() == state_hash(state)
+
+    card = state.players[0].hand[0]
+    state.players[0].hand.move_to(state.discarded, card)
+    state.players[1].hand.deal(state.discarded, all=True)
+    assert hasher.hash() == state_hash(state)
+
+    state.discarded.reset()
+    assert hasher.hash() == state_hash(state)
+
+
+def test_hash_equal_state(state):
+    other = State.from_data(state.to_data())
+    assert state_hash(state) == state_hash(other)
+
+    state.deck.deal(state.players[1].hand)
+    assert state_hash(state) != state_hash(other)
+
+
+def test_player_hash(state):
+    hasher = StateHasher(state)
+    player_0 = hasher.player_hash(0)
+    player_1 = hasher.player_hash(1)
+    assert player_0 != player_1, "Players are seated differently"
+
+    # Card moving from hidden deck to hidden hand of player 1
+    state.deck.deal(state.players[1].hand)
+    assert hasher.player_hash(0) == player_0
+    assert hasher.player_hash(1) != player_1
+
+    state.players[1].bet.take_from(state.players[1].bank, 1)
+    assert hasher.player_hash(0) != player_0
+
+
+def test_replace_field(state):
+    hasher = StateHasher(state)
+    old_hand = state.players[0].hand
+    state.players[0].hand = state.players[0].hand.__class__([])
+    state.deck.deal(state.players[0].hand)
+    assert hasher.hash() == state_hash(state)
+
+    # Old component is no longer observed
+    old_hand.add(state.deck[0])
+    assert hasher.hash() == state_hash(state)
+
+    hasher.detach()
+    state.deck.deal(state.players[0].hand)
+    assert hasher.hash() != state_hash(state)
+
+
+def test_hash_over_game(state):
+    hasher = StateHasher(state)
+    gm.BlackjackHandler().handle(state, gm.GameState.start)
+    assert hasher.hash() == state_hash(state)
+    gm.handle_bet(state, ActionInstance(acn.ActionName.BET, 3))
+    assert hasher.hash() == state_hash(state)
@@ -0,0 +1,101 @@
+import multiprocessing as mp
+
+import numpy as np
+import pytest
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.inference import (
+    InferenceAgent,
+    InferenceError,
+    InferenceService,
+)
+from playtest.agents.tournament import AgentSpec
+
+from .constant import Param
+from .state import State
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def make_env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=2)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        verbose=False,
+        allow_invalid=False,
+    )
+
+
+def _save_agent(filename: str):
+    from playtest.agents.keras_dqn import KerasDQNAgent
+
+    KerasDQNAgent(make_env()).save_weights(filename, overwrite=True)
+
+
+@pytest.fixture
+def weight_file(tmp_path):
+    # Saved in another process, so tensorflow is only ever used after the
+    # service process is forked
+    filename = str(tmp_path / "agent.h5f")
+    process = mp.Process(target=_save_agent, args=(filename,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    return filename
+
+
+def test_inference_service(weight_file):
+    env = make_env()
+    observations = [env.reset()[0]]
+    masks = [env.next_accepted_action.legal_action_mask()]
+    for _ in range(7):
+        observations.append(np.random.uniform(size=observations[0].shape))
+        masks.append(np.random.uniform(size=masks[0].shape) < 0.5)
+        masks[-1][0] = True
+
+    service = InferenceService(
+        make_env, [AgentSpec("dqn", weight_file)], max_clients=2, max_latency=0.5
+    )
+    with service:
+        client = service.client(0)
+        # All requests are queued before the first forward pass
+        request_ids = [
+            client.submit("dqn", obs, mask) for obs, mask in zip(observations, masks)
+        ]
+        actions = [client.result(r, timeout=30) for r in reversed(request_ids)][::-1]
+
+        agent = InferenceAgent(env, service.client(1), "dqn")
+        action = agent.forward(observations[0])
+        stats = service.stats(timeout=30)
+
+        with pytest.raises(ValueError):
+            client.submit("unknown", observations[0])
+        # A request the model fails on does not stop the service
+        with pytest.raises(InferenceError):
+            client.act("dqn", np.zeros(3))
+        assert client.act("dqn", observations[0], masks[0]) == actions[0]
+
+    assert stats.requests == 9
+    assert stats.batches == 2
+    assert stats.batch_sizes[8] == 1
+    assert stats.mean_batch_size == 4.5
+    assert "batch size" in str(stats)
+    for a, mask in zip(actions, masks):
+        assert mask[a]
+    assert action == actions[0]
+
+    # Same as the forward pass of the model in this process
+    spec = AgentSpec("dqn", weight_file)
+    local = spec.build(env)
+    assert list(local.forward_batch(observations, masks)) == actions
+
+
+def test_inference_no_service():
+    service = InferenceService(make_env, [AgentSpec("dqn", "agent.h5f")])
+    client = service.client(0)
+    # Never started, so no response ever comes
+    request_id = client.submit("dqn", np.zeros(3))
+    with pytest.raises(InferenceError):
+        client.result(request_id, timeout=0.1)
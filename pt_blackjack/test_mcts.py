@@ -0,0 +1,78 @@
+import pytest
+
+from playtest.env import GameWrapperEnvironment, EnvironmentInteration
+from playtest.components import BasicDeck, Card
+from playtest.action import ActionInstance
+from playtest.agents.mcts import MCTSAgent
+
+from .constant import Param
+from .state import State
+from .heuristic import bank_share
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def to_deck(cards):
+    return BasicDeck([Card.from_str(c) for c in cards])
+
+
+@pytest.fixture
+def env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=2)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        allow_invalid=False,
+    )
+
+
+@pytest.fixture
+def env_to_skip(env) -> GameWrapperEnvironment:
+    """Player 1 has 21 in the last round, and any hit would bust"""
+    s = env.state
+    s.deck = to_deck(["T,S", "T,H", "T,D", "_9,S", "_9,H"] * 4)
+    s.players[0].hand = to_deck(["T,C", "_8,C"])
+    s.players[1].hand = to_deck(["T,C", "J,C"])
+    for p in s.players:
+        p.bet.take_from(p.bank, 1)
+    s.current_player = 1
+    s.number_of_rounds = Param.number_of_rounds - 1
+
+    env.current_state = gm.GameState.decide_hit_pass
+    env.next_player = 1
+    env.next_accepted_action = acn.ActionDecision(
+        {acn.ActionName.HIT: True, acn.ActionName.SKIP: True}
+    )
+    return env
+
+
+def test_mcts_skip(env_to_skip):
+    agent = MCTSAgent(env_to_skip, bank_share, iterations=50, seed=0)
+    decision = env_to_skip.next_accepted_action
+    action = agent.forward(None)
+
+    assert action == decision.to_int(ActionInstance(acn.ActionName.SKIP, True))
+    assert sum(visits for visits, _ in agent.last_stats.values()) == 50
+    # Search does not modify the state
+    assert len(env_to_skip.state.deck) == 20
+    assert len(env_to_skip.state.players[1].hand) == 2
+
+
+def test_mcts_parallel(env_to_skip):
+    agent = MCTSAgent(env_to_skip, bank_share, iterations=40, processes=2, seed=0)
+    decision = env_to_skip.next_accepted_action
+    try:
+        action = agent.forward(None)
+    finally:
+        agent.close()
+
+    assert action == decision.to_int(ActionInstance(acn.ActionName.SKIP, True))
+    assert sum(visits for visits, _ in agent.last_stats.values()) == 40
+
+
+def test_mcts_play(env):
+    agents = [MCTSAgent(env, bank_share, iterations=20, seed=i) for i in range(2)]
+    game = EnvironmentInteration(env, agents, max_same_player=200)
+    stats = game.play()
+    assert stats.episodes == 1
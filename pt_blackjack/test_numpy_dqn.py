@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from playtest.agents.numpy_dqn import (
+    DenseNetwork,
+    NumpyDQNAgent,
+    export_weights,
+)
+from playtest.agents.tournament import AgentSpec
+
+from .test_tournament import make_env
+
+
+@pytest.fixture
+def observations():
+    env = make_env()
+    observations = [env.reset()[0]]
+    masks = [env.next_accepted_action.legal_action_mask()]
+    for _ in range(15):
+        observations.append(np.random.uniform(size=observations[0].shape))
+        masks.append(np.random.uniform(size=masks[0].shape) < 0.5)
+        masks[-1][0] = True
+    return observations, masks
+
+
+def test_dense_network(tmp_path):
+    weights = [
+        np.random.normal(size=(4, 8)).astype(np.float32),
+        np.random.normal(size=8).astype(np.float32),
+        np.random.normal(size=(8, 3)).astype(np.float32),
+        np.zeros(3, dtype=np.float32),
+    ]
+    network = DenseNetwork.from_weights(weights)
+    x = np.random.normal(size=(5, 4))
+    expected = np.maximum(x.dot(weights[0]) + weights[1], 0).dot(weights[2])
+    assert np.allclose(network(x), expected, atol=1e-5)
+
+    for precision, atol in [("float16", 1e-2), ("int8", 0.1)]:
+        quantized = network.quantize(precision)
+        assert quantized.precision == precision
+        assert quantized.nbytes < network.nbytes
+        quantized.save(str(tmp_path / f"{precision}.npz"))
+        loaded = DenseNetwork.load(str(tmp_path / f"{precision}.npz"))
+        assert loaded.kernels[0].dtype == np.dtype(precision)
+        assert np.allclose(loaded(x), expected, atol=atol)
+
+
+@pytest.mark.parametrize("factored", [False, True])
+def test_export(tmp_path, observations, factored):
+    from playtest.agents.keras_dqn import KerasDQNAgent
+
+    env = make_env()
+    keras_agent = KerasDQNAgent(env, factored=factored)
+    filename = str(tmp_path / "agent.npz")
+    export_weights(keras_agent, filename)
+
+    agent = AgentSpec("numpy", weight_file=filename).build(env)
+    assert isinstance(agent, NumpyDQNAgent)
+    observations, masks = observations
+    assert np.allclose(
+        agent.compute_batch_q_values([[o] for o in observations]),
+        keras_agent.compute_batch_q_values([[o] for o in observations]),
+        atol=1e-5,
+    )
+    actions = agent.forward_batch(observations, masks)
+    assert list(actions) == list(keras_agent.forward_batch(observations, masks))
+    env.reset()
+    assert agent.forward(observations[0]) == actions[0]
+
+    int8_agent = NumpyDQNAgent(env, filename, precision="int8")
+    assert int8_agent.network.precision == "int8"
+    assert all(
+        m[a] for a, m in zip(int8_agent.forward_batch(observations, masks), masks)
+    )
+
+
+def test_no_tensorflow():
+    """Playing an exported agent never imports tensorflow"""
+    script = (
+        "import sys; import playtest.agents.numpy_dqn; "
+        "from playtest.agents import NumpyDQNAgent; "
+        "assert 'keras' not in sys.modules and 'tensorflow' not in sys.modules"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    subprocess.run([sys.executable, "-c", script], check=True, env=env)
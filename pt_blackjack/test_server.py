@@ -0,0 +1,276 @@
+import asyncio
+import json
+import random
+from typing import Optional
+
+from playtest.delta import StateReplica
+from playtest.env import GameWrapperEnvironment
+from playtest.server import GameServer, QueueConnection
+
+from .constant import Param, Reward
+from .state import State
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def make_env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=2)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        verbose=False,
+        allow_invalid=False,
+    )
+
+
+def pick_action(decision) -> str:
+    if "bet" in decision:
+        return f"bet({decision['bet'][0]})"
+    return "skip()"
+
+
+async def play_client(
+    server: GameServer, messages=None, replica=None
+) -> Optional[dict]:
+    """Join a table and play until the end of the game"""
+    client = server.connect_local()
+    await client.send({"type": "join"})
+    while True:
+        message = await client.receive()
+        if messages is not None:
+            messages.append(message)
+        if message is None or message["type"] == "end":
+            return message
+        if message["type"] == "state" and replica is not None:
+            replica.apply(message)
+            await client.send(replica.ack())
+        if message["type"] == "state" and "decision" in message:
+            await client.send(
+                {"type": "action", "action": pick_action(message["decision"])}
+            )
+
+
+def test_many_tables():
+    random.seed(0)
+
+    async def run():
+        server = GameServer(make_env)
+        results = await asyncio.gather(*[play_client(server) for _ in range(20)])
+        await server.close()
+        return server, results
+
+    server, results = asyncio.run(run())
+    assert server.tables_played == 20
+    assert not server.tables
+    for result in results:
+        assert result["type"] == "end"
+        assert sorted(result["rewards"]) in (
+            [Reward.LOSER, Reward.WINNER],
+            [Reward.WINNER, Reward.WINNER],
+        )
+
+
+def test_state_messages():
+    async def run():
+        server = GameServer(make_env)
+        messages: list = []
+        await play_client(server, messages)
+        await server.close()
+        return messages
+
+    messages = asyncio.run(run())
+    assert messages[0] == {"type": "joined", "table": 0, "player": 0}
+    state = messages[1]
+    assert state["type"] == "state"
+    assert state["next_player"] == 0
+    assert state["decision"] == {"bet": [1, 10]}
+    # Only what the player can see
+    assert "deck" not in state["state"]
+    assert len(state["state"]["self"]["hand"]) == 2
+    json.dumps(state)
+
+
+def test_delta_messages():
+    async def run():
+        server = GameServer(make_env)
+        messages: list = []
+        replica = StateReplica()
+        await play_client(server, messages, replica)
+        await server.close()
+        return messages, replica
+
+    messages, replica = asyncio.run(run())
+    states = [m for m in messages if m["type"] == "state"]
+    assert "state" in states[0]
+    assert any("delta" in m for m in states)
+
+    # Smaller than sending the full view each time
+    full_replica = StateReplica()
+    sent = full = 0
+    for message in states:
+        assert message.get("base", 0) < message["version"]
+        sent += len(json.dumps(message.get("delta", message.get("state"))))
+        full += len(json.dumps(full_replica.apply(message)))
+    assert sent < full
+    assert full_replica.state == replica.state
+
+
+def test_spectate():
+    async def run():
+        server = GameServer(make_env, humans_per_table=2)
+        first = asyncio.ensure_future(play_client(server))
+        await asyncio.sleep(0.01)
+        spectator = server.connect_local()
+        await spectator.send({"type": "spectate", "table": 0})
+        assert await spectator.receive() == {"type": "spectating", "table": 0}
+        second = asyncio.ensure_future(play_client(server))
+
+        replica = StateReplica()
+        messages = []
+        while True:
+            message = await spectator.receive()
+            messages.append(message)
+            if message["type"] == "end":
+                break
+            replica.apply(message)
+            await spectator.send(replica.ack())
+        await asyncio.gather(first, second)
+
+        unknown = server.connect_local()
+        await unknown.send({"type": "spectate", "table": 5})
+        error = await unknown.receive()
+        await server.close()
+        return messages, replica, error
+
+    messages, replica, error = asyncio.run(run())
+    assert all("decision" not in m for m in messages)
+    assert any("delta" in m for m in messages)
+    # Only what is visible to all
+    assert "hand" not in replica.state["players"][0]
+    assert "bank" in replica.state["players"][1]
+    assert error["type"] == "error"
+
+
+def test_slow_player_does_not_block():
+    async def run():
+        server = GameServer(make_env, action_timeout=0.05)
+        slow = server.connect_local()
+        await slow.send({"type": "join"})
+        # Never acts, so random actions are taken on timeout
+        fast_result = await play_client(server)
+        assert server.tables, "Slow table still playing"
+
+        messages = []
+        while True:
+            message = await slow.receive()
+            messages.append(message)
+            if message is None or message["type"] == "end":
+                break
+        await server.close()
+        return fast_result, messages
+
+    fast_result, messages = asyncio.run(run())
+    assert fast_result["type"] == "end"
+    assert {"type": "timeout"} in messages
+    assert messages[-1]["type"] == "end"
+
+
+def test_invalid_and_disconnect():
+    async def run():
+        server = GameServer(make_env)
+        client = server.connect_local()
+        await client.send({"type": "join"})
+        assert (await client.receive())["type"] == "joined"
+        assert "decision" in await client.receive()
+
+        await client.send({"type": "action", "action": "hit()"})
+        error = await client.receive()
+        await client.send({"type": "action", "action": "bet(99)"})
+        illegal = await client.receive()
+
+        # Leave the table, a bot finishes the game
+        client.close()
+        while server.tables:
+            await asyncio.sleep(0.01)
+        await server.close()
+        return server, error, illegal
+
+    server, error, illegal = asyncio.run(run())
+    assert error["type"] == "error"
+    assert illegal["type"] == "error"
+    assert server.tables_played == 1
+
+
+class BrokenConnection(QueueConnection):
+    """Client gone without a word, e.g. a reset TCP connection"""
+
+    async def send(self, message):
+        if message["type"] == "state":
+            raise ConnectionResetError("Connection lost")
+        await super().send(message)
+
+
+def test_send_error():
+    async def run():
+        server = GameServer(make_env, humans_per_table=2)
+        broken = BrokenConnection(asyncio.Queue(), asyncio.Queue())
+        await broken.incoming.put({"type": "join"})
+        server._spawn(server.handle_connection(broken))
+        await asyncio.sleep(0.01)
+        # The table plays on for the other player, with a bot in the seat
+        result = await play_client(server)
+        await server.close()
+        return server, result
+
+    server, result = asyncio.run(run())
+    assert result["type"] == "end"
+    assert server.tables_played == 1
+
+
+def test_server_full():
+    async def run():
+        server = GameServer(make_env, humans_per_table=2, max_tables=1)
+        first = server.connect_local()
+        await first.send({"type": "join"})
+        second = server.connect_local()
+        await second.send({"type": "join"})
+        third = server.connect_local()
+        await third.send({"type": "join"})
+        messages = [await c.receive() for c in [first, second, third]]
+        await server.close()
+        return messages
+
+    first, second, third = asyncio.run(run())
+    assert first == {"type": "joined", "table": 0, "player": 0}
+    assert second == {"type": "joined", "table": 0, "player": 1}
+    assert third["type"] == "error"
+
+
+def test_tcp():
+    async def run():
+        server = GameServer(make_env)
+        tcp_server = await server.start("127.0.0.1", 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        async def send(message):
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+
+        await send({"type": "join"})
+        while True:
+            message = json.loads(await reader.readline())
+            if message["type"] == "end":
+                break
+            if message["type"] == "state" and "decision" in message:
+                await send(
+                    {"type": "action", "action": pick_action(message["decision"])}
+                )
+        writer.close()
+        tcp_server.close()
+        await tcp_server.wait_closed()
+        await server.close()
+        return message
+
+    assert asyncio.run(run())["type"] == "end"
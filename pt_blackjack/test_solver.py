@@ -0,0 +1,111 @@
+import pytest
+
+from playtest.components import BasicDeck, Card
+from playtest.action import ActionInstance
+from playtest.solver import Solver, Node
+
+from .constant import Param
+from .state import State
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def bank_payoff(s: State):
+    return [p.bank.amount + p.bet.amount for p in s.players]
+
+
+def to_deck(cards):
+    return BasicDeck([Card.from_str(c) for c in cards])
+
+
+@pytest.fixture
+def last_decision():
+    """Player 1 with 15 points to decide in the last round, against 18"""
+    s = State(Param(number_of_players=2, starting_pot=3))
+    s.deck = to_deck(["_6,S", "T,S", "T,H", "T,D"])
+    s.players[0].hand = to_deck(["T,C", "_8,C"])
+    s.players[1].hand = to_deck(["T,C", "_5,C"])
+    for p in s.players:
+        p.bet.take_from(p.bank, 1)
+    s.current_player = 1
+    s.number_of_rounds = Param.number_of_rounds - 1
+    decision = acn.ActionDecision({acn.ActionName.HIT: True, acn.ActionName.SKIP: True})
+    return Node(s, gm.GameState.decide_hit_pass, decision, 1)
+
+
+def test_solve_node(last_decision):
+    solver = Solver(gm.BlackjackHandler(), bank_payoff)
+    result = solver.solve_node(last_decision)
+
+    decision = last_decision.decision
+    hit = decision.to_int(ActionInstance(acn.ActionName.HIT, True))
+    skip = decision.to_int(ActionInstance(acn.ActionName.SKIP, True))
+
+    # Skipping lose to 18 points
+    assert result.action_values[skip] == (4.0, 2.0)
+    # Hitting wins only with the 6 (1 out of 4 cards)
+    assert result.action_values[hit] == (3.5, 2.5)
+    assert result.best_action == hit
+    assert result.values == (3.5, 2.5)
+
+    # The state of the node is not modified
+    assert len(last_decision.state.deck) == 4
+    assert len(last_decision.state.players[1].hand) == 2
+
+    assert solver.stats.nodes > 0
+    assert solver.stats.nodes_per_second > 0
+
+
+def test_transition_chance(last_decision):
+    solver = Solver(gm.BlackjackHandler(), bank_payoff)
+    outcomes = solver.transition(
+        last_decision.state,
+        last_decision.game_state,
+        ActionInstance(acn.ActionName.HIT, True),
+    )
+    assert len(outcomes) == 4
+    assert sum(p for p, _ in outcomes) == pytest.approx(1.0)
+    drawn = sorted(node.state.players[1].hand[-1].number for _, node in outcomes)
+    assert drawn == [6, 10, 10, 10]
+    for _, node in outcomes:
+        assert len(node.state.deck) == 3
+
+
+def test_transition_keeps_aggregates(last_decision):
+    hand = last_decision.state.players[1].hand
+    assert hand.aggregate("total_rank") == 15
+    solver = Solver(gm.BlackjackHandler(), bank_payoff)
+    outcomes = solver.transition(
+        last_decision.state,
+        last_decision.game_state,
+        ActionInstance(acn.ActionName.HIT, True),
+    )
+    for _, node in outcomes:
+        new_hand = node.state.players[1].hand
+        assert new_hand._observers, "Aggregates are carried over"
+        assert new_hand.aggregate("total_rank") == sum(c.number for c in new_hand)
+    assert hand.aggregate("total_rank") == 15, "Original aggregate is untouched"
+
+
+def test_transposition_table(last_decision):
+    solver = Solver(gm.BlackjackHandler(), bank_payoff)
+    values = solver.solve_node(last_decision).values
+    assert solver.stats.hit_rate == 0.0
+
+    solver.solve_node(last_decision)
+    assert solver.stats.hits > 0
+    assert 0.0 < solver.stats.hit_rate < 1.0
+
+    small_solver = Solver(gm.BlackjackHandler(), bank_payoff, table_size=2)
+    assert small_solver.solve_node(last_decision).values == values
+    assert small_solver.stats.evictions > 0
+    assert len(small_solver._table) <= 2
+
+
+def test_solve_from_start():
+    s = State(Param(number_of_players=2, starting_pot=3))
+    s.deck = to_deck(["T,S", "T,H", "_5,S", "_6,S", "A,D", "_9,C"])
+    solver = Solver(gm.BlackjackHandler(), bank_payoff, max_depth=3)
+    result = solver.solve(s, gm.GameState.start)
+    assert sum(result.values) == pytest.approx(6.0)
+    assert len(s.deck) == 6, "State is not modified"
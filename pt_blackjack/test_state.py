@@ -1,4 +1,8 @@
+import copy
 import pytest
+import numpy as np
+
+from playtest.state import StateTemplate
 
 from .constant import Param
 from .state import State
@@ -38,3 +42,40 @@ def test_player_initialize(state):
     st_data = state.to_data()
 
     assert len(st_data["players"]) == NUMBER_OF_PLAYERS
+
+
+def test_reset(state):
+    template = StateTemplate(state)
+    state.number_of_rounds = 2
+    state.hit_rounds = 1
+    state.players[0].bank.take_from(state.players[1].bank, 3)
+
+    # Components are reset, int fields are restored from a template
+    state.reset()
+    assert [p.bank.amount for p in state.players] == [10, 10]
+    assert state.number_of_rounds == 2
+    template.restore(state)
+    assert state.number_of_rounds == 0
+    assert state.hit_rounds == 0
+
+
+def test_template_restore(state):
+    template = StateTemplate(state)
+    initial = copy.deepcopy(state.to_data())
+    aggregate = state.deck.aggregate("total_rank")
+
+    state.deck.deal(state.players[0].hand, count=3)
+    state.players[0].bank.take_from(state.players[1].bank, 3)
+    state.number_of_rounds = 2
+    template.restore(state)
+    assert state.to_data() == initial
+    assert state.deck.aggregate("total_rank") == aggregate
+
+    template.restore(state, rng=np.random.RandomState(0))
+    shuffled = state.to_data()
+    assert shuffled["deck"] != initial["deck"]
+    assert sorted(shuffled["deck"]) == sorted(initial["deck"])
+    assert state.deck.aggregate("total_rank") == aggregate
+    # Only the deck is shuffled
+    del shuffled["deck"], initial["deck"]
+    assert shuffled == initial
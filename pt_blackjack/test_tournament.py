@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from playtest.env import GameWrapperEnvironment
+from playtest.agents.tournament import (
+    AgentSpec,
+    MatchResult,
+    Tournament,
+    RANDOM_AGENT,
+    rate_results,
+)
+
+from .constant import Param
+from .state import State
+from .heuristic import HeuristicAgent, bank_scores
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+
+def make_env() -> GameWrapperEnvironment:
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=2)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        allow_invalid=False,
+    )
+
+
+def test_rate_results():
+    results = [MatchResult(seats=("a", "b"), scores=[10, 5])] * 8 + [
+        MatchResult(seats=("b", "a"), scores=[3, 3])
+    ]
+    report = rate_results(["a", "b"], results)
+
+    assert report.ranking() == ["a", "b"]
+    assert report.ratings["a"] > 1500 > report.ratings["b"]
+    assert report.games == {"a": 9, "b": 9}
+
+    rate, low, high = report.win_rates["a"]
+    assert rate == pytest.approx(8.5 / 9)
+    assert low < rate < high <= 1.0
+
+
+def test_rate_results_order():
+    results = (
+        [MatchResult(seats=("a", "b"), scores=[1, 0])] * 6
+        + [MatchResult(seats=("b", "a"), scores=[1, 0])] * 4
+        + [MatchResult(seats=("b", "c"), scores=[1, 0])] * 7
+        + [MatchResult(seats=("c", "b"), scores=[1, 1])] * 3
+        + [MatchResult(seats=("a", "c"), scores=[1, 0])] * 2
+    )
+    report = rate_results(["a", "b", "c"], results)
+    assert report.ranking() == ["a", "b", "c"]
+
+    # The same games in any order give the same ratings
+    shuffled = list(results)
+    for seed in range(5):
+        random.Random(seed).shuffle(shuffled)
+        assert rate_results(["a", "b", "c"], shuffled).ratings == report.ratings
+    assert rate_results(["a", "b", "c"], results[::-1]).ratings == report.ratings
+
+
+def test_tournament():
+    specs = [
+        RANDOM_AGENT,
+        AgentSpec("heuristic", factory=HeuristicAgent),
+        AgentSpec("random_2", factory=RANDOM_AGENT.factory),
+    ]
+    tournament = Tournament(
+        make_env,
+        specs,
+        games_per_seating=2,
+        score_fn=bank_scores,
+        max_steps=10,
+        processes=2,
+    )
+    report = tournament.run()
+
+    # 3 pairs, each in 2 seatings of 2 games
+    assert len(report.results) == 3 * 2 * 2
+    assert all([report.games[s.name] == 8 for s in specs])
+    assert set(report.ranking()) == {s.name for s in specs}
+    assert str(report)
@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+from playtest.env import GameWrapperEnvironment
+
+from .constant import Param
+from .state import State
+from .vector import VectorBlackjack, cards_from_data, NUMBER_OF_ACTIONS
+import pt_blackjack.game as gm
+import pt_blackjack.action as acn
+
+SEEDS = list(range(8))
+
+
+def make_env(seed: int) -> GameWrapperEnvironment:
+    # The deck is shuffled on creation of the state
+    random.seed(seed)
+    return GameWrapperEnvironment(
+        gm.BlackjackHandler(),
+        State(Param(number_of_players=2)),
+        gm.GameState.start,
+        acn.ActionDecision,
+        allow_invalid=False,
+        # Keep the deck of the state, which the vector env is given
+        reshuffle=False,
+    )
+
+
+def test_cross_check_with_handler():
+    """Run both engines with the same decks and actions"""
+    envs = [make_env(seed) for seed in SEEDS]
+    decks = np.stack([cards_from_data(env.state.deck.to_data()) for env in envs])
+
+    vector = VectorBlackjack(len(SEEDS))
+    vector_obs = vector.reset(decks=decks)
+    env_obs = [env.reset() for env in envs]
+
+    rng = np.random.RandomState(0)
+    steps = 0
+    while not vector.done.all():
+        legal_mask = vector.legal_mask()
+        actions = np.zeros(len(SEEDS), dtype=np.int64)
+        for i, env in enumerate(envs):
+            if vector.done[i]:
+                continue
+            assert env.next_player == vector.current_player[i]
+            assert (env.next_accepted_action.legal_action_mask() == legal_mask[i]).all()
+            assert (env_obs[i][env.next_player] == vector_obs[i]).all()
+            actions[i] = rng.choice(np.flatnonzero(legal_mask[i]))
+
+        was_done = vector.done.copy()
+        vector_obs, rewards, done, valid = vector.step(actions)
+        assert valid[~was_done].all()
+        for i, env in enumerate(envs):
+            if was_done[i]:
+                continue
+            action_n = [None, None]
+            action_n[env.next_player] = int(actions[i])
+            env_obs[i], env_rewards, env_done, _ = env.step(action_n)
+            assert all(env_done) == done[i]
+            assert list(env_rewards) == rewards[i].tolist()
+        steps += 1
+
+    assert steps > 3
+    for i, env in enumerate(envs):
+        players = env.state.players
+        assert vector.bank[i].tolist() == [p.bank.amount for p in players]
+        assert vector.bet[i].tolist() == [p.bet.amount for p in players]
+        assert vector.number_of_rounds[i] == env.state.number_of_rounds
+
+
+def test_invalid_action():
+    vector = VectorBlackjack(2, seed=1)
+    vector.reset()
+    # Hit is not legal when betting, and -1 is not an action
+    _, _, _, valid = vector.step(np.array([1, -1]))
+    assert not valid.any()
+    assert (vector.bet == 0).all()
+
+
+def test_random_play():
+    vector = VectorBlackjack(256, seed=2)
+    vector.reset()
+    rng = np.random.RandomState(3)
+    for _ in range(200):
+        if vector.done.all():
+            break
+        legal = vector.legal_mask()
+        # Pick a random legal action per game
+        scores = np.where(legal, rng.rand(*legal.shape), -1)
+        actions = np.argmax(scores, axis=1)
+        was_done = vector.done.copy()
+        _, _, _, valid = vector.step(actions)
+        assert valid[~was_done].all()
+    assert vector.done.all(), "All games end"
+    assert (vector.bank.sum(axis=1) + vector.bet.sum(axis=1) == 20).all(), "Money kept"
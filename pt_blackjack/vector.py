@@ -0,0 +1,299 @@
+"""A numpy vectorized implementation of the blackjack rules
+
+This implements the same rules as `BlackjackHandler`, over arrays of
+games, as a benchmark target and a fast environment for agent research.
+Observations and legal action masks are the same as the ones given by
+`GameWrapperEnvironment` for the acting player.
+
+Cards are represented by their index in `Card.get_all_cards()`, and -1
+for an empty slot.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from playtest.components.card import CardNumber, CardSuite
+
+import pt_blackjack.action as acn
+from pt_blackjack.constant import Param, Reward
+
+NUMBER_OF_CARDS = len(CardNumber) * len(CardSuite)
+NO_CARD = -1
+
+# Phase of each game
+PLACE_BET = 0
+DECIDE_HIT_PASS = 1
+END = 2
+
+# Flattened int actions, as per ActionDecision.get_action_map
+SKIP_ACTION, HIT_ACTION, BET_ACTION = [
+    lower for _, lower, _ in acn.ActionDecision.get_action_map()
+]
+MAX_BET = acn.ActionDecision.decision_ranges[acn.ActionName.BET].valid_range[1]
+NUMBER_OF_ACTIONS = acn.ActionDecision.get_number_of_actions()
+
+
+def card_numbers(cards: np.ndarray) -> np.ndarray:
+    return np.where(cards == NO_CARD, 0, cards // len(CardSuite) + 1)
+
+
+def cards_to_data(cards: np.ndarray) -> np.ndarray:
+    """Convert card index into [number, suite], same as `Card.to_data`"""
+    data = np.stack([cards // len(CardSuite) + 1, cards % len(CardSuite) + 1], axis=-1)
+    return np.where((cards == NO_CARD)[..., None], NO_CARD, data)
+
+
+def cards_from_data(data) -> np.ndarray:
+    """Convert a list of card data (e.g. `Deck.to_data`) into card index"""
+    data = np.asarray(data, dtype=np.int64).reshape(-1, 2)
+    return (data[:, 0] - 1) * len(CardSuite) + (data[:, 1] - 1)
+
+
+class VectorBlackjack:
+    """Play many games of blackjack at once
+
+    Each `step` takes one int action per game (see `ActionDecision`), for
+    the acting player of the game.  Games which ended are left untouched.
+    """
+
+    number_of_games: int
+    param: Param
+
+    def __init__(self, number_of_games: int, param=None, seed=None):
+        self.number_of_games = number_of_games
+        self.param = param if param is not None else Param()
+        self.rng = np.random.RandomState(seed)
+
+        n, p = number_of_games, self.param.number_of_players
+        self.deck = np.full((n, NUMBER_OF_CARDS), NO_CARD, dtype=np.int64)
+        self.deck_size = np.zeros(n, dtype=np.int64)
+        self.discarded = np.full((n, NUMBER_OF_CARDS), NO_CARD, dtype=np.int64)
+        self.discarded_size = np.zeros(n, dtype=np.int64)
+        self.hand = np.full((n, p, NUMBER_OF_CARDS), NO_CARD, dtype=np.int64)
+        self.hand_size = np.zeros((n, p), dtype=np.int64)
+        self.bank = np.zeros((n, p), dtype=np.int64)
+        self.bet = np.zeros((n, p), dtype=np.int64)
+        self.current_player = np.zeros(n, dtype=np.int64)
+        self.number_of_rounds = np.zeros(n, dtype=np.int64)
+        self.hit_rounds = np.zeros(n, dtype=np.int64)
+        self.phase = np.full(n, END, dtype=np.int64)
+
+    @property
+    def number_of_players(self) -> int:
+        return self.param.number_of_players
+
+    @property
+    def done(self) -> np.ndarray:
+        return self.phase == END
+
+    def reset(self, decks: Optional[np.ndarray] = None) -> np.ndarray:
+        """Start all games
+
+        :param decks: optional card index of each deck, in the same order
+          as `Deck.value` (i.e. cards are dealt from the end)
+        :return: observation of the acting player of each game
+        """
+        n = self.number_of_games
+        if decks is None:
+            decks = np.argsort(self.rng.rand(n, NUMBER_OF_CARDS), axis=1)
+        self.deck[:] = decks
+        self.deck_size[:] = NUMBER_OF_CARDS
+        self.discarded[:] = NO_CARD
+        self.discarded_size[:] = 0
+        self.hand[:] = NO_CARD
+        self.hand_size[:] = 0
+        self.bank[:] = self.param.starting_pot
+        self.bet[:] = 0
+        self.current_player[:] = 0
+        self.number_of_rounds[:] = 0
+        self.hit_rounds[:] = 0
+        self.phase[:] = PLACE_BET
+
+        self._deal(np.arange(n), 2)
+        return self.observation()
+
+    # ---------
+    # Game logic
+    # ---------
+
+    def _deal(self, games: np.ndarray, count: int):
+        """Deal cards from the deck to the current player of the games"""
+        players = self.current_player[games]
+        for _ in range(count):
+            assert (
+                self.deck_size[games] > 0
+            ).all(), "Oops - Deck BasicDeck ran out of card."
+            self.deck_size[games] -= 1
+            cards = self.deck[games, self.deck_size[games]]
+            self.deck[games, self.deck_size[games]] = NO_CARD
+            self.hand[games, players, self.hand_size[games, players]] = cards
+            self.hand_size[games, players] += 1
+
+    def _discard_hands(self, games: np.ndarray):
+        """Move all hands into the discarded pile, same order as `Deck.deal`"""
+        for player_id in range(self.number_of_players):
+            sizes = self.hand_size[games, player_id]
+            for k in range(sizes.max(initial=0)):
+                has_card = games[sizes > k]
+                card_index = self.hand_size[has_card, player_id] - 1 - k
+                self.discarded[has_card, self.discarded_size[has_card]] = self.hand[
+                    has_card, player_id, card_index
+                ]
+                self.discarded_size[has_card] += 1
+            self.hand[games, player_id] = NO_CARD
+            self.hand_size[games, player_id] = 0
+
+    def _end_of_round(self, games: np.ndarray):
+        """Same as `check_winner` and `end_of_round_next_round_check`"""
+        scores = card_numbers(self.hand[games]).sum(axis=2)
+        not_busted = scores <= Param.max_score
+        has_winner = not_busted.any(axis=1)
+        # argmax picks the lowest player on equal score
+        winners = np.argmax(np.where(not_busted, scores, -1), axis=1)
+
+        win_games = games[has_winner]
+        self.bank[win_games, winners[has_winner]] += self.bet[win_games].sum(axis=1)
+        self.bet[win_games] = 0
+
+        has_broke = (self.bank[games] <= 1).any(axis=1)
+        self.number_of_rounds[games[~has_broke]] += 1
+        is_end = has_broke | (self.number_of_rounds[games] >= Param.number_of_rounds)
+        self.phase[games[is_end]] = END
+
+        next_round = games[~is_end]
+        self._discard_hands(next_round)
+        self.hit_rounds[next_round] = 0
+        self._deal(next_round, 2)
+        self.phase[next_round] = PLACE_BET
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Apply the action of the acting player of each game
+
+        :return: (observations, rewards, done, valid) where valid is False
+          for the games where the action was illegal, and left untouched.
+          Rewards are the same as `GameWrapperEnvironment`, i.e. for
+          invalid actions, and at the end of the game.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        was_done = self.done
+        all_games = np.arange(self.number_of_games)
+        in_range = (0 <= actions) & (actions < NUMBER_OF_ACTIONS)
+        valid = np.zeros(self.number_of_games, dtype=bool)
+        valid[in_range] = self.legal_mask()[all_games[in_range], actions[in_range]]
+
+        bet_games = all_games[valid & (self.phase == PLACE_BET)]
+        bet_players = self.current_player[bet_games]
+        bet_values = actions[bet_games] - BET_ACTION
+        self.bet[bet_games, bet_players] += bet_values
+        self.bank[bet_games, bet_players] -= bet_values
+        self.phase[bet_games] = DECIDE_HIT_PASS
+
+        deciding = valid & (self.phase == DECIDE_HIT_PASS)
+        # Games which just bet cannot decide in the same step
+        deciding[bet_games] = False
+
+        hit_games = all_games[deciding & (actions == HIT_ACTION)]
+        self._deal(hit_games, 1)
+        self.hit_rounds[hit_games] += 1
+
+        skip_games = all_games[deciding & (actions == SKIP_ACTION)]
+        self.hit_rounds[skip_games] = 0
+        self.current_player[skip_games] = (
+            self.current_player[skip_games] + 1
+        ) % self.number_of_players
+        round_ended = self.current_player[skip_games] == 0
+        self.phase[skip_games[~round_ended]] = PLACE_BET
+        self._end_of_round(skip_games[round_ended])
+
+        rewards = np.full(
+            (self.number_of_games, self.number_of_players), Reward.DEFAULT
+        )
+        invalid_games = all_games[~valid & ~was_done]
+        rewards[
+            invalid_games, self.current_player[invalid_games]
+        ] = Reward.INVALID_ACTION
+        # Same as `get_winners`
+        ended = self.done & ~was_done
+        amounts = self.bank[ended] + self.bet[ended]
+        rewards[ended] = np.where(
+            amounts == amounts.max(axis=1, keepdims=True), Reward.WINNER, Reward.LOSER
+        )
+        return self.observation(), rewards, self.done, valid
+
+    # ---------
+    # Observations
+    # ---------
+
+    def legal_mask(self) -> np.ndarray:
+        """Same as `BaseDecision.legal_action_mask` for all games"""
+        mask = np.zeros((self.number_of_games, NUMBER_OF_ACTIONS), dtype=bool)
+        deciding = self.phase == DECIDE_HIT_PASS
+        mask[deciding, SKIP_ACTION] = True
+        mask[deciding, HIT_ACTION] = True
+
+        banks = self.bank[np.arange(self.number_of_games), self.current_player]
+        bet_values = np.arange(MAX_BET)
+        mask[:, BET_ACTION:] = (
+            (self.phase == PLACE_BET)[:, None]
+            & (Param.min_bet_per_round <= bet_values)
+            & (bet_values < banks[:, None])
+        )
+        return mask
+
+    def observation(self) -> np.ndarray:
+        """Flattened observation of the acting player of each game
+
+        This is the same as the observation of the next player given by
+        `GameWrapperEnvironment`, which flattens the dict spaces in order
+        of their keys.  Observations of ended games are zeros.
+        """
+        n, p = self.number_of_games, self.number_of_players
+        games = np.arange(n)
+        players = self.current_player
+        betting = (self.phase == PLACE_BET)[:, None]
+        deciding = (self.phase == DECIDE_HIT_PASS)[:, None]
+
+        # Other players, in order of player id
+        others = (players[:, None] + np.arange(1, p)[None, :]) % p
+        others = np.sort(others, axis=1)
+
+        obs = np.concatenate(
+            [
+                # Action: BET, HIT, SKIP
+                np.where(
+                    betting,
+                    np.stack(
+                        [
+                            np.full(n, Param.min_bet_per_round),
+                            self.bank[games, players],
+                        ],
+                        axis=1,
+                    ),
+                    0,
+                ),
+                deciding,
+                deciding,
+                # State: current_player, discarded, hit_rounds, number_of_rounds
+                players[:, None],
+                cards_to_data(self.discarded).reshape(n, -1),
+                self.hit_rounds[:, None],
+                self.number_of_rounds[:, None],
+                # others: bank, bet
+                np.stack(
+                    [
+                        self.bank[games[:, None], others],
+                        self.bet[games[:, None], others],
+                    ],
+                    axis=2,
+                ).reshape(n, -1),
+                # self: bank, bet, hand
+                self.bank[games, players][:, None],
+                self.bet[games, players][:, None],
+                cards_to_data(self.hand[games, players]).reshape(n, -1),
+            ],
+            axis=1,
+        ).astype(np.float64)
+        obs[self.done] = 0
+        return obs